@@ -0,0 +1,13 @@
+"""Benchmarks of the shell's front end and pipelines.
+
+Run from ``cli/src``::
+
+    python3 -m benchmarks                          # print the results
+    python3 -m benchmarks --save baseline.json     # store them as a baseline
+    python3 -m benchmarks --compare baseline.json  # fail on regressions
+
+Every workload (see :mod:`benchmarks.workloads`) runs at several
+sizes. The results are the throughput at the largest size and the
+scaling *slope*: the exponent `k` in ``time ~ size ** k``, fitted
+on a log-log scale (1 is linear, 2 is quadratic).
+"""
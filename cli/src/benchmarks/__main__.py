@@ -0,0 +1,39 @@
+"""Command-line entry point: ``python3 -m benchmarks --help``."""
+import argparse
+import sys
+
+from benchmarks import runner
+from benchmarks.workloads import WORKLOADS
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmarks of the shell.')
+    arg_parser.add_argument('--scale', type=float, default=1.0,
+                            help='multiply the sizes of workloads by this factor')
+    arg_parser.add_argument('--repeat', type=int, default=runner.DEFAULT_REPEAT,
+                            help='how many times to run each workload at each size')
+    arg_parser.add_argument('--only', metavar='NAME', action='append',
+                            help='run only this workload (may be repeated)')
+    arg_parser.add_argument('--save', metavar='FILE', help='store the results as JSON')
+    arg_parser.add_argument('--compare', metavar='FILE',
+                            help='compare with a stored baseline, exit with 1 on regressions')
+    args = arg_parser.parse_args()
+
+    workloads = [workload for workload in WORKLOADS if not args.only or workload.name in args.only]
+    results = runner.run_suite(workloads, args.scale, args.repeat,
+                               progress=lambda name: print('running {}...'.format(name), file=sys.stderr))
+    print(runner.format_results(results))
+
+    if args.save is not None:
+        runner.save_results(results, args.save)
+
+    if args.compare is not None:
+        regressions = runner.compare(results, runner.load_results(args.compare))
+        for regression in regressions:
+            print('REGRESSION: {}'.format(regression))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
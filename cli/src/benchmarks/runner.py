@@ -0,0 +1,118 @@
+"""Measuring workloads and comparing the results with a baseline."""
+import json
+import math
+import tempfile
+import timeit
+
+
+DEFAULT_REPEAT = 5
+THROUGHPUT_TOLERANCE = 0.5
+SLOPE_TOLERANCE = 0.3
+
+
+def measure(workload, sizes=None, repeat=DEFAULT_REPEAT):
+    """Run a workload at every size.
+
+    Args:
+        workload (:data:`workloads.Workload`): what to run;
+        sizes (list[int]): sizes to run at, `workload.sizes` if not provided;
+        repeat (int): how many times to run at each size (the best time is taken).
+
+    Returns:
+        dict: ``{'unit': ..., 'times': {size: seconds}, 'throughput': units per second
+        at the largest size, 'slope': scaling exponent}``.
+    """
+    sizes = workload.sizes if sizes is None else sizes
+    times = dict()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            prepared = workload.prepare(size, tmp_dir)
+            timer = timeit.Timer(lambda: workload.run(prepared))
+            times[size] = min(timer.repeat(repeat=repeat, number=1))
+
+    largest_size = max(sizes)
+    return {
+        'unit': workload.unit,
+        'times': times,
+        'throughput': largest_size / times[largest_size],
+        'slope': get_slope(times),
+    }
+
+
+def get_slope(times):
+    """Fit ``log(time) = k * log(size) + b`` with least squares, return `k`."""
+    points = [(math.log(size), math.log(max(seconds, 1e-9))) for size, seconds in times.items()]
+    if len(points) < 2:
+        return float('nan')
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    return covariance / variance
+
+
+def run_suite(workloads, scale=1.0, repeat=DEFAULT_REPEAT, progress=None):
+    """Measure all workloads; sizes are multiplied by `scale` (e.g. 0.01 for a smoke run).
+
+    Args:
+        progress (callable): called with a name of every workload before it runs.
+
+    Returns:
+        dict: workload name -> result of :func:`.measure`.
+    """
+    results = dict()
+    for workload in workloads:
+        if progress is not None:
+            progress(workload.name)
+        sizes = [max(2, int(size * scale)) for size in workload.sizes]
+        results[workload.name] = measure(workload, sizes, repeat)
+    return results
+
+
+def compare(results, baseline,
+            throughput_tolerance=THROUGHPUT_TOLERANCE, slope_tolerance=SLOPE_TOLERANCE):
+    """Find regressions with respect to the baseline.
+
+    A workload regressed if its throughput dropped by more than
+    `throughput_tolerance` (a fraction), or its slope grew by more than
+    `slope_tolerance` (e.g. linear became quadratic). Workloads
+    missing from either side are ignored.
+
+    Returns:
+        list[str]: descriptions of the regressions.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        base_result = baseline[name]
+
+        if result['throughput'] < base_result['throughput'] * (1 - throughput_tolerance):
+            regressions.append('{}: throughput {:.4g} {}/s, baseline {:.4g} {}/s'.format(
+                name, result['throughput'], result['unit'], base_result['throughput'], result['unit']))
+        if result['slope'] > base_result['slope'] + slope_tolerance:
+            regressions.append('{}: slope {:.2f}, baseline {:.2f}'.format(
+                name, result['slope'], base_result['slope']))
+    return regressions
+
+
+def format_results(results):
+    """Make a human-readable table out of results."""
+    lines = ['{:<24}{:>16}  {:<8}{:>8}'.format('workload', 'throughput', 'unit/s', 'slope')]
+    for name, result in sorted(results.items()):
+        lines.append('{:<24}{:>16.4g}  {:<8}{:>8.2f}'.format(
+            name, result['throughput'], result['unit'], result['slope']))
+    return '\n'.join(lines)
+
+
+def save_results(results, file_name):
+    """Store results as JSON, e.g. as a baseline."""
+    with open(file_name, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(file_name):
+    """Load results stored by :func:`.save_results`."""
+    with open(file_name) as f:
+        return json.load(f)
@@ -0,0 +1,118 @@
+"""Synthetic workloads for the benchmarks.
+
+Every workload is parametrized by a size `n` (characters,
+variables, stages, bytes...). `prepare(n, tmp_dir)` builds
+the input once; `run(prepared)` is the measured part.
+Inputs are deterministic, so runs are reproducible.
+"""
+import collections
+import os
+import random
+
+from cli import counting
+from cli.commands import CommandChainPipe
+from cli.environment import Environment
+from cli.lexer import Lexer
+from cli.parser import Parser
+from cli.preprocessor import Preprocessor
+from cli.shell import Shell
+from cli.single_command import CommandEcho, CommandCat
+from cli.streams import InputStream
+
+
+Workload = collections.namedtuple('Workload', ['name', 'unit', 'sizes', 'prepare', 'run'])
+"""A benchmark: `sizes` are the default sizes, `unit` is what is counted by a size."""
+
+_SEED = 2017
+
+
+def _random_words(num_chars):
+    rnd = random.Random(_SEED)
+    words = []
+    total_len = 0
+    while total_len < num_chars:
+        word = ''.join(rnd.choice('abcdefghij') for _ in range(rnd.randint(1, 8)))
+        words.append(word)
+        total_len += len(word) + 1
+    return ' '.join(words)[:num_chars]
+
+
+def _prepare_preprocess(num_vars, tmp_dir):
+    env = Environment()
+    for var_idx in range(num_vars):
+        env.set_var('x{}'.format(var_idx), str(var_idx))
+    line = 'echo ' + ' '.join('"$x{}"'.format(var_idx) for var_idx in range(num_vars))
+    return line, env
+
+
+def _run_preprocess(prepared):
+    line, env = prepared
+    # Measure the compilation as well, not only the cached plan.
+    Preprocessor.compile_plan.cache_clear()
+    Preprocessor.substitute_environment_variables(line, env)
+
+
+def _prepare_lex(num_chars, tmp_dir):
+    words = _random_words(num_chars).split(' ')
+    # Mix in quoted strings and pipes.
+    for word_idx in range(0, len(words), 10):
+        words[word_idx] = '"{}"'.format(words[word_idx])
+    for word_idx in range(5, len(words), 20):
+        words[word_idx] = '|'
+    return 'echo ' + ' '.join(words)
+
+
+def _run_lex(line):
+    Lexer.get_lexemes(line)
+
+
+def _prepare_parse(num_stages, tmp_dir):
+    return Lexer.get_lexemes('echo 1' + ' | cat' * (num_stages - 1))
+
+
+def _run_parse(lexemes):
+    Parser.build_command(lexemes)
+
+
+def _prepare_pipe(num_stages, tmp_dir):
+    return [CommandEcho(['echo', 'abc'])] + [CommandCat(['cat']) for _ in range(num_stages - 1)]
+
+
+def _run_pipe(commands):
+    cmd_result = CommandChainPipe(*commands).run(InputStream(), Environment())
+    cmd_result.get_output()
+
+
+def _prepare_cat_wc(num_bytes, tmp_dir):
+    file_name = os.path.join(tmp_dir, 'cat_wc_{}.txt'.format(num_bytes))
+    line = (_random_words(99) + '\n').encode('ascii')
+    with open(file_name, 'wb') as f:
+        f.write(line * (num_bytes // len(line)))
+
+    shell = Shell()
+    shell.process_input('cd {}'.format(tmp_dir))
+    return shell, 'cat {} | wc'.format(os.path.basename(file_name))
+
+
+def _run_cat_wc(prepared):
+    shell, line = prepared
+    shell.process_input(line).get_output()
+
+
+def _prepare_wc(num_bytes, tmp_dir):
+    line = (_random_words(99) + '\n').encode('ascii')
+    return line * (num_bytes // len(line))
+
+
+def _run_wc(data):
+    counting.count_chunks([data])
+
+
+WORKLOADS = [
+    Workload('preprocess_many_vars', 'vars', [250, 500, 1000, 2000], _prepare_preprocess, _run_preprocess),
+    Workload('lex_long_line', 'chars', [25000, 50000, 100000, 200000], _prepare_lex, _run_lex),
+    Workload('parse_deep_pipeline', 'stages', [500, 1000, 2000, 4000], _prepare_parse, _run_parse),
+    Workload('run_deep_pipeline', 'stages', [25, 50, 100, 200], _prepare_pipe, _run_pipe),
+    Workload('cat_wc_file', 'bytes', [2 ** 20, 2 ** 21, 2 ** 22, 2 ** 23], _prepare_cat_wc, _run_cat_wc),
+    Workload('wc_buffer', 'bytes', [2 ** 19, 2 ** 20, 2 ** 21, 2 ** 22], _prepare_wc, _run_wc),
+]
@@ -0,0 +1,160 @@
+"""A cache of parsed commands.
+
+Scripts often run the same command line many times, with
+different values of variables, e.g. ``cat $FILE | wc`` in a loop.
+Lexing and parsing such a line each time is a waste: only the
+values of variables change, not the structure of the command.
+
+So a command line is parsed once, with every variable replaced
+by a *slot* - a placeholder that the lexer treats as an ordinary
+character. The result is a template command. Later, the template
+is instantiated: its arguments get actual values of variables
+in place of slots.
+
+This is only valid if values of variables do not change the way
+the line is lexed, e.g. a value ``a b`` turns one argument into two.
+Such lines are processed from scratch, like the uncached ones.
+"""
+import collections
+import re
+
+from cli import trace
+from cli.exceptions import ShellException
+from cli.lexer import Lexer, LexemType
+from cli.parser import Parser
+from cli.preprocessor import Preprocessor
+
+
+CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+"""Statistics of a :class:`.ParsedCommandCache`, like in :func:`functools.lru_cache`."""
+
+# Characters from the Unicode private use area, which never appear in normal text.
+_SLOT_START = '\ue000'
+_SLOT_END = '\ue001'
+_SLOT_REGEX = re.compile('{}([0-9]+){}'.format(_SLOT_START, _SLOT_END))
+
+# Values that contain these characters (or are empty) can change lexing.
+_UNSAFE_VALUE_REGEX = re.compile('[\\s"\'|<>={}{}]'.format(_SLOT_START, _SLOT_END))
+
+
+class ParsedCommandCache:
+    """An LRU cache of template commands, keyed on unprocessed command lines.
+
+    Hits and misses are counted, see :meth:`cache_info`.
+    """
+
+    DEFAULT_SIZE = 256
+
+    def __init__(self, maxsize=DEFAULT_SIZE):
+        """Create an empty cache which holds at most `maxsize` templates."""
+        # Maps a command line to its template, or to None if the line can't be cached.
+        self._templates = collections.OrderedDict()
+        self._maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+
+    def build_command(self, raw_str, env):
+        """Build :class:`commands.RunnableCommand` out of an unprocessed command line.
+
+        The result is the same as of preprocessing, lexing and parsing
+        `raw_str` in environment `env`.
+
+        Raises:
+            :class:`exceptions.LexException`, :class:`exceptions.ParseException`:
+            if `raw_str` is not a valid command.
+        """
+        plan = Preprocessor.compile_plan(raw_str)
+        values = [env.get_var(var_name) for var_name in plan.get_var_names()]
+
+        if any(not value or _UNSAFE_VALUE_REGEX.search(value) for value in values):
+            self._misses += 1
+            return ParsedCommandCache._build_from_scratch(raw_str, env)
+
+        if raw_str in self._templates:
+            self._templates.move_to_end(raw_str)
+            template = self._templates[raw_str]
+            is_hit = template is not None
+        else:
+            template = ParsedCommandCache._build_template(raw_str, plan)
+            self._templates[raw_str] = template
+            if len(self._templates) > self._maxsize:
+                self._templates.popitem(last=False)
+            is_hit = False
+
+        if is_hit:
+            self._hits += 1
+        else:
+            self._misses += 1
+
+        if template is None:
+            return ParsedCommandCache._build_from_scratch(raw_str, env)
+
+        if not values:
+            return template
+
+        def fill_arg(arg):
+            if _SLOT_START not in arg:
+                return arg
+            return _SLOT_REGEX.sub(lambda match: values[int(match.group(1))], arg)
+
+        with trace.span('instantiate', num_vars=len(values)):
+            return template.substitute_args(fill_arg)
+
+    def cache_info(self):
+        """Return statistics of the cache: a :data:`.CacheInfo`."""
+        return CacheInfo(self._hits, self._misses, self._maxsize, len(self._templates))
+
+    def cache_clear(self):
+        """Remove all templates and reset the statistics."""
+        self._templates.clear()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _build_from_scratch(raw_str, env):
+        with trace.span('preprocess', input_size=len(raw_str)) as preprocess_span:
+            preprocessed_inp = Preprocessor.substitute_environment_variables(raw_str, env)
+            preprocess_span.set(output_size=len(preprocessed_inp))
+
+        return ParsedCommandCache._lex_and_parse(preprocessed_inp)
+
+    @staticmethod
+    def _lex_and_parse(preprocessed_inp):
+        with trace.span('lex', input_size=len(preprocessed_inp)) as lex_span:
+            lexemes = Lexer.get_lexemes(preprocessed_inp)
+            lex_span.set(num_lexemes=len(lexemes))
+
+        with trace.span('parse', num_lexemes=len(lexemes)):
+            return Parser.build_command(lexemes)
+
+    @staticmethod
+    def _build_template(raw_str, plan):
+        """Parse a command line with slots in place of variables.
+
+        Return None if the line can't be represented as a template.
+        """
+        if _SLOT_START in raw_str or _SLOT_END in raw_str:
+            return None
+
+        num_vars = len(plan.get_var_names())
+        slots = ['{}{}{}'.format(_SLOT_START, var_idx, _SLOT_END) for var_idx in range(num_vars)]
+
+        try:
+            template_str = plan.fill(slots)
+            with trace.span('lex', input_size=len(template_str), template=True) as lex_span:
+                lexemes = Lexer.get_lexemes(template_str)
+                lex_span.set(num_lexemes=len(lexemes))
+
+            # A class of a command depends on its name, so the name can't be a slot.
+            is_command_name = True
+            for lexem in lexemes:
+                if is_command_name and lexem.get_type() == LexemType.STRING and \
+                        _SLOT_START in lexem.get_value():
+                    return None
+                is_command_name = lexem.get_type() == LexemType.PIPE
+
+            with trace.span('parse', num_lexemes=len(lexemes), template=True):
+                return Parser.build_command(lexemes)
+        except ShellException:
+            # Let the error be reported in terms of the actual command line.
+            return None
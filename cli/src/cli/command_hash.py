@@ -0,0 +1,184 @@
+"""Resolution of external command names via ``PATH``.
+
+Like bash, the shell remembers where it found each command
+(and which commands it did not find), so looking up a known
+command costs no system calls. The table is revalidated at most
+once per :attr:`CommandHashTable.DEFAULT_REVALIDATE_INTERVAL`
+seconds: if a directory from ``PATH`` was modified (a file was
+added or removed), entries that could be affected are dropped.
+
+The ``hash`` builtin shows and clears the table, see
+:class:`single_command.CommandHash`.
+"""
+import os
+import threading
+import time
+
+
+# On Windows, `python` may be `python.exe`.
+_EXECUTABLE_SUFFIXES = [''] + (os.environ.get('PATHEXT', '').split(os.pathsep) if os.name == 'nt' else [])
+
+
+class CommandHashTable:
+    """A cache of command name -> full path lookups in ``PATH``.
+
+    A command that is not found is remembered too (as None).
+    """
+
+    DEFAULT_REVALIDATE_INTERVAL = 1.0
+
+    def __init__(self, revalidate_interval=DEFAULT_REVALIDATE_INTERVAL, clock=time.monotonic):
+        """Create an empty table.
+
+        Args:
+            revalidate_interval (float): how often (in seconds) modification
+                times of ``PATH`` directories are checked;
+            clock (callable): a source of time, e.g. for testing.
+        """
+        self._revalidate_interval = revalidate_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._path_var = None
+        self._dirs = []
+        self._dir_mtimes = []
+        self._last_validation_time = None
+
+        # name -> (full path, index of its directory in `self._dirs`) or None if not found
+        self._entries = dict()
+        self._hits = dict()
+
+    def lookup(self, cmd_name, path_var):
+        """Find a command in the directories of `path_var`.
+
+        Args:
+            cmd_name (str): a command name without directories, e.g. ``ls``;
+            path_var (str): a value of ``PATH``.
+
+        Returns:
+            str: a full path of the command, or None if it is not found.
+        """
+        with self._lock:
+            if path_var != self._path_var:
+                self._set_path(path_var)
+            elif self._clock() - self._last_validation_time >= self._revalidate_interval:
+                self._revalidate()
+
+            if cmd_name not in self._entries:
+                self._entries[cmd_name] = self._search(cmd_name)
+                self._hits[cmd_name] = 0
+
+            entry = self._entries[cmd_name]
+            if entry is None:
+                return None
+
+            self._hits[cmd_name] += 1
+            return entry[0]
+
+    def forget(self, cmd_name):
+        """Drop the entry of a command, e.g. if it turned out to be stale."""
+        with self._lock:
+            self._entries.pop(cmd_name, None)
+            self._hits.pop(cmd_name, None)
+
+    def clear(self):
+        """Drop all entries (``hash -r``)."""
+        with self._lock:
+            self._entries.clear()
+            self._hits.clear()
+
+    def get_entries(self):
+        """Get a list of (hits, command name, full path) of the found commands, sorted by name."""
+        with self._lock:
+            return [(self._hits[cmd_name], cmd_name, entry[0])
+                    for cmd_name, entry in sorted(self._entries.items())
+                    if entry is not None]
+
+    @staticmethod
+    def _get_mtime(dir_name):
+        try:
+            return os.stat(dir_name).st_mtime_ns
+        except OSError:
+            return None
+
+    def _set_path(self, path_var):
+        self._path_var = path_var
+        self._dirs = [dir_name for dir_name in path_var.split(os.pathsep) if dir_name]
+        self._dir_mtimes = [CommandHashTable._get_mtime(dir_name) for dir_name in self._dirs]
+        self._last_validation_time = self._clock()
+        self._entries.clear()
+        self._hits.clear()
+
+    def _revalidate(self):
+        self._last_validation_time = self._clock()
+        new_mtimes = [CommandHashTable._get_mtime(dir_name) for dir_name in self._dirs]
+        changed_dir_indices = [dir_idx for dir_idx, (old_mtime, new_mtime)
+                               in enumerate(zip(self._dir_mtimes, new_mtimes))
+                               if old_mtime != new_mtime]
+        self._dir_mtimes = new_mtimes
+        if not changed_dir_indices:
+            return
+
+        # A change in a directory may add a command there (shadowing one from the next
+        # directories) or remove it, but it can't affect commands found before that directory.
+        first_changed_idx = changed_dir_indices[0]
+        for cmd_name, entry in list(self._entries.items()):
+            if entry is None or entry[1] >= first_changed_idx:
+                del self._entries[cmd_name]
+                del self._hits[cmd_name]
+
+    def _search(self, cmd_name):
+        for dir_idx, dir_name in enumerate(self._dirs):
+            for suffix in _EXECUTABLE_SUFFIXES:
+                full_path = os.path.join(dir_name, cmd_name + suffix)
+                if os.path.isfile(full_path) and os.access(full_path, os.X_OK):
+                    return full_path, dir_idx
+        return None
+
+
+_command_hash_table = CommandHashTable()
+
+
+def get_command_hash_table():
+    """Get the table which is shared by all external commands."""
+    return _command_hash_table
+
+
+def find_in_path(cmd_name, env):
+    """Find a command in ``PATH`` (a shell variable, or the process
+    environment variable if the former is not set).
+
+    Returns:
+        str: a full path of the command, or None if it is not found.
+    """
+    path_var = env.get_var('PATH') or os.environ.get('PATH', os.defpath)
+    return _command_hash_table.lookup(cmd_name, path_var)
+
+
+def resolve_command(cmd_name, env):
+    """Find a full path of an external command.
+
+    A name with a directory in it (e.g. ``./run.sh`` or ``/bin/ls``) is taken
+    relative to the current directory of `env`. Otherwise the command
+    is searched in ``PATH`` (see :func:`.find_in_path`). If it is not there,
+    it is looked for in the current directory.
+
+    Args:
+        cmd_name (str): a command name;
+        env (:class:`environment.Environment`): where the command runs.
+
+    Returns:
+        tuple(str, bool): a full path (None if the command is not found;
+        with a directory, the file may not exist) and whether it was found
+        in ``PATH``, i.e. it is remembered by the table.
+    """
+    cur_dir_path = os.path.join(env.get_cwd(), cmd_name)
+    if os.path.dirname(cmd_name) or (os.altsep and os.altsep in cmd_name):
+        return cur_dir_path, False
+
+    full_path = find_in_path(cmd_name, env)
+    if full_path is not None:
+        return full_path, True
+
+    # A miss in PATH is remembered, so an unknown command costs a single check.
+    return (cur_dir_path if os.path.isfile(cur_dir_path) else None), False
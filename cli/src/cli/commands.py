@@ -8,7 +8,10 @@ In principle, we have two types of commands:
 
     - a combination of commands, like ``pwd | wc``. It consists
         of several commands that interact with each other
-        by some rules. This is represented by :class:`.ChainCommand`.
+        by some rules. This is represented by :class:`.CommandChain`.
+
+    - a command with redirected input or output, like ``wc < a.txt``.
+        This is represented by :class:`.CommandRedirect`.
 
 Since each command has the same interface (i.e. it can run,
 given input and environment), the above classes share a
@@ -19,10 +22,13 @@ This module also contains an abstraction of a command run
 result.
 """
 from abc import ABCMeta, abstractmethod
+import collections
 import logging
-import copy
+import os
+import threading
 
-from cli.streams import OutputStream
+from cli.exceptions import BrokenPipeException
+from cli.streams import OutputStream, make_pipe, make_os_pipe, open_file_input_stream, open_file_output_stream
 
 
 class RunnableCommandResult:
@@ -79,42 +85,139 @@ class RunnableCommand(metaclass=ABCMeta):
     """
 
     @abstractmethod
-    def run(self, input_stream, env):
+    def run(self, input_stream, env, output_stream=None):
         """Main action with the command: run it, given input and environment.
 
         Args:
             input_stream (:class:`streams.InputStream`): an input for this command;
-            env (:class:`environment.Environment`): an environment in which command runs.
+            env (:class:`environment.Environment`): an environment in which command runs;
+            output_stream (:class:`streams.OutputStream`): where the command
+                writes its output. If not provided, the command writes
+                into a fresh in-memory stream.
 
         Returns:
             :class:`.RunnableCommandResult`.
         """
         return NotImplemented
 
+    def changes_environment(self):
+        """Whether running this command may result in a different environment.
+
+        A command that keeps the environment can run concurrently
+        with the next command of a pipe: the latter does not have to
+        wait for the former's resulting environment.
+        """
+        return False
+
+    def accepts_os_streams(self):
+        """Whether the command can read and write OS-level streams (file descriptors) as is.
+
+        Two such commands next to each other in a pipe are connected
+        with an OS pipe, so the data between them does not go through the shell.
+        """
+        return False
+
+    def substitute_args(self, fill_arg):
+        """Make a copy of this command with every string argument passed through `fill_arg`.
+
+        Commands without arguments are returned as is.
+
+        Args:
+            fill_arg (callable): takes an argument, returns a new one.
+        """
+        return self
+
 
 class CommandChain(RunnableCommand):
-    """A subset of commands: those which take two commands and combine them.
+    """A subset of commands: those which take several commands and combine them.
 
     This is an abstract class.
     """
 
-    def __init__(self, cmd1, cmd2):
-        """Every CommandChain is constructed out of two commands.
+    def __init__(self, *commands):
+        """Every CommandChain is constructed out of two or more commands.
         """
-        self._cmd_left = cmd1
-        self._cmd_right = cmd2
+        self._commands = list(commands)
+
+    def get_commands(self):
+        """Getter for the combined commands"""
+        return self._commands
+
+    def substitute_args(self, fill_arg):
+        return type(self)(*[cmd.substitute_args(fill_arg) for cmd in self._commands])
+
+
+class _PipeStage:
+    """A command of a pipe that runs in its own thread."""
+
+    def __init__(self, cmd, input_stream, env, output_stream, owns_input):
+        """Prepare a stage.
+
+        The stage closes `output_stream` once the command finishes, so
+        that the next stage sees the end of its input. It also closes
+        `input_stream` if `owns_input` is set.
+        """
+        self._outcome = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(cmd, input_stream, env, output_stream, owns_input),
+                                        daemon=True)
+
+    def _run(self, cmd, input_stream, env, output_stream, owns_input):
+        try:
+            self._outcome = cmd.run(input_stream, env, output_stream)
+        except BrokenPipeException:
+            # The next command has stopped reading: this one finishes early, but normally.
+            self._outcome = RunnableCommandResult(output_stream, env, 0)
+        except BaseException as ex:
+            # Re-raised in the thread that runs the pipe, e.g. ExitException.
+            self._outcome = ex
+        finally:
+            output_stream.close()
+            if owns_input:
+                # The previous stage may still be writing: make sure it is not blocked.
+                input_stream.close()
+
+    def start(self):
+        """Start running the command"""
+        self._thread.start()
+
+    def join(self):
+        """Wait for the command to finish, return its result or raise its exception."""
+        self._thread.join()
+        if isinstance(self._outcome, BaseException):
+            raise self._outcome
+        return self._outcome
 
 
 class CommandChainPipe(CommandChain):
-    """Pipe: take one command's output and put into other command as input.
+    """Pipe: take one command's output and put into next command as input.
 
-    The second command can ignore the input whatsoever.
+    A command can ignore the input whatsoever.
     One can chain environment variable assignments using Pipe. All assignments
     will take place.
 
-    If the first command fails (i.e. completes with non-zero status),
-    then the result of Pipe is equal to the result of the first command
-    (i.e. the second command is `not` run).
+    A pipe of any length is a single flat node, which holds a list
+    of its commands (stages) and runs them one after another in a loop.
+    Nested pipes are flattened into their parent.
+
+    All commands run at the same time, connected by bounded
+    :func:`streams.make_pipe`-s: a command consumes the output
+    of the previous one while it is being produced. Two adjacent external
+    commands are connected by :func:`streams.make_os_pipe` instead.
+
+    A command that stops reading early (like ``head``) closes its input.
+    Then the previous command gets :class:`exceptions.BrokenPipeException`
+    on its next write and stops, and so on up the pipe (an external
+    process gets SIGPIPE). Such a command is considered successful.
+    If some command fails (i.e. completes with non-zero status),
+    then the return code and the environment of Pipe are those of
+    the first failed command (the output is still the last command's).
+
+    The only exception are commands that change the environment
+    (like ``x=1`` or ``cd``): the next command needs their resulting
+    environment, so it starts after them. If such a command fails,
+    then the result of Pipe is equal to the result of that command
+    (i.e. the next commands are `not` run).
 
     Examples::
         cat test.txt | wc
@@ -122,16 +225,178 @@ class CommandChainPipe(CommandChain):
         x=1 | y=2
     """
 
-    def run(self, input_stream, env):
-        cmd_left_result = self._cmd_left.run(input_stream, env)
+    def __init__(self, *commands):
+        stages = []
+        for cmd in commands:
+            if isinstance(cmd, CommandChainPipe):
+                stages.extend(cmd._commands)
+            else:
+                stages.append(cmd)
+
+        super().__init__(*stages)
+
+    def changes_environment(self):
+        return any(cmd.changes_environment() for cmd in self._commands)
+
+    @staticmethod
+    def _make_connecting_pipe(cmd_from, cmd_to):
+        if cmd_from.accepts_os_streams() and cmd_to.accepts_os_streams():
+            return make_os_pipe()
+
+        return make_pipe()
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
+        last_idx = len(self._commands) - 1
+
+        # Either results or stages running in other threads, in order.
+        results = []
+        stage_input = input_stream
+        owns_input = False
+
+        try:
+            for cmd_idx, cmd in enumerate(self._commands):
+                if cmd_idx != last_idx and not cmd.changes_environment():
+                    next_input, stage_output = CommandChainPipe._make_connecting_pipe(
+                        cmd, self._commands[cmd_idx + 1])
+                    # A stage keeps its own view of the environment, whatever happens to `env`.
+                    stage = _PipeStage(cmd, stage_input, env.snapshot(), stage_output, owns_input)
+                    stage.start()
+                    results.append(stage)
+
+                    stage_input, owns_input = next_input, True
+                    continue
+
+                stage_output = output if cmd_idx == last_idx else OutputStream()
+                try:
+                    cmd_result = cmd.run(stage_input, env, stage_output)
+                finally:
+                    if owns_input:
+                        stage_input.close()
+                results.append(cmd_result)
+
+                if cmd_idx != last_idx and cmd_result.get_return_code():
+                    output.write_chunks(cmd_result.get_input_stream().read_raw_chunks())
+                    break
+
+                env = cmd_result.get_result_environment()
+                stage_input, owns_input = cmd_result.get_input_stream(), False
+        finally:
+            stage_outcomes = []
+            for stage in results:
+                if isinstance(stage, _PipeStage):
+                    try:
+                        stage = stage.join()
+                    except BaseException as ex:
+                        stage = ex
+                stage_outcomes.append(stage)
+
+            if owns_input:
+                stage_input.close()
+
+        for cmd_result in stage_outcomes:
+            if isinstance(cmd_result, BaseException):
+                raise cmd_result
+
+        for cmd_result in stage_outcomes:
+            if cmd_result.get_return_code():
+                return RunnableCommandResult(output,
+                                             cmd_result.get_result_environment(),
+                                             cmd_result.get_return_code())
+
+        return stage_outcomes[-1]
+
+
+Redirection = collections.namedtuple('Redirection', ['mode', 'file_name'])
+"""A redirection of a command: `mode` is one of ``<``, ``>`` and ``>>``."""
+
+
+class CommandRedirect(RunnableCommand):
+    """A command whose input is read from a file, or output is written into a file.
+
+    Files are opened in the order of redirections: every ``>`` truncates its file,
+    but only the last redirection of input and the last one of output take effect.
+    Relative file names are relative to the current directory of the environment.
+    The output is written into a file in large blocks
+    (see :func:`streams.open_file_output_stream`); an external command
+    reads and writes the files directly.
+
+    If a file can't be opened, the command does not run, and the result
+    has return code `OPEN_FAILED`. Otherwise, it is the result of
+    the command, with an empty output if the output is redirected.
+
+    Examples::
+        ls > files.txt
+        wc < a.txt >> counts.txt
+    """
 
-        if cmd_left_result.get_return_code():
-            return cmd_left_result
+    INPUT = '<'
+    OUTPUT = '>'
+    APPEND = '>>'
 
-        modified_input = cmd_left_result.get_input_stream()
-        modified_env = cmd_left_result.get_result_environment()
+    OPEN_FAILED = 1
 
-        return self._cmd_right.run(modified_input, modified_env)
+    def __init__(self, command, redirections):
+        """Wrap a command.
+
+        Args:
+            command (:class:`.RunnableCommand`): a command to redirect;
+            redirections (list[:data:`.Redirection`]): its redirections, in order.
+        """
+        self._command = command
+        self._redirections = list(redirections)
+
+    def get_command(self):
+        """Getter for the redirected command"""
+        return self._command
+
+    def get_redirections(self):
+        """Getter for the list of redirections"""
+        return self._redirections
+
+    def changes_environment(self):
+        return self._command.changes_environment()
+
+    def accepts_os_streams(self):
+        return self._command.accepts_os_streams()
+
+    def substitute_args(self, fill_arg):
+        return CommandRedirect(self._command.substitute_args(fill_arg),
+                               [Redirection(mode, fill_arg(file_name))
+                                for mode, file_name in self._redirections])
+
+    def _open_streams(self, env, opened_streams):
+        cmd_input = cmd_output = None
+        for mode, file_name in self._redirections:
+            full_fl_name = os.path.join(env.get_cwd(), file_name)
+            if mode == CommandRedirect.INPUT:
+                cmd_input = open_file_input_stream(full_fl_name)
+            else:
+                cmd_output = open_file_output_stream(full_fl_name, append=mode == CommandRedirect.APPEND)
+            opened_streams.append(cmd_input if mode == CommandRedirect.INPUT else cmd_output)
+        return cmd_input, cmd_output
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
+
+        opened_streams = []
+        try:
+            try:
+                cmd_input, cmd_output = self._open_streams(env, opened_streams)
+            except OSError as ex:
+                SingleCommand._write_error(output, 'Can not open {}: {}.'.format(ex.filename, ex.strerror))
+                return RunnableCommandResult(output, env, CommandRedirect.OPEN_FAILED)
+
+            cmd_result = self._command.run(input_stream if cmd_input is None else cmd_input, env,
+                                           output if cmd_output is None else cmd_output)
+        finally:
+            for stream in opened_streams:
+                stream.close()
+
+        if cmd_output is None:
+            return cmd_result
+        return RunnableCommandResult(output, cmd_result.get_result_environment(),
+                                     cmd_result.get_return_code())
 
 
 class SingleCommand(RunnableCommand):
@@ -153,6 +418,21 @@ class SingleCommand(RunnableCommand):
         """
         self._args_lst = args_lst
 
+    def substitute_args(self, fill_arg):
+        return type(self)([fill_arg(arg) for arg in self._args_lst])
+
+    @staticmethod
+    def _write_error(output, message):
+        """Write an error message, even if nobody reads the output anymore.
+
+        It is the return code that tells about the error, so the command
+        must get to returning it: :class:`exceptions.BrokenPipeException` is ignored.
+        """
+        try:
+            output.write(message)
+        except BrokenPipeException:
+            pass
+
 
 class CommandAssignment(SingleCommand):
     """An environment assignment.
@@ -166,15 +446,17 @@ class CommandAssignment(SingleCommand):
     ``x="a b c"``.
     """
 
-    def run(self, input_stream, env):
-        output = OutputStream()
+    def changes_environment(self):
+        return True
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
         return_code = 0
-        new_env = copy.copy(env)
+        new_env = env.snapshot()
 
         equality_string = self._args_lst[0]
-        logging.debug('Assignment {} is being applied.'.format(equality_string))
-
         first_eq_pos = equality_string.index('=')
         var_name, value = equality_string[:first_eq_pos], equality_string[first_eq_pos + 1:]
+        logging.debug('Assignment to %s is being applied.', var_name)
         new_env.set_var(var_name, value)
         return RunnableCommandResult(output, new_env, return_code)
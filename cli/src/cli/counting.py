@@ -0,0 +1,233 @@
+"""Counting of lines, words and bytes, for :class:`single_command.CommandWc`.
+
+A word is a maximal sequence of bytes that are not whitespace
+in terms of :meth:`str.isspace`, like in words of the decoded
+text: ASCII whitespace and, if the encoding of the shell
+(:data:`streams.ENCODING`) is UTF-8, encoded Unicode whitespace,
+e.g. a no-break space. In other encodings, bytes beyond ASCII
+are never whitespace (they are undecodable for :meth:`str.split`).
+A trailing line without a newline is counted as a line.
+
+Files are memory-mapped and split into *segments* of
+`segment_size` bytes, which can be counted in parallel
+by a pool of processes if there are at least two segments'
+worth of bytes: starting the pool costs more than counting
+a few small files. A segment is read in chunks, so
+memory use does not depend on the size of a file. Borders of
+segments are moved so that they don't split UTF-8 characters. A word that
+crosses a border of two segments is counted in both of them:
+such words are subtracted when the segments are combined.
+"""
+import codecs
+import collections
+import mmap
+import os
+import re
+
+from cli.streams import CHUNK_SIZE, ENCODING
+from cli.workers import make_process_pool
+
+
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+
+Counts = collections.namedtuple('Counts', ['num_lines', 'num_words', 'num_bytes'])
+"""The result of counting."""
+
+_WHITESPACE_BYTES = frozenset(b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f')
+
+# Maps whitespace to b' ' and everything else to b'x': a word starts at every b' x'.
+_WORD_MARKS = bytes(ord(' ') if byte in _WHITESPACE_BYTES else ord('x') for byte in range(256))
+_WORD_MARK = ord('x')
+
+_IS_UTF8 = codecs.lookup(ENCODING).name == 'utf-8'
+
+# Whitespace beyond ASCII, encoded in UTF-8 (U+0085, U+00A0, U+1680, U+2000..U+200A,
+# U+2028, U+2029, U+202F, U+205F, U+3000), with the bytes it starts with.
+# Every pattern starts with literal bytes, which the regex engine finds fast.
+_UNICODE_WHITESPACE_REGEXES = [(b'\xc2', re.compile(rb'\xc2[\x85\xa0]')),
+                               (b'\xe1', re.compile(rb'\xe1\x9a\x80')),
+                               (b'\xe2', re.compile(rb'\xe2\x80[\x80-\x8a\xa8\xa9\xaf]')),
+                               (b'\xe2', re.compile(rb'\xe2\x81\x9f')),
+                               (b'\xe3', re.compile(rb'\xe3\x80\x80'))]
+# A start of such whitespace at the end of a chunk: it may continue in the next one.
+_WHITESPACE_START_REGEX = re.compile(rb'(?:\xc2|\xe1\x9a?|\xe2[\x80\x81]?|\xe3\x80?)\Z')
+
+_MAX_CHAR_SIZE = 4
+
+# Counts of a part of the data: whether it starts and ends within words,
+# and its last byte (empty if the part is empty).
+_PartCounts = collections.namedtuple('_PartCounts', ['num_lines', 'num_words', 'num_bytes',
+                                                     'starts_in_word', 'ends_in_word', 'last_byte'])
+
+
+def _get_word_marks(data):
+    if _IS_UTF8:
+        for lead, whitespace_regex in _UNICODE_WHITESPACE_REGEXES:
+            if lead in data:
+                data = whitespace_regex.sub(b' ', data)
+    return data.translate(_WORD_MARKS)
+
+
+def count_words(data, last_was_char=False):
+    """Count words in bytes, which may continue previous ones.
+
+    The bytes are not iterated over in Python: they are translated into
+    marks of whitespace and the rest, and starts of words are counted
+    with :meth:`bytes.count`, both in C. Unicode whitespace is replaced
+    with spaces first, only if the data may contain it.
+    A whitespace character split between two calls is not recognized.
+
+    Args:
+        data (bytes): bytes to count words in;
+        last_was_char (bool): whether the previous bytes ended with
+            a non-space character. If so, a word at the beginning
+            of `data` is a continuation of their last word.
+
+    Returns:
+        tuple(int, bool): the number of words that start in `data`,
+        and whether `data` ends with a non-space character.
+    """
+    if not data:
+        return 0, last_was_char
+
+    marks = _get_word_marks(data)
+    num_words = marks.count(b' x')
+    if marks[0] == _WORD_MARK and not last_was_char:
+        num_words += 1
+
+    return num_words, marks[-1] == _WORD_MARK
+
+
+def _count_parts(chunks):
+    num_lines = 0
+    num_words = 0
+    num_bytes = 0
+    last_was_char = False
+    # The first bytes: whitespace is at most a character long.
+    head = b''
+    last_byte = b''
+    # A start of whitespace at the end of the previous chunk, counted with the next one.
+    carried = b''
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        num_lines += chunk.count(b'\n')
+        num_bytes += len(chunk)
+        last_byte = chunk[-1:]
+        if len(head) < _MAX_CHAR_SIZE:
+            head += chunk[:_MAX_CHAR_SIZE - len(head)]
+
+        data = carried + chunk if carried else chunk
+        carried = b''
+        if _IS_UTF8:
+            start_match = _WHITESPACE_START_REGEX.search(data, len(data) - _MAX_CHAR_SIZE + 1)
+            if start_match is not None:
+                carried = start_match.group()
+                data = data[:start_match.start()]
+
+        chunk_words, last_was_char = count_words(data, last_was_char)
+        num_words += chunk_words
+
+    chunk_words, last_was_char = count_words(carried, last_was_char)
+    num_words += chunk_words
+
+    starts_in_word = bool(head) and _get_word_marks(head)[0] == _WORD_MARK
+    return _PartCounts(num_lines, num_words, num_bytes, starts_in_word, last_was_char, last_byte)
+
+
+def _combine_parts(parts):
+    num_lines = 0
+    num_words = 0
+    num_bytes = 0
+    ends_in_word = False
+    last_byte = b''
+
+    for part in parts:
+        num_lines += part.num_lines
+        num_words += part.num_words
+        num_bytes += part.num_bytes
+        if not part.num_bytes:
+            continue
+        if ends_in_word and part.starts_in_word:
+            num_words -= 1
+        ends_in_word = part.ends_in_word
+        last_byte = part.last_byte
+
+    if last_byte not in (b'', b'\n'):
+        num_lines += 1
+
+    return Counts(num_lines, num_words, num_bytes)
+
+
+def count_chunks(chunks):
+    """Count lines, words and bytes in an iterable of bytes chunks.
+
+    Returns:
+        :class:`.Counts`.
+    """
+    return _combine_parts([_count_parts(chunks)])
+
+
+def _read_mapped_chunks(mapped_file, start, end):
+    for chunk_start in range(start, end, CHUNK_SIZE):
+        yield mapped_file[chunk_start:min(chunk_start + CHUNK_SIZE, end)]
+
+
+def _skip_continuation_bytes(mapped_file, idx):
+    """Move a border of segments forward to a start of a UTF-8 character (or of invalid bytes)."""
+    end_idx = min(idx + _MAX_CHAR_SIZE - 1, len(mapped_file))
+    while idx < end_idx and 0x80 <= mapped_file[idx] < 0xc0:
+        idx += 1
+    return idx
+
+
+def _count_segment(file_name, start, end):
+    """Count a segment ``[start, end)`` of a file; this may run in another process.
+
+    Both borders are moved in the same way as in the neighbouring segments.
+    """
+    with open(file_name, 'rb') as opened_file:
+        with mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            if start > 0:
+                start = _skip_continuation_bytes(mapped_file, start)
+            end = _skip_continuation_bytes(mapped_file, end)
+            return _count_parts(_read_mapped_chunks(mapped_file, start, end))
+
+
+def _get_segments(file_name, segment_size):
+    file_size = os.path.getsize(file_name)
+    return [(file_name, start, min(start + segment_size, file_size))
+            for start in range(0, file_size, segment_size)]
+
+
+def count_files(file_names, num_workers=1, segment_size=DEFAULT_SEGMENT_SIZE):
+    """Count lines, words and bytes in every file.
+
+    Args:
+        file_names (list of str): names of regular files;
+        num_workers (int): how many processes count segments;
+            1 means counting in this process. The processes are
+            only started if the files have at least two segments of data.
+        segment_size (int): how many bytes of a file are counted by one task.
+
+    Returns:
+        list of :class:`.Counts`: counts for every file, in order.
+    """
+    segments_by_file = [_get_segments(file_name, segment_size) for file_name in file_names]
+    all_segments = [segment for segments in segments_by_file for segment in segments]
+
+    total_size = sum(end - start for _, start, end in all_segments)
+
+    if num_workers > 1 and len(all_segments) > 1 and total_size >= 2 * segment_size:
+        with make_process_pool(min(num_workers, len(all_segments))) as executor:
+            all_parts = list(executor.map(_count_segment, *zip(*all_segments)))
+    else:
+        all_parts = [_count_segment(*segment) for segment in all_segments]
+
+    counts = []
+    first_part_idx = 0
+    for segments in segments_by_file:
+        counts.append(_combine_parts(all_parts[first_part_idx:first_part_idx + len(segments)]))
+        first_part_idx += len(segments)
+    return counts
@@ -3,19 +3,35 @@ import pathlib
 import os
 import logging
 
+from cli.persistent_map import PersistentMap
+
 
 class Environment:
     """A shell environment, in which commands run.
 
     It is a collection of pairs <var_name, var_value>
     plus a current directory.
+
+    Variables are kept in a :class:`persistent_map.PersistentMap`,
+    so a snapshot (or a copy) of an environment costs O(1),
+    and an assignment costs O(log n): the snapshot is not affected
+    by later changes of the environment, and vice versa.
     """
 
     def __init__(self):
         """Create an empty environment"""
-        self._var_to_value = dict()
+        self._var_to_value = PersistentMap()
         self._current_working_directory = pathlib.Path(os.getcwd())
 
+    def snapshot(self):
+        """Make an independent copy of the environment in O(1)."""
+        env_copy = Environment.__new__(Environment)
+        env_copy._var_to_value = self._var_to_value
+        env_copy._current_working_directory = self._current_working_directory
+        return env_copy
+
+    __copy__ = snapshot
+
     def get_var(self, name):
         """Get variable value by name"""
         return self._var_to_value.get(name, '')
@@ -27,7 +43,7 @@ class Environment:
             name (str): variable name.
             value (str): variable value (it should be string).
         """
-        self._var_to_value[name] = value
+        self._var_to_value = self._var_to_value.set(name, value)
 
     def get_cwd(self):
         """Get string representation of current working directory"""
@@ -47,5 +63,5 @@ class Environment:
         new_path = self._current_working_directory.joinpath(dir_name)
 
         self._current_working_directory = new_path
-        logging.info('Current working directory changed to {}'.format(new_path))
+        logging.info('Current working directory changed to %s', new_path)
 
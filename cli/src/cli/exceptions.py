@@ -19,6 +19,15 @@ class LexException(ShellException):
     pass
 
 
+class BrokenPipeException(ShellException):
+    """This exception is raised when a command writes to a stream whose reader has stopped reading.
+
+    It is a signal for the command to stop producing output (like SIGPIPE).
+    """
+
+    pass
+
+
 class ExitException(ShellException):
     """This exception is raised when `exit` command is executed"""
 
@@ -0,0 +1,145 @@
+"""A helper process that starts external commands for the shell.
+
+Forking the shell itself costs more as the shell grows (its memory
+has to be mapped into the child), so :class:`launcher.ForkServerLauncher`
+starts this small helper once and sends it spawn requests over a Unix
+socket. The stdin and stdout of a command are passed along with a request
+(``SCM_RIGHTS``). The helper starts the command with :func:`os.posix_spawn`
+(or fork + exec if it is not available), reports its pid, and later
+reports its return code.
+
+Messages are JSON objects, one per packet:
+
+    - request ``{"args": [...]}`` with two file descriptors: stdin and stdout;
+    - reply ``{"type": "spawned", "pid": pid}`` or
+      ``{"type": "error", "errno": errno, "strerror": message}``;
+    - notification ``{"type": "exited", "pid": pid, "return_code": code}``.
+
+This module is run as a script in a fresh interpreter, so it
+imports nothing from the shell. POSIX only.
+"""
+import array
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+
+
+_MAX_MESSAGE_SIZE = 64 * 1024
+_MAX_FDS = 2
+
+# Python ignores these signals, and children would inherit that: e.g. a process
+# writing to a closed pipe must be killed by SIGPIPE, not get EPIPE. Like in subprocess.
+_DEFAULT_SIGNALS = tuple(getattr(signal, name) for name in ['SIGPIPE', 'SIGXFSZ'] if hasattr(signal, name))
+
+
+def send_message(sock, message, fds=()):
+    """Send a JSON message along with file descriptors."""
+    data = json.dumps(message).encode('ascii')
+    ancdata = []
+    if fds:
+        ancdata.append((socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds)))
+    sock.sendmsg([data], ancdata)
+
+
+def recv_message(sock):
+    """Receive a JSON message and file descriptors.
+
+    Returns:
+        (message, list of fds), or (None, []) if the other side closed the socket.
+    """
+    fds = array.array('i')
+    data, ancdata, _, _ = sock.recvmsg(_MAX_MESSAGE_SIZE, socket.CMSG_SPACE(_MAX_FDS * fds.itemsize))
+    for cmsg_level, cmsg_type, cmsg_data in ancdata:
+        if cmsg_level == socket.SOL_SOCKET and cmsg_type == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[:len(cmsg_data) - len(cmsg_data) % fds.itemsize])
+
+    if not data:
+        return None, list(fds)
+    return json.loads(data.decode('ascii')), list(fds)
+
+
+def _get_return_code(status):
+    """Convert a status of :func:`os.waitpid` to a return code, like in :mod:`subprocess`."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _spawn(args, stdin_fd, stdout_fd):
+    """Start a process, return its pid. Raises OSError if the command can't be executed."""
+    if hasattr(os, 'posix_spawn'):
+        file_actions = [(os.POSIX_SPAWN_DUP2, stdin_fd, 0), (os.POSIX_SPAWN_DUP2, stdout_fd, 1)]
+        return os.posix_spawn(args[0], args, os.environ, file_actions=file_actions,
+                              setsigdef=_DEFAULT_SIGNALS)
+
+    # The child reports a failed exec through this pipe; a successful exec closes it.
+    errors_read_fd, errors_write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.dup2(stdin_fd, 0)
+            os.dup2(stdout_fd, 1)
+            for sig in _DEFAULT_SIGNALS:
+                signal.signal(sig, signal.SIG_DFL)
+            os.execv(args[0], args)
+        except OSError as ex:
+            os.write(errors_write_fd, str(ex.errno).encode('ascii'))
+        finally:
+            os._exit(127)
+
+    os.close(errors_write_fd)
+    with os.fdopen(errors_read_fd, 'rb') as errors_file:
+        error = errors_file.read()
+    if error:
+        os.waitpid(pid, 0)
+        error_code = int(error)
+        raise OSError(error_code, os.strerror(error_code))
+    return pid
+
+
+def _wait_children(sock, send_lock, num_children):
+    """Report return codes of the children as they exit."""
+    while True:
+        num_children.acquire()
+        pid, status = os.waitpid(-1, 0)
+        with send_lock:
+            send_message(sock, {'type': 'exited', 'pid': pid, 'return_code': _get_return_code(status)})
+
+
+def serve(sock):
+    """Process spawn requests until the socket is closed by the shell."""
+    send_lock = threading.Lock()
+    # Released once per started child, so that the waiter does not wait for nothing.
+    num_children = threading.Semaphore(0)
+    threading.Thread(target=_wait_children, args=(sock, send_lock, num_children), daemon=True).start()
+
+    while True:
+        request, fds = recv_message(sock)
+        if request is None:
+            break
+
+        # The descriptors must not leak into other children: e.g. a leaked
+        # write end of a pipe would keep its reader from seeing the end of input.
+        for fd in fds:
+            os.set_inheritable(fd, False)
+
+        try:
+            reply = {'type': 'spawned', 'pid': _spawn(request['args'], fds[0], fds[1])}
+        except OSError as ex:
+            reply = {'type': 'error', 'errno': ex.errno, 'strerror': ex.strerror}
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+        with send_lock:
+            send_message(sock, reply)
+        if reply['type'] == 'spawned':
+            num_children.release()
+
+
+if __name__ == '__main__':
+    # Arguments: a descriptor of the socket and its type.
+    serve(socket.socket(socket.AF_UNIX, int(sys.argv[2]), fileno=int(sys.argv[1])))
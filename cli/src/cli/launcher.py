@@ -0,0 +1,233 @@
+"""Launching of external processes.
+
+:class:`single_command.CommandExternal` does not create processes
+by itself: it calls the current *launcher*. A launcher has the
+interface of :class:`subprocess.Popen`, at least the part that
+the command uses::
+
+    process = launcher(args, stdin=..., stdout=...)
+    process.stdin.write(data); process.stdin.close()
+    process.stdout.read1(size); process.stdout.close()
+    process.wait()
+
+By default, it is :class:`subprocess.Popen` itself. A front end
+may set another one, e.g. :class:`.AsyncioLauncher`, which creates
+processes via an asyncio event loop, or :class:`.ForkServerLauncher`,
+which asks a small helper process to create them.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+from cli import fork_server
+
+
+_launcher = subprocess.Popen
+
+
+def get_launcher():
+    """Get the callable which is used to start external processes."""
+    return _launcher
+
+
+def set_launcher(launcher):
+    """Set the callable which is used to start external processes.
+
+    Returns:
+        the previous launcher (e.g. to restore it later).
+    """
+    global _launcher
+    previous_launcher = _launcher
+    _launcher = launcher
+    return previous_launcher
+
+
+class AsyncioLauncher:
+    """A launcher that creates processes with :func:`asyncio.create_subprocess_exec`.
+
+    The event loop runs in some other thread, and the launcher
+    (as well as the processes it returns) is used from threads
+    that run commands: starting and waiting for a process are
+    coroutines that run in the loop. The process' stdin and stdout
+    are ordinary OS pipes, read and written by the calling threads.
+    """
+
+    def __init__(self, loop):
+        """Create a launcher which runs processes in `loop`."""
+        self._loop = loop
+
+    def __call__(self, args, stdin=None, stdout=None):
+        with _StdPipes(stdin, stdout) as std_pipes:
+            process = self._run(asyncio.create_subprocess_exec(
+                *args, stdin=std_pipes.process_stdin, stdout=std_pipes.process_stdout))
+            return _AsyncioProcess(self._run, process, *std_pipes.get_shell_files())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+class _AsyncioProcess:
+    """An adapter of :class:`asyncio.subprocess.Process` to the interface of Popen."""
+
+    def __init__(self, run, process, stdin, stdout):
+        self._run = run
+        self._process = process
+        self.pid = process.pid
+        self.stdin = stdin
+        self.stdout = stdout
+
+    def wait(self):
+        return self._run(self._process.wait())
+
+
+class _StdPipes:
+    """OS pipes for stdin and stdout of a process, for those of them which are ``subprocess.PIPE``.
+
+    Used as a context manager around starting the process: the ends
+    of the pipes that are given to the process are closed on exit, as well
+    as the ends kept by the shell if the process was not started.
+    """
+
+    def __init__(self, stdin, stdout):
+        self._shell_stdin = self._shell_stdout = None
+        self._process_fds = []
+
+        if stdin == subprocess.PIPE:
+            stdin, self._shell_stdin = os.pipe()
+            self._process_fds.append(stdin)
+        if stdout == subprocess.PIPE:
+            self._shell_stdout, stdout = os.pipe()
+            self._process_fds.append(stdout)
+
+        self.process_stdin = stdin
+        self.process_stdout = stdout
+
+    def get_shell_files(self):
+        """Get (stdin, stdout) files of the process for the shell to write and read (or None-s)."""
+        stdin_file = None if self._shell_stdin is None else os.fdopen(self._shell_stdin, 'wb')
+        stdout_file = None if self._shell_stdout is None else os.fdopen(self._shell_stdout, 'rb')
+        self._shell_stdin = self._shell_stdout = None
+        return stdin_file, stdout_file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for fd in self._process_fds:
+            os.close(fd)
+        for fd in [self._shell_stdin, self._shell_stdout]:
+            if fd is not None:
+                os.close(fd)
+        return False
+
+
+class ForkServerLauncher:
+    """A launcher that creates processes in a helper process, see :mod:`fork_server`.
+
+    The cost of starting a command does not depend on the size
+    of the shell then. The helper is started on the first call;
+    call :meth:`close` to stop it. POSIX only.
+    """
+
+    def __init__(self):
+        """Create a launcher; the helper is not started yet."""
+        # One spawn request at a time, so that replies come in order.
+        self._spawn_lock = threading.Lock()
+        self._replies_cond = threading.Condition()
+        self._spawn_reply = None
+        self._return_codes = dict()
+        self._is_helper_alive = False
+        self._sock = None
+        self._helper = None
+
+    def _start_helper(self):
+        sock_type = getattr(socket, 'SOCK_SEQPACKET', socket.SOCK_DGRAM)
+        shell_sock, helper_sock = socket.socketpair(socket.AF_UNIX, sock_type)
+        with helper_sock:
+            # -I: the helper must not see the shell's modules (e.g. `cli/parser.py`) as top-level ones.
+            self._helper = subprocess.Popen(
+                [sys.executable, '-I', '-S', fork_server.__file__, str(helper_sock.fileno()), str(int(sock_type))],
+                stdin=subprocess.DEVNULL, pass_fds=(helper_sock.fileno(),))
+
+        self._sock = shell_sock
+        self._is_helper_alive = True
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def _read_replies(self):
+        while True:
+            try:
+                message, _ = fork_server.recv_message(self._sock)
+            except OSError:
+                message = None
+
+            with self._replies_cond:
+                if message is None:
+                    self._is_helper_alive = False
+                elif message['type'] == 'exited':
+                    self._return_codes[message['pid']] = message['return_code']
+                else:
+                    self._spawn_reply = message
+                self._replies_cond.notify_all()
+
+            if message is None:
+                return
+
+    def __call__(self, args, stdin=None, stdout=None):
+        with _StdPipes(stdin, stdout) as std_pipes:
+            stdin = sys.stdin.fileno() if std_pipes.process_stdin is None else std_pipes.process_stdin
+            stdout = sys.stdout.fileno() if std_pipes.process_stdout is None else std_pipes.process_stdout
+
+            with self._spawn_lock:
+                if self._sock is None:
+                    self._start_helper()
+                fork_server.send_message(self._sock, {'args': list(args)}, [stdin, stdout])
+
+                with self._replies_cond:
+                    while self._spawn_reply is None and self._is_helper_alive:
+                        self._replies_cond.wait()
+                    reply, self._spawn_reply = self._spawn_reply, None
+
+            if reply is None:
+                raise ChildProcessError('The fork server has exited')
+            if reply['type'] == 'error':
+                raise OSError(reply['errno'], reply['strerror'], args[0])
+
+            return _ForkServerProcess(self, reply['pid'], *std_pipes.get_shell_files())
+
+    def wait(self, pid):
+        """Wait for a process started by this launcher to exit, return its return code."""
+        with self._replies_cond:
+            while pid not in self._return_codes:
+                if not self._is_helper_alive:
+                    raise ChildProcessError('The fork server has exited')
+                self._replies_cond.wait()
+            return self._return_codes.pop(pid)
+
+    def close(self):
+        """Stop the helper process. Commands which are still running are not affected."""
+        with self._spawn_lock:
+            if self._sock is None:
+                return
+            self._sock.shutdown(socket.SHUT_RDWR)
+            self._sock.close()
+            self._helper.wait()
+            self._sock = None
+
+
+class _ForkServerProcess:
+    """A process started by :class:`.ForkServerLauncher`, with the interface of Popen."""
+
+    def __init__(self, fork_server_launcher, pid, stdin, stdout):
+        self._launcher = fork_server_launcher
+        self._return_code = None
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+
+    def wait(self):
+        if self._return_code is None:
+            self._return_code = self._launcher.wait(self.pid)
+        return self._return_code
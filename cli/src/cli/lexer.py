@@ -7,6 +7,7 @@ stream, grouped by some "meaning".
 """
 import enum
 import logging
+import re
 
 from cli.exceptions import LexException
 
@@ -22,7 +23,10 @@ class LexemType(enum.Enum):
        - ``STRING`` is a non-space sequence of characters;
        - ``ASSIGNMENT`` is a string of the form "smth=smth_other" (without quotes),
             `smth_other` can be empty;
-       - ``PIPE`` is a `|` symbol.
+       - ``PIPE`` is a `|` symbol;
+       - ``REDIRECT_INPUT`` is a `<` symbol;
+       - ``REDIRECT_OUTPUT`` is a `>` symbol;
+       - ``REDIRECT_APPEND`` is a `>>` symbol.
 
     """
 
@@ -30,6 +34,9 @@ class LexemType(enum.Enum):
     STRING = 2
     ASSIGNMENT = 3
     PIPE = 4
+    REDIRECT_INPUT = 5
+    REDIRECT_OUTPUT = 6
+    REDIRECT_APPEND = 7
 
 
 class Lexem:
@@ -38,8 +45,16 @@ class Lexem:
     A Lexem provides interface for querying it's
     position in the string (for producing meaningful error
     messages), it's type and for getting it's string representation.
+
+    Lexems are many (one per word of a line), so they are compact:
+    a lexem made by :class:`.Lexer` (see :meth:`from_source`) keeps only
+    its offset and length in the lexed string, and its value is sliced out
+    on the first :meth:`get_value` call. (A length, unlike an end
+    offset, is usually small: such ints are not allocated by Python.)
     """
 
+    __slots__ = ('_tp', '_source', '_start_idx', '_length', '_value')
+
     def __init__(self, tp, val, start_idx, end_idx):
         """Create a lexem out of type, string, start and end indices.
 
@@ -50,19 +65,44 @@ class Lexem:
             end_idx (int): ending index, zero-based.
         """
         self._tp = tp
-        self._val = val
+        self._source = None
         self._start_idx = start_idx
-        self._end_idx = end_idx
+        self._length = end_idx - start_idx + 1
+        self._value = val[1:-1] if tp == LexemType.QUOTED_STRING else val
+
+    @staticmethod
+    def from_source(tp, source, start_idx, end_idx):
+        """Create a lexem which is a part of a string, without copying it.
+
+        Args:
+            tp (:class:`.LexemType`): a type of lexem;
+            source (str): the lexed string;
+            start_idx (int): starting index of the lexem in `source`, zero-based;
+            end_idx (int): ending index of the lexem in `source`, zero-based.
+        """
+        lexem = Lexem.__new__(Lexem)
+        lexem._tp = tp
+        lexem._source = source
+        lexem._start_idx = start_idx
+        lexem._length = end_idx - start_idx + 1
+        lexem._value = None
+        return lexem
 
     def get_value(self):
         """Return string representation of this lexem.
 
         Quotes are stripped from QUOTED_STRING.
         """
-        if self.get_type() == LexemType.QUOTED_STRING:
-            return self._val[1:-1]
+        value = self._value
+        if value is None:
+            start_idx = self._start_idx
+            if self._tp == LexemType.QUOTED_STRING:
+                value = self._source[start_idx + 1:start_idx + self._length - 1]
+            else:
+                value = self._source[start_idx:start_idx + self._length]
+            self._value = value
 
-        return self._val
+        return value
 
     def get_type(self):
         """Return type of this lexem.
@@ -72,10 +112,10 @@ class Lexem:
     def get_position(self):
         """Return string representation of the position.
 
-        For example, if ``self._start_idx = 1`` and ``self.end_idx = 5``,
+        For example, if the lexem starts at index 1 and ends at index 5,
         then this function will return ``(1:5)``.
         """
-        return '({}:{})'.format(self._start_idx, self._end_idx)
+        return '({}:{})'.format(self._start_idx, self._start_idx + self._length - 1)
 
 
 class Lexer:
@@ -84,8 +124,28 @@ class Lexer:
     Given a string, we want to split it into meaningful
     (more or less) tokens.
     Possible tokens are described in :class:`.LexemType` docstring.
+
+    Lexing is a single left-to-right pass of :data:`_LEXEM_REGEX`
+    over the string: every match is either whitespace or a lexem.
     """
 
+    # A string lexem can't start with `|`, `<` or `>`, but it may contain them,
+    # e.g. `a|b` is a single string.
+    _LEXEM_REGEX = re.compile(r"""
+        (?P<whitespace>\s+)
+      | (?P<pipe>\|)
+      | (?P<redirect>>>|[<>])
+      | (?P<quoted_string>"[^"]*"|'[^']*')
+      | (?P<unterminated_quote>["'])
+      | (?P<string>[^\s"'|<>][^\s"']*)
+    """, re.VERBOSE)
+
+    _REDIRECT_TYPES = {
+        '<': LexemType.REDIRECT_INPUT,
+        '>': LexemType.REDIRECT_OUTPUT,
+        '>>': LexemType.REDIRECT_APPEND,
+    }
+
     @staticmethod
     def get_lexemes(raw_str):
         """Scan the string left-to-right, output list of lexemes.
@@ -100,74 +160,29 @@ class Lexer:
             :class:`exceptions.LexException`: if some quoted string started but never ends.
         """
         lexem_list = []
-        unprocessed_part = raw_str.lstrip()
-        orig_size = len(raw_str)
-
-        while unprocessed_part:
-            start_index = orig_size - len(unprocessed_part)
-            next_lexem, unprocessed_part = Lexer._get_first_lexem(unprocessed_part,
-                                                                  start_index)
-            unprocessed_part = unprocessed_part.lstrip()
-            lexem_list.append(next_lexem)
-
-        logging.debug('Lexer: {} was lexed '\
-                      'to {}'.format(raw_str,
-                                     ','.join(map(lambda lex: lex.get_type().name, lexem_list))))
-        return lexem_list
-
-    @staticmethod
-    def _get_first_lexem(raw_str, start_idx_in_original):
-        """Get the first lexem of the string.
-
-        Args:
-            raw_str (str): the string to be anaylzed;
-            start_idx_in_original (int): an index of this
-                string in an original string
-                (of which this string is a part).
 
-        Invariant: string is not empty, it does not start with whitespace.
-        """
-        raw_len = len(raw_str)
-
-        if raw_str[0] == '|':
-            return (Lexem(LexemType.PIPE, '|', start_idx_in_original,
-                          start_idx_in_original),
-                    raw_str[1:])
-        elif raw_str[0] in ('"', "'"):
-            next_quote_idx = 1
+        for match in Lexer._LEXEM_REGEX.finditer(raw_str):
+            kind = match.lastgroup
+            if kind == 'whitespace':
+                continue
+
+            start_idx, end_idx = match.span()
+            if kind == 'pipe':
+                lexem_type = LexemType.PIPE
+            elif kind == 'redirect':
+                lexem_type = Lexer._REDIRECT_TYPES[match.group()]
+            elif kind == 'quoted_string':
+                lexem_type = LexemType.QUOTED_STRING
+            elif kind == 'unterminated_quote':
+                raise LexException('A non-terminating quoted string starting '\
+                                   'at position {}'.format(start_idx))
+            elif raw_str.find('=', start_idx, end_idx) != -1:
+                lexem_type = LexemType.ASSIGNMENT
+            else:
+                lexem_type = LexemType.STRING
 
-            while next_quote_idx < raw_len:
-                if raw_str[next_quote_idx] == raw_str[0]:
-                    break
-                next_quote_idx += 1
+            # Lexems refer to `raw_str`, nothing is copied out of it.
+            lexem_list.append(Lexem.from_source(lexem_type, raw_str, start_idx, end_idx - 1))
 
-            if next_quote_idx == raw_len:
-                raise LexException('A non-terminating quoted string starting '\
-                                   'at position {}'.format(start_idx_in_original))
-
-            return (Lexem(LexemType.QUOTED_STRING, raw_str[:next_quote_idx + 1],
-                          start_idx_in_original,
-                          start_idx_in_original + next_quote_idx),
-                    raw_str[next_quote_idx + 1:])
-        else:
-            whitespace_or_quote_idx = 1
-
-            while whitespace_or_quote_idx < raw_len:
-                cur_char = raw_str[whitespace_or_quote_idx]
-                if cur_char.isspace() or cur_char in ('"', "'"):
-                    break
-                whitespace_or_quote_idx += 1
-
-            lexem_val = raw_str[:whitespace_or_quote_idx]
-            rest_string = raw_str[whitespace_or_quote_idx:]
-
-            if '=' in lexem_val:
-                return (Lexem(LexemType.ASSIGNMENT, lexem_val,
-                              start_idx_in_original,
-                              start_idx_in_original + whitespace_or_quote_idx - 1),
-                        rest_string)
-
-            return (Lexem(LexemType.STRING, lexem_val,
-                          start_idx_in_original,
-                          start_idx_in_original + whitespace_or_quote_idx - 1),
-                    rest_string)
+        logging.debug('Lexer: %d characters were lexed to %d lexemes', len(raw_str), len(lexem_list))
+        return lexem_list
@@ -10,7 +10,7 @@ is a tree that represents a program.
 In our case, the result will be
 :class:`commands.RunnableCommand`.
 """
-from cli.commands import CommandChainPipe, CommandAssignment
+from cli.commands import CommandChainPipe, CommandAssignment, CommandRedirect, Redirection
 from cli.single_command import SingleCommandFactory
 from cli.exceptions import ParseException
 from cli.lexer import LexemType
@@ -25,6 +25,14 @@ class Parser:
     command alongway.
     """
 
+    _ARG_TYPES = (LexemType.QUOTED_STRING, LexemType.STRING, LexemType.ASSIGNMENT)
+
+    _REDIRECTION_MODES = {
+        LexemType.REDIRECT_INPUT: CommandRedirect.INPUT,
+        LexemType.REDIRECT_OUTPUT: CommandRedirect.OUTPUT,
+        LexemType.REDIRECT_APPEND: CommandRedirect.APPEND,
+    }
+
     @staticmethod
     def build_command(lexemes):
         """Build :class:`commands.RunnableCommand` out of list of lexemes.
@@ -34,88 +42,117 @@ class Parser:
             <start> ::= <command> (PIPE <command>)*
             <command> ::= <assignment> | <single_command>
             <assignment> ::= ASSIGNMENT
-            <single_command> ::= STRING (STRING | QUOTED_STRING | ASSIGNMENT)*
+            <single_command> ::= STRING (STRING | QUOTED_STRING | ASSIGNMENT | <redirection>)*
+            <redirection> ::= (REDIRECT_INPUT | REDIRECT_OUTPUT | REDIRECT_APPEND) (STRING | QUOTED_STRING)
 
-        where ASSIGNMENT, QUOTED_STRING, STRING and PIPE are lexemes.
+        where ASSIGNMENT, QUOTED_STRING, STRING, PIPE and REDIRECT_* are lexemes.
 
         Every rule is implemented as a static method with name _parse_`smth`.
-        It returns a pair:
+        It accepts the list of lexemes and the index of the first unparsed one,
+        and returns a pair:
 
             - a resulting :class:`commands.RunnableCommand`
-            - a list of unparsed lexemes
+            - an index of the first lexem it did not parse
+
+        The list of lexemes itself is never copied.
         """
-        runnable, unparsed_lexemes = Parser._parse_start(lexemes)
+        runnable, unparsed_idx = Parser._parse_start(lexemes, 0)
 
-        if unparsed_lexemes:
+        if unparsed_idx < len(lexemes):
             raise ParseException('Not all lexemes were parsed. The first starts '\
-                                 'at {}'.format(unparsed_lexemes[0].get_position()))
+                                 'at {}'.format(lexemes[unparsed_idx].get_position()))
 
         return runnable
 
     @staticmethod
-    def first_lex_matches_type(lexemes, tp):
-        return lexemes and lexemes[0].get_type() == tp
-            
+    def first_lex_matches_type(lexemes, tp, lexem_idx=0):
+        """Check whether the lexem at `lexem_idx` exists and is of type `tp`."""
+        return lexem_idx < len(lexemes) and lexemes[lexem_idx].get_type() == tp
+
     @staticmethod
-    def _consume_one_lexem(lexem_list, desired_lexem_type):
-        """Consume a lexem of the desired type. Return list of lexemes without consumed one.
+    def _consume_one_lexem(lexemes, lexem_idx, desired_lexem_type):
+        """Consume a lexem of the desired type. Return index of the lexem after consumed one.
 
         Raises:
-            ParseException, if the list is empty or the first lexem is not
-                of a type `desired_lexem_type`.
+            ParseException, if there are no lexemes left or the lexem
+                at `lexem_idx` is not of a type `desired_lexem_type`.
         """
-        if not lexem_list:
+        if lexem_idx >= len(lexemes):
             raise ParseException('Expected lexem of type {}, found ' \
                                  'none.'.format(desired_lexem_type.name))
 
-        if lexem_list[0].get_type() != desired_lexem_type:
+        if lexemes[lexem_idx].get_type() != desired_lexem_type:
             raise ParseException('Expected lexem of type {}, found '\
                                  'lexem of type {}.'.format(desired_lexem_type.name,
-                                                            lexem_list[0].get_type().name))
+                                                            lexemes[lexem_idx].get_type().name))
 
-        return lexem_list[1:]
+        return lexem_idx + 1
 
     @staticmethod
-    def _parse_start(lexemes):
-        first_command, unparsed_lexemes = Parser._parse_command(lexemes)
+    def _parse_start(lexemes, lexem_idx):
+        first_command, lexem_idx = Parser._parse_command(lexemes, lexem_idx)
 
-        result_command = first_command
-        while unparsed_lexemes:
-            unparsed_lexemes = Parser._consume_one_lexem(unparsed_lexemes, LexemType.PIPE)
-            current_command, unparsed_lexemes = Parser._parse_command(unparsed_lexemes)
+        commands = [first_command]
+        while lexem_idx < len(lexemes):
+            lexem_idx = Parser._consume_one_lexem(lexemes, lexem_idx, LexemType.PIPE)
+            current_command, lexem_idx = Parser._parse_command(lexemes, lexem_idx)
+            commands.append(current_command)
 
-            result_command = CommandChainPipe(result_command, current_command)
+        if len(commands) == 1:
+            return first_command, lexem_idx
 
-        return result_command, unparsed_lexemes
+        return CommandChainPipe(*commands), lexem_idx
 
     @staticmethod
-    def _parse_command(lexemes):
-        if Parser.first_lex_matches_type(lexemes, LexemType.ASSIGNMENT):
-            return Parser._parse_assignment(lexemes)
+    def _parse_command(lexemes, lexem_idx):
+        if Parser.first_lex_matches_type(lexemes, LexemType.ASSIGNMENT, lexem_idx):
+            return Parser._parse_assignment(lexemes, lexem_idx)
 
-        return Parser._parse_single_command(lexemes)
+        return Parser._parse_single_command(lexemes, lexem_idx)
 
 
     @staticmethod
-    def _parse_assignment(lexemes):
-        unprocessed_lexemes = Parser._consume_one_lexem(lexemes, LexemType.ASSIGNMENT)
-        command = CommandAssignment([lexemes[0].get_value()])
-        return command, unprocessed_lexemes
+    def _parse_assignment(lexemes, lexem_idx):
+        next_idx = Parser._consume_one_lexem(lexemes, lexem_idx, LexemType.ASSIGNMENT)
+        command = CommandAssignment([lexemes[lexem_idx].get_value()])
+        return command, next_idx
 
     @staticmethod
-    def _parse_single_command(lexemes):
-        rest_lexemes = Parser._consume_one_lexem(lexemes, LexemType.STRING)
-
-        cmd_name_and_args = [lexemes[0]]
-        while rest_lexemes:
-            first_lex_type = rest_lexemes[0].get_type()
-
-            if first_lex_type in (LexemType.QUOTED_STRING, LexemType.STRING,
-                                  LexemType.ASSIGNMENT):
-                cmd_name_and_args.append(rest_lexemes[0])
-                rest_lexemes = Parser._consume_one_lexem(rest_lexemes, first_lex_type)
+    def _parse_single_command(lexemes, lexem_idx):
+        args_end_idx = Parser._consume_one_lexem(lexemes, lexem_idx, LexemType.STRING)
+
+        num_lexemes = len(lexemes)
+        while args_end_idx < num_lexemes and lexemes[args_end_idx].get_type() in Parser._ARG_TYPES:
+            args_end_idx += 1
+
+        if args_end_idx == num_lexemes or lexemes[args_end_idx].get_type() not in Parser._REDIRECTION_MODES:
+            command = SingleCommandFactory.build_command(lexemes[lexem_idx:args_end_idx])
+            return command, args_end_idx
+
+        # Arguments may go on after a redirection: `wc < a.txt -l`.
+        arg_lexemes = lexemes[lexem_idx:args_end_idx]
+        redirections = []
+        while args_end_idx < num_lexemes:
+            lexem_type = lexemes[args_end_idx].get_type()
+            if lexem_type in Parser._ARG_TYPES:
+                arg_lexemes.append(lexemes[args_end_idx])
+                args_end_idx += 1
+            elif lexem_type in Parser._REDIRECTION_MODES:
+                redirection, args_end_idx = Parser._parse_redirection(lexemes, args_end_idx)
+                redirections.append(redirection)
             else:
                 break
 
-        command = SingleCommandFactory.build_command(cmd_name_and_args)
-        return command, rest_lexemes
+        command = SingleCommandFactory.build_command(arg_lexemes)
+        return CommandRedirect(command, redirections), args_end_idx
+
+    @staticmethod
+    def _parse_redirection(lexemes, lexem_idx):
+        mode = Parser._REDIRECTION_MODES[lexemes[lexem_idx].get_type()]
+        file_name_idx = lexem_idx + 1
+        if not (Parser.first_lex_matches_type(lexemes, LexemType.STRING, file_name_idx) or
+                Parser.first_lex_matches_type(lexemes, LexemType.QUOTED_STRING, file_name_idx)):
+            raise ParseException('Expected a file name after {} at '\
+                                 '{}.'.format(mode, lexemes[lexem_idx].get_position()))
+
+        return Redirection(mode, lexemes[file_name_idx].get_value()), file_name_idx + 1
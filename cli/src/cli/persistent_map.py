@@ -0,0 +1,166 @@
+"""A persistent (immutable) map.
+
+:class:`.PersistentMap` never changes: `set` returns a new map,
+which shares almost all of its structure with the old one.
+So a map can be "copied" in O(1) simply by keeping a reference,
+and an update costs O(log n) instead of O(n) for copying a dict.
+
+The map is a hash array mapped trie (HAMT): every node
+holds up to 32 entries, indexed by 5 bits of a key's hash,
+and stores only the present ones (plus a bitmap of them).
+Keys with equal hashes end up in a collision node.
+"""
+import collections
+
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_MASK = (1 << 64) - 1
+
+_Leaf = collections.namedtuple('_Leaf', ['key_hash', 'key', 'value'])
+
+
+class _CollisionNode:
+    """Keys with the same hash: a tuple of (key, value) pairs."""
+
+    __slots__ = ('key_hash', 'pairs')
+
+    def __init__(self, key_hash, pairs):
+        self.key_hash = key_hash
+        self.pairs = pairs
+
+    def get(self, key, default):
+        for pair_key, pair_value in self.pairs:
+            if pair_key == key:
+                return pair_value
+        return default
+
+    def set(self, key, value):
+        """Return (new node, whether the key is new)."""
+        for pair_idx, (pair_key, _) in enumerate(self.pairs):
+            if pair_key == key:
+                pairs = self.pairs[:pair_idx] + ((key, value),) + self.pairs[pair_idx + 1:]
+                return _CollisionNode(self.key_hash, pairs), False
+        return _CollisionNode(self.key_hash, self.pairs + ((key, value),)), True
+
+    def items(self):
+        return iter(self.pairs)
+
+
+class _BitmapNode:
+    """An inner node of the trie: present entries and a bitmap of their positions."""
+
+    __slots__ = ('bitmap', 'entries')
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+    def get(self, shift, key_hash, key, default):
+        node = self
+        while True:
+            bit = 1 << ((key_hash >> shift) & _MASK)
+            if not node.bitmap & bit:
+                return default
+
+            entry = node.entries[bin(node.bitmap & (bit - 1)).count('1')]
+            if isinstance(entry, _Leaf):
+                return entry.value if entry.key_hash == key_hash and entry.key == key else default
+            if isinstance(entry, _CollisionNode):
+                return entry.get(key, default) if entry.key_hash == key_hash else default
+
+            node = entry
+            shift += _BITS
+
+    def set(self, shift, key_hash, key, value):
+        """Return (new node, whether the key is new)."""
+        bit = 1 << ((key_hash >> shift) & _MASK)
+        idx = bin(self.bitmap & (bit - 1)).count('1')
+
+        if not self.bitmap & bit:
+            entries = self.entries[:idx] + (_Leaf(key_hash, key, value),) + self.entries[idx:]
+            return _BitmapNode(self.bitmap | bit, entries), True
+
+        entry = self.entries[idx]
+        if isinstance(entry, _BitmapNode):
+            new_entry, is_new_key = entry.set(shift + _BITS, key_hash, key, value)
+        elif entry.key_hash != key_hash:
+            new_entry, is_new_key = _merge(entry, _Leaf(key_hash, key, value), shift + _BITS), True
+        elif isinstance(entry, _CollisionNode):
+            new_entry, is_new_key = entry.set(key, value)
+        elif entry.key == key:
+            new_entry, is_new_key = _Leaf(key_hash, key, value), False
+        else:
+            pairs = ((entry.key, entry.value), (key, value))
+            new_entry, is_new_key = _CollisionNode(key_hash, pairs), True
+
+        entries = self.entries[:idx] + (new_entry,) + self.entries[idx + 1:]
+        return _BitmapNode(self.bitmap, entries), is_new_key
+
+    def items(self):
+        for entry in self.entries:
+            if isinstance(entry, _Leaf):
+                yield entry.key, entry.value
+            else:
+                yield from entry.items()
+
+
+def _merge(entry_1, entry_2, shift):
+    """Make a node out of two entries (leaves or collision nodes) with different hashes."""
+    frag_1 = (entry_1.key_hash >> shift) & _MASK
+    frag_2 = (entry_2.key_hash >> shift) & _MASK
+
+    if frag_1 == frag_2:
+        return _BitmapNode(1 << frag_1, (_merge(entry_1, entry_2, shift + _BITS),))
+
+    if frag_1 > frag_2:
+        entry_1, entry_2 = entry_2, entry_1
+    return _BitmapNode((1 << frag_1) | (1 << frag_2), (entry_1, entry_2))
+
+
+_EMPTY_NODE = _BitmapNode(0, ())
+
+
+class PersistentMap:
+    """An immutable map with O(log n) updates that share structure.
+
+    Example::
+
+        map_1 = PersistentMap()
+        map_2 = map_1.set('x', '1')
+        map_1.get('x')   # None
+        map_2.get('x')   # '1'
+    """
+
+    __slots__ = ('_root', '_size')
+
+    def __init__(self):
+        """Create an empty map"""
+        self._root = _EMPTY_NODE
+        self._size = 0
+
+    def get(self, key, default=None):
+        """Get a value by key, or `default` if there is no such key."""
+        return self._root.get(0, hash(key) & _HASH_MASK, key, default)
+
+    def set(self, key, value):
+        """Return a new map, where `key` maps to `value`."""
+        new_root, is_new_key = self._root.set(0, hash(key) & _HASH_MASK, key, value)
+
+        new_map = PersistentMap.__new__(PersistentMap)
+        new_map._root = new_root
+        new_map._size = self._size + 1 if is_new_key else self._size
+        return new_map
+
+    def items(self):
+        """Iterate over (key, value) pairs, in no particular order."""
+        return self._root.items()
+
+    def __contains__(self, key):
+        return self.get(key, _EMPTY_NODE) is not _EMPTY_NODE
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return (key for key, _ in self.items())
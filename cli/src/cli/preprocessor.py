@@ -8,6 +8,7 @@ an environment.
 Preprocessing is a common action in programming languages,
 so we use it in interpreting Shell commands as well.
 """
+import functools
 import logging
 import enum
 
@@ -23,6 +24,132 @@ class _PreprocessorAutomataState(enum.Enum):
     READING_VAR_NAME_INSIDE_DOUBLE_QUOTES = 7
 
 
+@enum.unique
+class _CharClass(enum.Enum):
+    DOUBLE_QUOTE = 1
+    SINGLE_QUOTE = 2
+    DOLLAR = 3
+    SPACE = 4
+    OTHER = 5
+
+
+@enum.unique
+class _TransitionAction(enum.Enum):
+    NONE = 1
+    # The current character is the first one of a variable name.
+    START_VAR = 2
+    # The variable name ended right before the current character.
+    END_VAR = 3
+
+
+def _build_transition_table():
+    """Build a table: (state, char class) -> (next state, action).
+
+    If a variable name ends, the character after it is processed
+    as if the automata were in the state after the variable
+    (that is how a string like `$x$y` is handled).
+    """
+    state = _PreprocessorAutomataState
+    char_cls = _CharClass
+    action = _TransitionAction
+
+    table = {}
+    for cls in char_cls:
+        table[(state.INITIAL_STATE, cls)] = (state.INITIAL_STATE, action.NONE)
+        table[(state.INSIDE_DOUBLE_QUOTES, cls)] = (state.INSIDE_DOUBLE_QUOTES, action.NONE)
+        table[(state.INSIDE_SINGLE_QUOTES, cls)] = (state.INSIDE_SINGLE_QUOTES, action.NONE)
+        table[(state.READING_VAR_NAME, cls)] = (state.READING_VAR_NAME, action.NONE)
+        table[(state.READING_VAR_NAME_INSIDE_DOUBLE_QUOTES, cls)] = \
+            (state.READING_VAR_NAME_INSIDE_DOUBLE_QUOTES, action.NONE)
+
+    table[(state.INITIAL_STATE, char_cls.DOUBLE_QUOTE)] = (state.INSIDE_DOUBLE_QUOTES, action.NONE)
+    table[(state.INITIAL_STATE, char_cls.SINGLE_QUOTE)] = (state.INSIDE_SINGLE_QUOTES, action.NONE)
+    table[(state.INITIAL_STATE, char_cls.DOLLAR)] = (state.MET_DOLLAR, action.NONE)
+
+    table[(state.INSIDE_DOUBLE_QUOTES, char_cls.DOUBLE_QUOTE)] = (state.INITIAL_STATE, action.NONE)
+    table[(state.INSIDE_DOUBLE_QUOTES, char_cls.DOLLAR)] = \
+        (state.MET_DOLLAR_INSIDE_DOUBLE_QUOTES, action.NONE)
+
+    table[(state.INSIDE_SINGLE_QUOTES, char_cls.SINGLE_QUOTE)] = (state.INITIAL_STATE, action.NONE)
+
+    table[(state.MET_DOLLAR, char_cls.DOUBLE_QUOTE)] = (state.INSIDE_DOUBLE_QUOTES, action.NONE)
+    table[(state.MET_DOLLAR, char_cls.SINGLE_QUOTE)] = (state.INSIDE_SINGLE_QUOTES, action.NONE)
+    table[(state.MET_DOLLAR, char_cls.DOLLAR)] = (state.MET_DOLLAR, action.NONE)
+    table[(state.MET_DOLLAR, char_cls.SPACE)] = (state.INITIAL_STATE, action.NONE)
+    table[(state.MET_DOLLAR, char_cls.OTHER)] = (state.READING_VAR_NAME, action.START_VAR)
+
+    table[(state.MET_DOLLAR_INSIDE_DOUBLE_QUOTES, char_cls.DOUBLE_QUOTE)] = \
+        (state.INITIAL_STATE, action.NONE)
+    table[(state.MET_DOLLAR_INSIDE_DOUBLE_QUOTES, char_cls.DOLLAR)] = \
+        (state.MET_DOLLAR_INSIDE_DOUBLE_QUOTES, action.NONE)
+    table[(state.MET_DOLLAR_INSIDE_DOUBLE_QUOTES, char_cls.SPACE)] = \
+        (state.INSIDE_DOUBLE_QUOTES, action.NONE)
+    for cls in (char_cls.SINGLE_QUOTE, char_cls.OTHER):
+        table[(state.MET_DOLLAR_INSIDE_DOUBLE_QUOTES, cls)] = \
+            (state.READING_VAR_NAME_INSIDE_DOUBLE_QUOTES, action.START_VAR)
+
+    for cls in (char_cls.DOUBLE_QUOTE, char_cls.SINGLE_QUOTE, char_cls.DOLLAR, char_cls.SPACE):
+        next_state, _ = table[(state.INITIAL_STATE, cls)]
+        table[(state.READING_VAR_NAME, cls)] = (next_state, action.END_VAR)
+
+        next_state, _ = table[(state.INSIDE_DOUBLE_QUOTES, cls)]
+        table[(state.READING_VAR_NAME_INSIDE_DOUBLE_QUOTES, cls)] = (next_state, action.END_VAR)
+
+    return table
+
+
+_TRANSITION_TABLE = _build_transition_table()
+
+_SPECIAL_CHAR_CLASSES = {
+    '"': _CharClass.DOUBLE_QUOTE,
+    "'": _CharClass.SINGLE_QUOTE,
+    '$': _CharClass.DOLLAR,
+}
+
+
+class SubstitutionPlan:
+    """A raw string, compiled into literal segments and variable slots.
+
+    A plan does not depend on an environment, so it is compiled once
+    per raw string and then filled with values of variables each time.
+    For example, ``echo "$x"1`` is compiled into literals
+    ``['echo "', '"1']`` and variable names ``['x']``.
+    """
+
+    def __init__(self, literals, var_names):
+        """Create a plan.
+
+        Args:
+            literals (list[str]): literal segments; there is one more
+                segment than variables (segments can be empty);
+            var_names (list[str]): names of variables between the segments.
+        """
+        self._literals = literals
+        self._var_names = var_names
+
+    def get_var_names(self):
+        """Return names of variables, in order of their appearance."""
+        return self._var_names
+
+    def fill(self, values):
+        """Build a string, putting given values into variable slots.
+
+        Args:
+            values (list[str]): a value for every variable slot.
+        """
+        if not values:
+            return self._literals[0]
+
+        parts = [None] * (2 * len(values) + 1)
+        parts[::2] = self._literals
+        parts[1::2] = values
+        return ''.join(parts)
+
+    def substitute(self, env):
+        """Build a string, putting values of variables from `env` into their slots."""
+        return self.fill([env.get_var(var_name) for var_name in self._var_names])
+
+
 class Preprocessor:
     """A static class for preprocessing a shell input string.
 
@@ -31,6 +158,8 @@ class Preprocessor:
     assigned value of `x`.
     """
 
+    PLAN_CACHE_SIZE = 1024
+
     @staticmethod
     def substitute_environment_variables(raw_str, env):
         """Do a one-time pass over string and substitute `$x`-like patterns.
@@ -85,121 +214,58 @@ class Preprocessor:
                 echo $x$long_name  -->      echo 1qwe
                 echo `$x`"$x"  -->          echo `$x`"1"
         """
-        processed_prefix = ''
-        unprocessed_suffix = raw_str
-        autom_state = _PreprocessorAutomataState.INITIAL_STATE
-
-        while unprocessed_suffix:
-            next_var_info = Preprocessor._find_next_var(unprocessed_suffix, autom_state)
+        plan = Preprocessor.compile_plan(raw_str)
+        processed_str = plan.substitute(env)
 
-            if next_var_info:
-                (nonvar_part, var_name,
-                 unprocessed_part, autom_state) = next_var_info
-                processed_prefix += nonvar_part
-                processed_prefix += env.get_var(var_name)
-
-                unprocessed_suffix = unprocessed_part
-            else:
-                processed_prefix += unprocessed_suffix
-                unprocessed_suffix = ''
-
-        logging.info('Preprocessor: """{}""" processed ' \
-                     'to """{}"""'.format(raw_str, processed_prefix))
-        return processed_prefix
+        logging.debug('Preprocessor: %d variables substituted, %d -> %d characters',
+                      len(plan.get_var_names()), len(raw_str), len(processed_str))
+        return processed_str
 
     @staticmethod
-    def _find_next_var(raw_str, autom_state):
-        """Return information about the leftmost variable in the string.
+    @functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+    def compile_plan(raw_str):
+        """Compile a raw string into a :class:`.SubstitutionPlan`.
 
-        Args:
-            raw_str (str): an unprocessed string;
-            autom_state (_PreprocessorAutomataState): a current state
-            of the automata.
+        This is a single pass of an automata over the string,
+        driven by a transition table. Plans are cached, so
+        a repeated string is compiled only once.
+        """
+        if '$' not in raw_str:
+            return SubstitutionPlan([raw_str], [])
+
+        literals = []
+        var_names = []
+        literal_start = 0
+        var_start = 0
+
+        transition_table = _TRANSITION_TABLE
+        special_char_classes = _SPECIAL_CHAR_CLASSES
+        space_cls, other_cls = _CharClass.SPACE, _CharClass.OTHER
+        start_var, end_var = _TransitionAction.START_VAR, _TransitionAction.END_VAR
+        autom_state = _PreprocessorAutomataState.INITIAL_STATE
 
-        Returns:
-            If `raw_str` contains a variable, return tuple
-             <part of the string before the variable,
-              variable name,
-              part of the string after the variable,
-              automata state>
+        for read_idx, cur_char in enumerate(raw_str):
+            char_cls = special_char_classes.get(cur_char)
+            if char_cls is None:
+                char_cls = space_cls if cur_char.isspace() else other_cls
 
-            Otherwise, return None.
-        """
-        read_idx = 0
-        sz_raw = len(raw_str)
-        var_name = ''
-
-        while read_idx < sz_raw:
-            cur_char = raw_str[read_idx]
-
-            if autom_state == _PreprocessorAutomataState.INITIAL_STATE:
-                if cur_char == '"':
-                    autom_state = _PreprocessorAutomataState.INSIDE_DOUBLE_QUOTES
-                elif cur_char == "'":
-                    autom_state = _PreprocessorAutomataState.INSIDE_SINGLE_QUOTES
-                elif cur_char == '$':
-                    autom_state = _PreprocessorAutomataState.MET_DOLLAR
-                else:
-                    pass
-            elif autom_state == _PreprocessorAutomataState.INSIDE_DOUBLE_QUOTES:
-                if cur_char == '"':
-                    autom_state = _PreprocessorAutomataState.INITIAL_STATE
-                elif cur_char == '$':
-                    autom_state = _PreprocessorAutomataState.MET_DOLLAR_INSIDE_DOUBLE_QUOTES
-                else:
-                    pass
-            elif autom_state == _PreprocessorAutomataState.INSIDE_SINGLE_QUOTES:
-                if cur_char == "'":
-                    autom_state = _PreprocessorAutomataState.INITIAL_STATE
-                else:
-                    pass
-            elif autom_state == _PreprocessorAutomataState.MET_DOLLAR:
-                if cur_char == '"':
-                    autom_state = _PreprocessorAutomataState.INSIDE_DOUBLE_QUOTES
-                elif cur_char == "'":
-                    autom_state = _PreprocessorAutomataState.INSIDE_SINGLE_QUOTES
-                elif cur_char == '$':
-                    pass
-                elif cur_char.isspace():
-                    autom_state = _PreprocessorAutomataState.INITIAL_STATE
-                else:
-                    var_name = cur_char
-                    autom_state = _PreprocessorAutomataState.READING_VAR_NAME
-            elif autom_state == _PreprocessorAutomataState.READING_VAR_NAME:
-                if cur_char in ('"', "'", '$') or cur_char.isspace():
-                    return (raw_str[:read_idx - len(var_name) - 1],
-                            var_name,
-                            raw_str[read_idx:],
-                            _PreprocessorAutomataState.INITIAL_STATE)
-                else:
-                    var_name += cur_char
-            elif autom_state == _PreprocessorAutomataState.MET_DOLLAR_INSIDE_DOUBLE_QUOTES:
-                if cur_char == '"':
-                    autom_state = _PreprocessorAutomataState.INITIAL_STATE
-                elif cur_char == '$':
-                    pass
-                elif cur_char.isspace():
-                    autom_state = _PreprocessorAutomataState.INSIDE_DOUBLE_QUOTES
-                else:
-                    var_name = cur_char
-                    autom_state = _PreprocessorAutomataState.READING_VAR_NAME_INSIDE_DOUBLE_QUOTES
-            elif autom_state == _PreprocessorAutomataState.READING_VAR_NAME_INSIDE_DOUBLE_QUOTES:
-                if cur_char in ('"', "'", '$') or cur_char.isspace():
-                    return (raw_str[:read_idx - len(var_name) - 1],
-                            var_name,
-                            raw_str[read_idx:],
-                            _PreprocessorAutomataState.INSIDE_DOUBLE_QUOTES)
-                else:
-                    var_name += cur_char
-
-            read_idx += 1
+            autom_state, action = transition_table[(autom_state, char_cls)]
+
+            if action is start_var:
+                var_start = read_idx
+            elif action is end_var:
+                # Both the variable name and the preceding `$` are substituted.
+                literals.append(raw_str[literal_start:var_start - 1])
+                var_names.append(raw_str[var_start:read_idx])
+                literal_start = read_idx
 
         # Automata can't be in `READING_VAR_NAME_INSIDE_DOUBLE_QUOTES` state
-        # if the input string is valid. Preprocessor won't check for validity.
+        # if the input string is valid. Preprocessor won't check for validity:
+        # such a variable is left as is.
         if autom_state == _PreprocessorAutomataState.READING_VAR_NAME:
-            return (raw_str[:read_idx - len(var_name) - 1],
-                    var_name,
-                    '',
-                    _PreprocessorAutomataState.INITIAL_STATE)
+            literals.append(raw_str[literal_start:var_start - 1])
+            var_names.append(raw_str[var_start:])
+            literal_start = len(raw_str)
 
-        return None
+        literals.append(raw_str[literal_start:])
+        return SubstitutionPlan(literals, var_names)
@@ -0,0 +1,126 @@
+"""A shell server: many sessions in one process.
+
+Clients connect to a local Unix socket. Every connection is a
+session with its own :class:`shell.Shell` (and thus its own
+:class:`environment.Environment`).
+
+The protocol is line-based. A client sends commands, one per line.
+For every command the server replies with a header line
+``<return code> <length>`` followed by `length` bytes of the
+command's output (UTF-8). Parsing and lexing errors are replied with
+:attr:`shell.Shell.SYNTAX_ERROR_CODE` and the error message as output.
+``exit`` closes the session.
+
+Commands run in a thread pool, at most `max_running_commands` at
+the same time; external processes are created by the event loop,
+see :class:`launcher.AsyncioLauncher`.
+
+Example::
+
+    run_server('/tmp/shell.sock')
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+
+from cli import exceptions
+from cli import launcher
+from cli.shell import Shell
+
+
+class ShellServer:
+    """An asyncio server of shell sessions."""
+
+    DEFAULT_MAX_RUNNING_COMMANDS = 16
+
+    def __init__(self, socket_path, max_running_commands=DEFAULT_MAX_RUNNING_COMMANDS):
+        """Create a server which listens on `socket_path` once started.
+
+        Args:
+            socket_path (str): a path of the Unix socket;
+            max_running_commands (int): how many commands (of all sessions) may run at the same time.
+        """
+        self._socket_path = socket_path
+        self._max_running_commands = max_running_commands
+        self._executor = None
+        self._semaphore = None
+        self._server = None
+        self._previous_launcher = None
+
+    async def start(self):
+        """Start listening. External commands are launched by the current event loop from now on."""
+        loop = asyncio.get_event_loop()
+        self._executor = concurrent.futures.ThreadPoolExecutor(self._max_running_commands)
+        self._semaphore = asyncio.Semaphore(self._max_running_commands)
+        self._previous_launcher = launcher.set_launcher(launcher.AsyncioLauncher(loop))
+        self._server = await asyncio.start_unix_server(self._handle_session, path=self._socket_path)
+        logging.info('Shell server is listening on %s', self._socket_path)
+
+    async def stop(self):
+        """Stop listening, wait for the running commands and restore the launcher."""
+        self._server.close()
+        await self._server.wait_closed()
+        # Commands may still need the loop to wait for their processes: don't block it.
+        await asyncio.get_event_loop().run_in_executor(None, self._executor.shutdown)
+        launcher.set_launcher(self._previous_launcher)
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+
+    @staticmethod
+    def _run_command(shell, input_str):
+        """Run a command of a session, return (return code, output, whether the session ends)."""
+        try:
+            command_result = shell.process_input(input_str)
+        except exceptions.ParseException as ex:
+            return Shell.SYNTAX_ERROR_CODE, 'Parsing exception occured:\n{}'.format(str(ex)), False
+        except exceptions.LexException as ex:
+            return Shell.SYNTAX_ERROR_CODE, 'Lexing exception occured:\n{}'.format(str(ex)), False
+        except exceptions.ExitException:
+            return 0, '', True
+
+        shell.apply_command_result(command_result)
+        return command_result.get_return_code(), command_result.get_output(), False
+
+    async def _handle_session(self, reader, writer):
+        loop = asyncio.get_event_loop()
+        shell = Shell()
+        logging.debug('A session started')
+
+        try:
+            session_ended = False
+            while not session_ended:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                input_str = line.decode('utf-8', errors='replace').rstrip('\r\n')
+                async with self._semaphore:
+                    ret_code, output, session_ended = await loop.run_in_executor(
+                        self._executor, ShellServer._run_command, shell, input_str)
+
+                if not session_ended:
+                    output = output.encode('utf-8', errors='replace')
+                    writer.write('{} {}\n'.format(ret_code, len(output)).encode('ascii'))
+                    writer.write(output)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            logging.debug('A session ended')
+
+
+def run_server(socket_path, max_running_commands=ShellServer.DEFAULT_MAX_RUNNING_COMMANDS):
+    """Run :class:`.ShellServer` until interrupted (e.g. with Ctrl+C)."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = ShellServer(socket_path, max_running_commands)
+    loop.run_until_complete(server.start())
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.stop())
+        loop.close()
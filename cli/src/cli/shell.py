@@ -10,11 +10,12 @@ all the shell work:
     - invoke the program represented by (sort of) AST.
 
 """
+import sys
+
+from cli import trace
+from cli.command_cache import ParsedCommandCache
 from cli.environment import Environment
-from cli.streams import InputStream
-from cli.lexer import Lexer
-from cli.parser import Parser
-from cli.preprocessor import Preprocessor
+from cli.streams import InputStream, OutputStream, make_fd_output_stream
 import cli.exceptions as exceptions
 
 
@@ -29,25 +30,62 @@ class Shell:
         shell = Shell()
         shell.main_loop()
 
+    Or run `run_script` to execute commands non-interactively::
+
+        with open('script.sh') as script:
+            ret_code = Shell().run_script(script, sys.stdout)
+
+    If the output file has a file descriptor (like ``sys.stdout``),
+    the output of a command is written into it while the command runs
+    (see :func:`streams.make_fd_output_stream`), and the last external
+    command of a pipe writes into it directly.
     """
 
-    def __init__(self):
-        """Create a Shell instance with empty environment"""
+    SYNTAX_ERROR_CODE = 2
+
+    BROKEN_PIPE_CODE = 128 + 13
+    """The return code of a script whose output was closed (as if it got SIGPIPE)."""
+
+    def __init__(self, line_buffered_output=None):
+        """Create a Shell instance with empty environment.
+
+        Args:
+            line_buffered_output (bool): whether outputs of commands are written
+                line by line, or in blocks. By default, line by line
+                if the output is a terminal.
+        """
         self._env = Environment()
+        self._command_cache = ParsedCommandCache()
+        self._line_buffered_output = line_buffered_output
 
-    def process_input(self, inp):
+    def process_input(self, inp, output_stream=None):
         """Take input string, parse it, run it.
 
+        Preprocessing, lexing and parsing of a repeated input
+        string are cached, see :class:`command_cache.ParsedCommandCache`.
+        Every stage is traced, if tracing is enabled (see :mod:`trace`).
+
         Args:
-            inp (str): an input string
+            inp (str): an input string;
+            output_stream (:class:`streams.OutputStream`): where the output
+                goes, a fresh in-memory stream if not provided.
 
         Returns:
             :class:`commands.RunnableCommandResult`.
         """
-        preprocessed_inp = Preprocessor.substitute_environment_variables(inp, self._env)
-        lexemes = Lexer.get_lexemes(preprocessed_inp)
-        runnable = Parser.build_command(lexemes)
-        return runnable.run(InputStream(), self._env)
+        runnable = self._command_cache.build_command(inp, self._env)
+        output_stream = OutputStream() if output_stream is None else output_stream
+        with trace.span('run') as run_span:
+            # The stream may be shared by several runs.
+            num_bytes_before = output_stream.get_num_bytes_written()
+            command_result = runnable.run(InputStream(), self._env, output_stream)
+            run_span.set(return_code=command_result.get_return_code(),
+                         num_bytes_written=output_stream.get_num_bytes_written() - num_bytes_before)
+        return command_result
+
+    def get_command_cache(self):
+        """Getter for the cache of parsed commands (e.g. to inspect its statistics)"""
+        return self._command_cache
 
     def apply_command_result(self, command_result):
         """Take some programs result into account, i.e. change Shell's state.
@@ -58,10 +96,37 @@ class Shell:
         """
         self._env = command_result.get_result_environment()
 
+    def _run_into_file(self, input_str, output_file):
+        """Run a command, write its output into a text file, ending it with a newline.
+
+        Returns:
+            :class:`commands.RunnableCommandResult`.
+        """
+        output_fd = _get_fileno(output_file)
+        if output_fd is None:
+            command_result = self.process_input(input_str)
+            output = command_result.get_output()
+            output_file.write(output)
+            if output and not output.endswith('\n'):
+                output_file.write('\n')
+            return command_result
+
+        line_buffered = self._line_buffered_output
+        if line_buffered is None:
+            line_buffered = output_file.isatty()
+
+        # Whatever was written into the file object must come before the output.
+        output_file.flush()
+        output_stream = make_fd_output_stream(output_fd, line_buffered, terminate_lines=True)
+        try:
+            return self.process_input(input_str, output_stream)
+        finally:
+            output_stream.close()
+
     def main_loop(self):
         """Infinite loop: prompt user input, show command output.
 
-        Reads from stdin, writes to stdout.
+        Reads from stdin, writes to stdout (as the output is produced).
         Supports recovering from parsing and lexing errors.
         """
         user_asked_exit = False
@@ -69,9 +134,8 @@ class Shell:
             input_str = input('>')
 
             try:
-                command_result = self.process_input(input_str)
+                command_result = self._run_into_file(input_str, sys.stdout)
                 self.apply_command_result(command_result)
-                print(command_result.get_output())
 
                 ret_code = command_result.get_return_code()
                 if ret_code != 0:
@@ -82,6 +146,66 @@ class Shell:
                 print('Lexing exception occured:\n{}'.format(str(ex)))
             except exceptions.ExitException:
                 user_asked_exit = True
+            except exceptions.BrokenPipeException:
+                # Nobody sees the output anymore.
+                return
 
         print('Bye!')
 
+    def run_script(self, lines, output_file, error_file=None):
+        """Run commands one by one, without prompting.
+
+        Empty lines and lines starting with ``#`` are skipped.
+        Every command runs in the environment left by the previous one.
+        Outputs of commands are written to `output_file`, each one
+        ending with a newline. Parsing and lexing errors are reported
+        to `error_file` and the script goes on, like in `main_loop`. The script
+        stops on ``exit``, or if the reader of `output_file` closes it.
+
+        Args:
+            lines (iterable of str): commands, e.g. an opened file;
+            output_file (file): a text file for the outputs;
+            error_file (file): a text file for the errors, `output_file` if not provided.
+
+        Returns:
+            int: the return code of the last command (:attr:`.SYNTAX_ERROR_CODE`
+            if it could not be parsed, :attr:`.BROKEN_PIPE_CODE` if the output was closed).
+        """
+        if error_file is None:
+            error_file = output_file
+
+        ret_code = 0
+        for line in lines:
+            input_str = line.rstrip('\r\n')
+            if not input_str.strip() or input_str.lstrip().startswith('#'):
+                continue
+
+            try:
+                command_result = self._run_into_file(input_str, output_file)
+            except exceptions.ParseException as ex:
+                error_file.write('Parsing exception occured:\n{}\n'.format(str(ex)))
+                ret_code = Shell.SYNTAX_ERROR_CODE
+                continue
+            except exceptions.LexException as ex:
+                error_file.write('Lexing exception occured:\n{}\n'.format(str(ex)))
+                ret_code = Shell.SYNTAX_ERROR_CODE
+                continue
+            except exceptions.ExitException:
+                break
+            except exceptions.BrokenPipeException:
+                return Shell.BROKEN_PIPE_CODE
+
+            self.apply_command_result(command_result)
+            ret_code = command_result.get_return_code()
+
+        output_file.flush()
+        return ret_code
+
+
+
+def _get_fileno(opened_file):
+    """Get the file descriptor of a file object, or None if it has none (e.g. :class:`io.StringIO`)."""
+    try:
+        return opened_file.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
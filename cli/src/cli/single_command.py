@@ -8,52 +8,133 @@ There is a Factory class that "knows"
 how to choose an appropriate Command
 given it's string representation.
 """
+import collections
+import functools
+import getopt
+import itertools
 import logging
 import os.path
 import os
+import re
 import subprocess
-import sys
+import threading
 
+from cli import counting
+from cli import launcher
+from cli import sorting
+from cli.command_hash import resolve_command, find_in_path, get_command_hash_table
 from cli.commands import SingleCommand, RunnableCommandResult
-from cli.exceptions import ExitException
-from cli.streams import OutputStream
+from cli.exceptions import ExitException, BrokenPipeException
+from cli.streams import OutputStream, CHUNK_SIZE, ENCODING, ENCODING_ERRORS
 
 
 class CommandExternal(SingleCommand):
     """An external command (not described in shell).
 
     Command args:
-        0 -- a command's name. This name is searched
-            via joining the current working directory
-            with the command name (i.e. it must be somewhere
-            in the current directory).
+        0 -- a command's name. It is searched in ``PATH``, then
+            in the current directory, see :func:`command_hash.resolve_command`.
         1..n -- command's arguments. There can be any arguments
             depending on a command.
+
+    If the input or output stream is backed by an OS-level file (e.g. an
+    OS pipe to another external command), the process uses it directly.
+
+    The process is started by the current launcher, see :mod:`launcher`.
     """
 
     COMMAND_NOT_FOUND = 1
 
-    def run(self, input_stream, env):
-        output = OutputStream()
+    @staticmethod
+    def _feed_process_input(process_stdin, input_stream):
+        """Write the whole input stream to a process' stdin chunk by chunk.
 
-        cmd_name = self._args_lst[0]
-        cur_dir = env.get_cwd()
-        cmd_name_full = os.path.join(cur_dir, cmd_name)
+        The process may exit without reading all its input: the rest
+        of the input is then silently dropped.
+        """
+        try:
+            for chunk in input_stream.read_byte_chunks():
+                process_stdin.write(chunk)
+            process_stdin.close()
+        except BrokenPipeError:
+            pass
 
+    def accepts_os_streams(self):
+        return True
+
+    def _start_process(self, cmd_name_full, stdin_fileno, stdout_fileno):
         modified_args = self._args_lst[:]
         modified_args[0] = cmd_name_full
+        return launcher.get_launcher()(modified_args,
+                                       stdin=subprocess.PIPE if stdin_fileno is None else stdin_fileno,
+                                       stdout=subprocess.PIPE if stdout_fileno is None else stdout_fileno)
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
+
+        cmd_name = self._args_lst[0]
+        cmd_name_full, is_from_path = resolve_command(cmd_name, env)
+
+        # Streams backed by OS files are passed to the process as is.
+        stdin_fileno = input_stream.get_fileno()
+        stdout_fileno = output.get_fileno()
 
         return_code = 0
-        try:
-            completed_process = subprocess.run(modified_args,
-                                               input=input_stream.get_input(),
-                                               stdout=subprocess.PIPE,
-                                               encoding=sys.stdout.encoding)
-            return_code = completed_process.returncode
-            output.write(completed_process.stdout)
-        except FileNotFoundError:
-            output.write('Command {} not found.'.format(cmd_name_full))
+        process = None
+        if cmd_name_full is not None:
+            try:
+                process = self._start_process(cmd_name_full, stdin_fileno, stdout_fileno)
+            except FileNotFoundError:
+                if is_from_path:
+                    # The remembered location of the command may be stale: look it up once again.
+                    get_command_hash_table().forget(cmd_name)
+                    new_cmd_name_full, _ = resolve_command(cmd_name, env)
+                    if new_cmd_name_full is not None and new_cmd_name_full != cmd_name_full:
+                        cmd_name_full = new_cmd_name_full
+                        try:
+                            process = self._start_process(cmd_name_full, stdin_fileno, stdout_fileno)
+                        except FileNotFoundError:
+                            pass
+
+        if process is None:
+            self._write_error(output, 'Command {} not found.'.format(cmd_name))
             return_code = CommandExternal.COMMAND_NOT_FOUND
+            return RunnableCommandResult(output, env, return_code)
+
+        feeder = None
+        if stdin_fileno is None:
+            # Feeding stdin from another thread lets us read stdout
+            # at the same time, so neither of the OS pipes overflows.
+            feeder = threading.Thread(target=CommandExternal._feed_process_input,
+                                      args=(process.stdin, input_stream))
+            feeder.start()
+
+        broken_pipe = None
+        if stdout_fileno is None:
+            # The output is passed on as bytes: it is decoded only
+            # if (and when) the reader wants a string.
+            try:
+                chunk = process.stdout.read1(CHUNK_SIZE)
+                while chunk:
+                    output.write(chunk)
+                    chunk = process.stdout.read1(CHUNK_SIZE)
+            except BrokenPipeException as ex:
+                # Nobody reads the output anymore. Once its stdout is closed,
+                # the process gets SIGPIPE (or EPIPE) on the next write and stops.
+                broken_pipe = ex
+            finally:
+                process.stdout.close()
+
+        return_code = process.wait()
+
+        if feeder is not None:
+            # The process may have exited without reading all its input:
+            # stop reading it, so that the feeder is not stuck waiting for more.
+            input_stream.close()
+            feeder.join()
+
+        if broken_pipe is not None:
+            raise broken_pipe
 
         return RunnableCommandResult(output, env, return_code)
 
@@ -88,9 +169,8 @@ class SingleCommandFactory:
     @staticmethod
     def _get_command_class_by_name(cmd_name):
         cmd_cls = SingleCommandFactory.registered_commands.get(cmd_name, CommandExternal)
-        logging.debug('SingleCommandFactory: ' \
-                      'Class {} is responsible for invoking command {}'.format(
-                          cmd_cls, cmd_name))
+        logging.debug('SingleCommandFactory: Class %s is responsible for invoking command %s',
+                      cmd_cls.__name__, cmd_name)
         return cmd_cls
 
 
@@ -119,8 +199,8 @@ class CommandEcho(SingleCommand):
 
     """
 
-    def run(self, input_stream, env):
-        output = OutputStream()
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
         output.write_line(' '.join(self._args_lst[1:]))
 
         return RunnableCommandResult(output, env, 0)
@@ -128,76 +208,76 @@ class CommandEcho(SingleCommand):
 
 @_register_single_command('wc')
 class CommandWc(SingleCommand):
-    """`wc` command: count the number of words, characters and lines.
+    """`wc` command: count the number of lines, words and bytes.
 
     Command args:
         0 -- `wc`
+        1..n -- options and, optionally, filenames. If there are
+            no filenames, `wc` counts its input. Options:
 
-        1 (optional) -- a filename. If provided, then `wc` will
-            count the number of characters in this file. Otherwise,
-            it will take it's input.
-            Can be relative or absolute.
+                - ``-l``, ``-w``, ``-c``: print only the number of lines,
+                  words or bytes (or some of them), in this order;
+                - ``--parallel=N``: count in N processes (by default, one per CPU).
+                  Large files are split into segments, see :mod:`counting`.
 
-    Returns `FILE_NOT_FOUND` exit code if file was provided,
-    but was not found.
+    Counts are printed as ``LINES WORDS BYTES``. With several files,
+    a line is printed for every file (followed by its name),
+    and the last line contains totals. Words are separated by
+    whitespace like in :meth:`str.split` of the decoded text, Unicode
+    whitespace (e.g. a no-break space) included if the encoding is UTF-8.
+
+    Returns FILE_NOT_FOUND if some file was not found, BAD_ARGS if options are wrong.
     """
 
     FILE_NOT_FOUND = 1
-    BAD_NUMBER_OF_ARGS = 2
+    BAD_ARGS = 2
 
     @staticmethod
-    def _get_num_words(input_str):
-        num_words = 0
-        last_was_char = False
-
-        for ch in input_str:
-            if not ch.isspace():
-                num_words += not last_was_char
-                last_was_char = True
-            else:
-                last_was_char = False
+    def _format_counts(counts, columns, name=None):
+        fields = [str(count) for count, is_shown in zip(counts, columns) if is_shown]
+        if name is not None:
+            fields.append(name)
+        return ' '.join(fields)
 
-        return num_words
-
-    @staticmethod
-    def _wc_routine(input_str):
-        num_lines = len(input_str.splitlines())
-        num_words = CommandWc._get_num_words(input_str)
-        num_bytes = len(input_str.encode(sys.stdin.encoding))
-
-        wc_result = (num_lines, num_words, num_bytes)
-        logging.debug('wc: result for "{}" is {}.'.format(input_str, wc_result))
-
-        return wc_result
-
-    def run(self, input_stream, env):
-        return_code = 0
-        output = OutputStream()
-        wc_result = None
-
-        num_args = len(self._args_lst)
-        if num_args == 2:
-            fl_name = self._args_lst[1]
-            full_fl_name = os.path.join(env.get_cwd(), fl_name)
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
 
+        try:
+            opts, fl_names = getopt.getopt(self._args_lst[1:], 'lwc', ['parallel='])
+            opts = dict(opts)
+            num_workers = int(opts.get('--parallel', os.cpu_count() or 1))
+            if num_workers <= 0:
+                raise ValueError(opts['--parallel'])
+        except (getopt.GetoptError, ValueError) as ex:
+            self._write_error(output, 'wc: wrong arguments: {}.'.format(ex))
+            return RunnableCommandResult(output, env, CommandWc.BAD_ARGS)
+
+        columns = ['-l' in opts, '-w' in opts, '-c' in opts]
+        if not any(columns):
+            columns = [True, True, True]
+
+        full_fl_names = [os.path.join(env.get_cwd(), fl_name) for fl_name in fl_names]
+        for full_fl_name in full_fl_names:
             if not os.path.isfile(full_fl_name):
-                output.write('wc: file {} not found.'.format(full_fl_name))
-                return_code = CommandWc.FILE_NOT_FOUND
-            else:
-                with open(full_fl_name, 'r') as opened_file:
-                    wc_result = CommandWc._wc_routine(opened_file.read())
-        elif num_args == 1:
-            wc_result = CommandWc._wc_routine(input_stream.get_input())
+                self._write_error(output, 'wc: file {} not found.'.format(full_fl_name))
+                return RunnableCommandResult(output, env, CommandWc.FILE_NOT_FOUND)
+
+        if not full_fl_names:
+            counts = counting.count_chunks(input_stream.read_byte_chunks())
+            output.write(CommandWc._format_counts(counts, columns))
+        elif len(full_fl_names) == 1:
+            counts, = counting.count_files(full_fl_names, num_workers)
+            output.write(CommandWc._format_counts(counts, columns))
         else:
-            output.write('wc got wrong number of arguments: expected 0 or 1, '\
-                         'got {}.'.format(num_args - 1))
-            return_code = CommandWc.BAD_NUMBER_OF_ARGS
-
-        if return_code == 0:
-            n_lines, n_words, n_bytes = wc_result
-            output.write('{} {} {}'.format(n_lines, n_words, n_bytes))
-
-        return RunnableCommandResult(output, env, return_code)
+            all_counts = counting.count_files(full_fl_names, num_workers)
+            total_counts = [sum(column) for column in zip(*all_counts)]
+            lines = [CommandWc._format_counts(counts, columns, fl_name)
+                     for counts, fl_name in zip(all_counts, fl_names)]
+            lines.append(CommandWc._format_counts(total_counts, columns, 'total'))
+            output.write(os.linesep.join(lines))
+
+        logging.debug('wc: counted %d files.', len(full_fl_names))
+        return RunnableCommandResult(output, env, 0)
 
 
 @_register_single_command('cat')
@@ -212,6 +292,10 @@ class CommandCat(SingleCommand):
             it will print it's input.
             Can be relative or absolute.
 
+    If the output is backed by a file descriptor (the terminal, or an OS pipe
+    to an external command), a file is copied into it by the kernel,
+    see :meth:`streams.OutputStream.write_file`.
+
     Returns `FILE_NOT_FOUND` exit code if file was provided,
     but was not found.
     """
@@ -219,9 +303,13 @@ class CommandCat(SingleCommand):
     FILE_NOT_FOUND = 1
     BAD_NUMBER_OF_ARGS = 2
 
-    def run(self, input_stream, env):
+    def accepts_os_streams(self):
+        # Only the output matters: its input is not read if a file is given.
+        return len(self._args_lst) == 2
+
+    def run(self, input_stream, env, output_stream=None):
         return_code = 0
-        output = OutputStream()
+        output = OutputStream() if output_stream is None else output_stream
 
         num_args = len(self._args_lst)
         if num_args == 2:
@@ -229,16 +317,16 @@ class CommandCat(SingleCommand):
             full_fl_name = os.path.join(env.get_cwd(), fl_name)
 
             if not os.path.isfile(full_fl_name):
-                output.write('cat: file {} not found.'.format(full_fl_name))
+                self._write_error(output, 'cat: file {} not found.'.format(full_fl_name))
                 return_code = CommandCat.FILE_NOT_FOUND
             else:
-                with open(full_fl_name, 'r') as opened_file:
-                    output.write(opened_file.read())
+                output.write_file(full_fl_name)
         elif num_args == 1:
-            output.write(input_stream.get_input())
+            for chunk in input_stream.read_raw_chunks():
+                output.write(chunk)
         else:
-            output.write('cat got wrong number of arguments: expected 0 or 1, '\
-                         'got {}.'.format(num_args - 1))
+            self._write_error(output, 'cat got wrong number of arguments: expected 0 or 1, '\
+                                      'got {}.'.format(num_args - 1))
             return_code = CommandCat.BAD_NUMBER_OF_ARGS
 
         return RunnableCommandResult(output, env, return_code)
@@ -251,12 +339,12 @@ class CommandPwd(SingleCommand):
 
     BAD_NUMBER_OF_ARGS = 1
 
-    def run(self, input_stream, env):
-        output = OutputStream()
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
 
         if len(self._args_lst) != 1:
-            output.write('pwd got wrong number of arguments: expected 0, '\
-                         'got {}.'.format(len(self._args_lst) - 1))
+            self._write_error(output, 'pwd got wrong number of arguments: expected 0, '\
+                                      'got {}.'.format(len(self._args_lst) - 1))
             return_code = CommandPwd.BAD_NUMBER_OF_ARGS
             return RunnableCommandResult(output, env, return_code)
 
@@ -275,11 +363,11 @@ class CommandExit(SingleCommand):
 
     BAD_NUMBER_OF_ARGS = 1
 
-    def run(self, input_stream, env):
+    def run(self, input_stream, env, output_stream=None):
         if len(self._args_lst) != 1:
-            output = OutputStream()
-            output.write('exit got wrong number of arguments: expected 0, '\
-                         'got {}.'.format(len(self._args_lst) - 1))
+            output = OutputStream() if output_stream is None else output_stream
+            self._write_error(output, 'exit got wrong number of arguments: expected 0, '\
+                                      'got {}.'.format(len(self._args_lst) - 1))
             return_code = CommandExit.BAD_NUMBER_OF_ARGS
             return RunnableCommandResult(output, env, return_code)
 
@@ -301,24 +389,431 @@ class CommandCd(SingleCommand):
     NEW_DIR_INVALID = 1
     BAD_NUMBER_OF_ARGS = 2
 
-    def run(self, input_stream, env):
-        output = OutputStream()
+    def changes_environment(self):
+        return True
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
         return_code = 0
 
         if len(self._args_lst) != 2:
-            output.write('cd got wrong number of arguments: expected 1, '\
-                         'got {}.'.format(len(self._args_lst) - 1))
+            self._write_error(output, 'cd got wrong number of arguments: expected 1, '\
+                                      'got {}.'.format(len(self._args_lst) - 1))
             return_code = CommandCd.BAD_NUMBER_OF_ARGS
             return RunnableCommandResult(output, env, return_code)
 
         cur_dir = env.get_cwd()
         new_dir = os.path.join(cur_dir, self._args_lst[1])
-        logging.debug('cd: trying to change dir to {}.'.format(new_dir))
+        logging.debug('cd: trying to change dir to %s.', new_dir)
 
         if not os.path.isdir(new_dir):
-            output.write('{} is not a directory.'.format(new_dir))
+            self._write_error(output, '{} is not a directory.'.format(new_dir))
             return_code = CommandCd.NEW_DIR_INVALID
         else:
             env.set_cwd(new_dir)
 
         return RunnableCommandResult(output, env, return_code)
+
+
+@_register_single_command('hash')
+class CommandHash(SingleCommand):
+    """`hash` command: show or reset remembered locations of external commands.
+
+    Command args:
+        0 -- `hash`
+        1..n -- either ``-r`` (forget all locations) or names
+            of commands to look up and remember.
+
+    Without arguments, prints ``hits<TAB>command`` for every remembered command.
+    Returns NOT_FOUND if some of the commands are not found in ``PATH``.
+
+    See :mod:`command_hash`.
+    """
+
+    NOT_FOUND = 1
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
+        return_code = 0
+        hash_table = get_command_hash_table()
+
+        args = self._args_lst[1:]
+        if args == ['-r']:
+            hash_table.clear()
+        elif args:
+            for cmd_name in args:
+                if find_in_path(cmd_name, env) is None:
+                    self._write_error(output, 'hash: {} not found{}'.format(cmd_name, os.linesep))
+                    return_code = CommandHash.NOT_FOUND
+        else:
+            for hits, _, full_path in hash_table.get_entries():
+                output.write('{}\t{}{}'.format(hits, full_path, os.linesep))
+
+        return RunnableCommandResult(output, env, return_code)
+
+
+@_register_single_command('grep')
+class CommandGrep(SingleCommand):
+    """`grep` command: print lines that match a pattern.
+
+    Command args:
+        0 -- `grep`
+        1..n -- options, a pattern (a Python regular expression)
+            and, optionally, filenames. If there are no filenames,
+            `grep` filters its input. Options:
+
+                - ``-c``: print the number of matching lines instead of the lines;
+                - ``-v``: select lines that do `not` match;
+                - ``-i``: ignore case;
+                - ``-F``: the pattern is a fixed string, not a regular expression.
+
+    Lines are read and written one by one, so memory does not depend
+    on the size of the input. With several files, every output line
+    is prefixed by a filename (like in GNU grep).
+
+    Returns FOUND if some line was selected, NOT_FOUND if none was,
+    and ERROR if arguments are wrong or a file was not found.
+    """
+
+    FOUND = 0
+    NOT_FOUND = 1
+    ERROR = 2
+
+    PATTERN_CACHE_SIZE = 128
+
+    @staticmethod
+    @functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+    def _compile_matcher(pattern, ignore_case, fixed_string):
+        """Make a function which tells whether a line matches the pattern.
+
+        Raises:
+            re.error: if the pattern is not a valid regular expression.
+        """
+        if fixed_string and not ignore_case:
+            return lambda line: pattern in line
+
+        if fixed_string:
+            pattern = re.escape(pattern)
+        return re.compile(pattern, re.IGNORECASE if ignore_case else 0).search
+
+    @staticmethod
+    def _grep_lines(lines, matcher, invert, count_only, prefix, output):
+        """Write selected lines (or nothing, if `count_only` is set), return their number."""
+        num_selected = 0
+        # Lines are written in batches, not to pay for every line in a pipe.
+        batch = []
+        batch_size = 0
+
+        for line in lines:
+            if bool(matcher(line)) == invert:
+                continue
+
+            num_selected += 1
+            if count_only:
+                continue
+
+            if not line.endswith('\n'):
+                line += '\n'
+            batch.append(prefix + line if prefix else line)
+            batch_size += len(line)
+            if batch_size >= CHUNK_SIZE:
+                output.write(''.join(batch))
+                batch = []
+                batch_size = 0
+
+        if batch:
+            output.write(''.join(batch))
+        return num_selected
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
+
+        try:
+            opts, args = getopt.getopt(self._args_lst[1:], 'cviF')
+        except getopt.GetoptError as ex:
+            self._write_error(output, 'grep: {}.'.format(ex.msg))
+            return RunnableCommandResult(output, env, CommandGrep.ERROR)
+
+        if not args:
+            self._write_error(output, 'grep got wrong number of arguments: expected a pattern.')
+            return RunnableCommandResult(output, env, CommandGrep.ERROR)
+
+        flags = {opt for opt, _ in opts}
+        pattern, fl_names = args[0], args[1:]
+        try:
+            matcher = CommandGrep._compile_matcher(pattern, '-i' in flags, '-F' in flags)
+        except re.error as ex:
+            self._write_error(output, 'grep: bad pattern {}: {}.'.format(pattern, ex))
+            return RunnableCommandResult(output, env, CommandGrep.ERROR)
+
+        invert = '-v' in flags
+        count_only = '-c' in flags
+        with_prefix = len(fl_names) > 1
+        num_selected = 0
+        has_errors = False
+
+        if not fl_names:
+            num_selected = CommandGrep._grep_lines(input_stream.read_lines(), matcher,
+                                                   invert, count_only, '', output)
+            if count_only:
+                output.write_line(str(num_selected))
+
+        for fl_name in fl_names:
+            full_fl_name = os.path.join(env.get_cwd(), fl_name)
+            if not os.path.isfile(full_fl_name):
+                self._write_error(output, 'grep: file {} not found.{}'.format(full_fl_name, os.linesep))
+                has_errors = True
+                continue
+
+            prefix = fl_name + ':' if with_prefix else ''
+            with open(full_fl_name, encoding=ENCODING, errors=ENCODING_ERRORS, newline='') as fl:
+                num_file_selected = CommandGrep._grep_lines(fl, matcher, invert, count_only, prefix, output)
+            if count_only:
+                output.write_line('{}{}'.format(prefix, num_file_selected))
+            num_selected += num_file_selected
+
+        if has_errors:
+            return_code = CommandGrep.ERROR
+        else:
+            return_code = CommandGrep.FOUND if num_selected else CommandGrep.NOT_FOUND
+        return RunnableCommandResult(output, env, return_code)
+
+
+@_register_single_command('sort')
+class CommandSort(SingleCommand):
+    """`sort` command: print lines of its input or files in sorted order.
+
+    Command args:
+        0 -- `sort`
+        1..n -- options and, optionally, filenames (their lines are
+            sorted together). If there are no filenames, `sort` sorts its input.
+            Options:
+
+                - ``-n``: compare by numeric value;
+                - ``-r``: reverse the order;
+                - ``-u``: print only the first of lines with equal keys;
+                - ``-k N``: compare by the part of a line starting at field N (1-based);
+                - ``-S SIZE``: keep at most SIZE bytes of lines (as Python objects,
+                  with their sort keys, in all processes together) in memory, spill
+                  sorted runs to temporary files beyond that (see :mod:`sorting`);
+                  SIZE may end with K, M or G (binary units), e.g. ``-S 64M``;
+                - ``--parallel=N``: sort runs in N processes.
+
+    Returns FILE_NOT_FOUND if some file was not found, BAD_ARGS if options are wrong.
+    """
+
+    FILE_NOT_FOUND = 1
+    BAD_ARGS = 2
+
+    @staticmethod
+    def _read_file_lines(full_fl_names):
+        for full_fl_name in full_fl_names:
+            with open(full_fl_name, encoding=ENCODING, errors=ENCODING_ERRORS, newline='') as fl:
+                yield from fl
+
+    _SIZE_SUFFIXES = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+    @staticmethod
+    def _parse_field_idx(value):
+        # `-k 2,3` and `-k 2.1` are accepted, but only the starting field matters.
+        number = int(re.match('[0-9]*', value).group() or '0')
+        if number <= 0:
+            raise ValueError(value)
+        return number
+
+    @staticmethod
+    def _parse_positive_int(value):
+        if not value.isdigit() or int(value) <= 0:
+            raise ValueError('not a positive number: {}'.format(value))
+        return int(value)
+
+    @staticmethod
+    def _parse_size(value):
+        """Parse a size like ``100``, ``64K``, ``64M`` or ``1G`` (the suffix is not case-sensitive)."""
+        size_match = re.fullmatch('([0-9]+)([KMG]?)', value, re.IGNORECASE)
+        if size_match is None or int(size_match.group(1)) <= 0:
+            raise ValueError('invalid size: {}'.format(value))
+        return int(size_match.group(1)) * CommandSort._SIZE_SUFFIXES[size_match.group(2).upper()]
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
+
+        try:
+            opts, fl_names = getopt.getopt(self._args_lst[1:], 'nruk:S:', ['parallel='])
+            opts = dict(opts)
+            field_idx = CommandSort._parse_field_idx(opts['-k']) if '-k' in opts else None
+            memory_budget = CommandSort._parse_size(opts.get('-S', str(sorting.DEFAULT_MEMORY_BUDGET)))
+            num_workers = CommandSort._parse_positive_int(opts.get('--parallel', '1'))
+        except (getopt.GetoptError, ValueError) as ex:
+            self._write_error(output, 'sort: wrong arguments: {}.'.format(ex))
+            return RunnableCommandResult(output, env, CommandSort.BAD_ARGS)
+
+        full_fl_names = [os.path.join(env.get_cwd(), fl_name) for fl_name in fl_names]
+        for full_fl_name in full_fl_names:
+            if not os.path.isfile(full_fl_name):
+                self._write_error(output, 'sort: file {} not found.'.format(full_fl_name))
+                return RunnableCommandResult(output, env, CommandSort.FILE_NOT_FOUND)
+
+        if full_fl_names:
+            lines = CommandSort._read_file_lines(full_fl_names)
+        else:
+            lines = input_stream.read_lines()
+
+        sorted_lines = sorting.sort_lines(lines, key=sorting.SortKey('-n' in opts, field_idx),
+                                          reverse='-r' in opts, unique='-u' in opts,
+                                          memory_budget=memory_budget, num_workers=num_workers)
+
+        batch = []
+        batch_size = 0
+        for line in sorted_lines:
+            batch.append(line)
+            batch_size += len(line)
+            if batch_size >= CHUNK_SIZE:
+                output.write(''.join(batch))
+                batch = []
+                batch_size = 0
+        if batch:
+            output.write(''.join(batch))
+
+        return RunnableCommandResult(output, env, 0)
+
+
+def _parse_num_lines_args(cmd_name, args_lst, default_num_lines):
+    """Parse ``[-n N] [FILE]`` arguments of `head` and `tail`.
+
+    Returns:
+        tuple(int, str or None): the number of lines and a filename (or None).
+
+    Raises:
+        ValueError: with a message to show if the arguments are wrong.
+    """
+    try:
+        opts, fl_names = getopt.getopt(args_lst[1:], 'n:')
+    except getopt.GetoptError as ex:
+        raise ValueError('{}: {}.'.format(cmd_name, ex.msg))
+
+    num_lines = default_num_lines
+    for _, value in opts:
+        if not value.isdigit():
+            raise ValueError('{}: invalid number of lines: {}.'.format(cmd_name, value))
+        num_lines = int(value)
+
+    if len(fl_names) > 1:
+        raise ValueError('{} got wrong number of arguments: expected 0 or 1 files, '
+                         'got {}.'.format(cmd_name, len(fl_names)))
+    return num_lines, fl_names[0] if fl_names else None
+
+
+@_register_single_command('head')
+class CommandHead(SingleCommand):
+    """`head` command: print the first lines of its input or a file.
+
+    Command args:
+        0 -- `head`
+        1..n -- ``-n N`` (the number of lines, DEFAULT_NUM_LINES if not provided)
+            and, optionally, a filename.
+
+    Once `head` has its lines, it stops reading: the input is
+    closed, so that the previous command of a pipe stops producing it.
+
+    Returns FILE_NOT_FOUND if the file was not found, BAD_ARGS if arguments are wrong.
+    """
+
+    DEFAULT_NUM_LINES = 10
+    FILE_NOT_FOUND = 1
+    BAD_ARGS = 2
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
+
+        try:
+            num_lines, fl_name = _parse_num_lines_args('head', self._args_lst,
+                                                       CommandHead.DEFAULT_NUM_LINES)
+        except ValueError as ex:
+            self._write_error(output, str(ex))
+            return RunnableCommandResult(output, env, CommandHead.BAD_ARGS)
+
+        if fl_name is None:
+            output.write(''.join(itertools.islice(input_stream.read_lines(), num_lines)))
+            input_stream.close()
+            return RunnableCommandResult(output, env, 0)
+
+        full_fl_name = os.path.join(env.get_cwd(), fl_name)
+        if not os.path.isfile(full_fl_name):
+            self._write_error(output, 'head: file {} not found.'.format(full_fl_name))
+            return RunnableCommandResult(output, env, CommandHead.FILE_NOT_FOUND)
+
+        with open(full_fl_name, encoding=ENCODING, errors=ENCODING_ERRORS, newline='') as fl:
+            output.write(''.join(itertools.islice(fl, num_lines)))
+        return RunnableCommandResult(output, env, 0)
+
+
+@_register_single_command('tail')
+class CommandTail(SingleCommand):
+    """`tail` command: print the last lines of its input or a file.
+
+    Command args:
+        0 -- `tail`
+        1..n -- ``-n N`` (the number of lines, DEFAULT_NUM_LINES if not provided)
+            and, optionally, a filename.
+
+    A file is read backwards from its end, block by block, until
+    there are enough lines: the time does not depend on the file size.
+    The input is read through, keeping only the last lines.
+
+    Returns FILE_NOT_FOUND if the file was not found, BAD_ARGS if arguments are wrong.
+    """
+
+    DEFAULT_NUM_LINES = 10
+    FILE_NOT_FOUND = 1
+    BAD_ARGS = 2
+
+    @staticmethod
+    def _read_last_lines(full_fl_name, num_lines):
+        """Read the last `num_lines` lines of a file as bytes."""
+        if num_lines == 0:
+            return b''
+
+        with open(full_fl_name, 'rb') as fl:
+            pos = fl.seek(0, os.SEEK_END)
+            blocks = []
+            num_newlines = 0
+            # One more newline than lines is needed: the one before the first line
+            # (a trailing newline ends the last line, it does not start a new one).
+            while pos > 0 and num_newlines <= num_lines:
+                block_size = min(CHUNK_SIZE, pos)
+                pos -= block_size
+                fl.seek(pos)
+                block = fl.read(block_size)
+                blocks.append(block)
+                num_newlines += block.count(b'\n')
+
+        data = b''.join(reversed(blocks))
+        line_start = len(data) - 1 if data.endswith(b'\n') else len(data)
+        for _ in range(num_lines):
+            line_start = data.rfind(b'\n', 0, line_start)
+            if line_start == -1:
+                break
+        return data[line_start + 1:]
+
+    def run(self, input_stream, env, output_stream=None):
+        output = OutputStream() if output_stream is None else output_stream
+
+        try:
+            num_lines, fl_name = _parse_num_lines_args('tail', self._args_lst,
+                                                       CommandTail.DEFAULT_NUM_LINES)
+        except ValueError as ex:
+            self._write_error(output, str(ex))
+            return RunnableCommandResult(output, env, CommandTail.BAD_ARGS)
+
+        if fl_name is None:
+            output.write(''.join(collections.deque(input_stream.read_lines(), maxlen=num_lines)))
+            return RunnableCommandResult(output, env, 0)
+
+        full_fl_name = os.path.join(env.get_cwd(), fl_name)
+        if not os.path.isfile(full_fl_name):
+            self._write_error(output, 'tail: file {} not found.'.format(full_fl_name))
+            return RunnableCommandResult(output, env, CommandTail.FILE_NOT_FOUND)
+
+        output.write(CommandTail._read_last_lines(full_fl_name, num_lines))
+        return RunnableCommandResult(output, env, 0)
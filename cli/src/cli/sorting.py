@@ -0,0 +1,232 @@
+"""Sorting of lines which may not fit into memory.
+
+Lines are collected into *runs*, which are limited by their memory
+use: a line costs its size as an object (:func:`sys.getsizeof`) and
+a slot of the list. Sorting makes a key for every line, which costs
+about as much again, so a run takes at most half of its share of
+`memory_budget`. Its share is the whole budget if runs are sorted in
+this process, one run at a time. With N workers, up to 2N runs exist
+at once (N are sorted by the workers, and this process keeps them
+until they are done), so every run gets 1/2N of the budget.
+If the whole input fits into one run, it is sorted in memory.
+Otherwise, every run is sorted and written to a temporary file,
+and the files are merged (see :func:`heapq.merge`), so memory
+use does not depend on the size of the input. At most
+:data:`MERGE_WIDTH` files are merged at once (and open): if there
+are more runs, groups of them are merged into longer runs first.
+
+Runs can be sorted in parallel by a pool of processes.
+
+This is the engine of :class:`single_command.CommandSort`.
+"""
+import concurrent.futures
+import heapq
+import os
+import re
+import struct
+import sys
+import tempfile
+
+from cli.streams import ENCODING, ENCODING_ERRORS
+from cli.workers import make_process_pool
+
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+"""How many bytes sorted lines take at most by default, see :func:`sort_lines`."""
+
+MERGE_WIDTH = 64
+"""How many sorted runs are merged at once, see :func:`sort_lines`."""
+
+_LIST_SLOT_SIZE = struct.calcsize('P')
+
+_NUMBER_REGEX = re.compile(r'\s*([-+]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+))')
+
+
+class SortKey:
+    """A key by which lines are compared.
+
+    A module-level class (and not a lambda), so that it can be
+    passed to other processes.
+    """
+
+    def __init__(self, numeric=False, field_idx=None):
+        """Create a key.
+
+        Args:
+            numeric (bool): compare by a number at the start of the key
+                (0 if there is none), not as strings;
+            field_idx (int): compare by a part of line starting at this
+                whitespace-separated field (1-based); the whole line if None.
+        """
+        self._numeric = numeric
+        self._field_idx = field_idx
+
+    def __call__(self, line):
+        key = line.rstrip('\n')
+        if self._field_idx is not None:
+            fields = key.split(None, self._field_idx - 1)
+            key = fields[self._field_idx - 1] if len(fields) >= self._field_idx else ''
+
+        if not self._numeric:
+            return key
+
+        number_match = _NUMBER_REGEX.match(key)
+        return float(number_match.group(1)) if number_match else 0.0
+
+
+def _write_lines(lines, file_name):
+    with open(file_name, 'w', encoding=ENCODING, errors=ENCODING_ERRORS, newline='') as run_file:
+        run_file.writelines(lines)
+
+
+def _read_lines(file_name):
+    with open(file_name, encoding=ENCODING, errors=ENCODING_ERRORS, newline='') as run_file:
+        yield from run_file
+
+
+def _sort_run_to_file(lines, key, reverse, file_name):
+    """Sort a run and store it; this may run in another process."""
+    lines.sort(key=key, reverse=reverse)
+    _write_lines(lines, file_name)
+    # Free the lines before the next run is read.
+    lines.clear()
+    return file_name
+
+
+def _read_runs(lines, run_budget):
+    """Split lines into lists which take at most `run_budget` bytes (but at least one line).
+
+    Every line ends with a newline. A run is complete once the next line
+    does not fit into it, so it is known whether it is the last one.
+
+    Yields:
+        tuple(list of str, bool): a run, and whether it is the last one.
+    """
+    run = []
+    run_size = 0
+    for line in lines:
+        if not line.endswith('\n'):
+            line += '\n'
+        line_size = sys.getsizeof(line) + _LIST_SLOT_SIZE
+
+        if run and run_size + line_size > run_budget:
+            yield run, False
+            run = []
+            run_size = 0
+        run.append(line)
+        run_size += line_size
+
+    yield run, True
+
+
+def _drop_duplicates(lines, key):
+    """Keep the first line out of every group of consecutive lines with equal keys."""
+    prev_key = None
+    is_first = True
+    for line in lines:
+        line_key = key(line)
+        if is_first or line_key != prev_key:
+            yield line
+        prev_key = line_key
+        is_first = False
+
+
+def sort_lines(lines, key=None, reverse=False, unique=False,
+               memory_budget=DEFAULT_MEMORY_BUDGET, num_workers=1):
+    """Sort lines, spilling to temporary files if they exceed the memory budget.
+
+    The sort is stable.
+
+    Args:
+        lines (iterable of str): lines to sort;
+        key (:class:`.SortKey`): how lines are compared, whole lines if not provided;
+        reverse (bool): sort in descending order;
+        unique (bool): of the lines with equal keys, output only the first one;
+        memory_budget (int): how many bytes lines and their keys take in memory at most,
+            in this process and the workers together (see :mod:`sorting`). A run
+            holds at least one line, and merging takes buffers of the files besides;
+        num_workers (int): how many processes sort runs; 1 means sorting in this process.
+
+    Returns:
+        iterator of str: sorted lines, every one ends with a newline.
+        Temporary files are removed when the iterator is exhausted or closed.
+    """
+    key = SortKey() if key is None else key
+    num_runs_in_flight = 2 * num_workers if num_workers > 1 else 1
+    runs = _read_runs(lines, memory_budget // (2 * num_runs_in_flight))
+
+    first_run, is_last = next(runs)
+    if is_last:
+        first_run.sort(key=key, reverse=reverse)
+        sorted_lines = iter(first_run)
+    else:
+        other_runs = (run for run, _ in runs)
+        sorted_lines = _sort_externally([first_run], other_runs, key, reverse, num_workers)
+
+    return _drop_duplicates(sorted_lines, key) if unique else sorted_lines
+
+
+def _sort_externally(first_runs, other_runs, key, reverse, num_workers):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run_file_names = []
+
+        if num_workers > 1:
+            with make_process_pool(num_workers) as executor:
+                futures = []
+                pending_futures = set()
+                runs = _chain_runs(first_runs, other_runs)
+                while True:
+                    # Don't read the next run before a worker is free to sort it.
+                    while len(pending_futures) >= num_workers:
+                        _, pending_futures = concurrent.futures.wait(
+                            pending_futures, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                    run = next(runs, None)
+                    if run is None:
+                        break
+                    future = executor.submit(_sort_run_to_file, run, key, reverse,
+                                             os.path.join(tmp_dir, 'run_{}.txt'.format(len(futures))))
+                    futures.append(future)
+                    pending_futures.add(future)
+                    # The executor keeps the run until it is sorted, and not longer.
+                    del run
+                run_file_names = [future.result() for future in futures]
+        else:
+            for run in _chain_runs(first_runs, other_runs):
+                file_name = os.path.join(tmp_dir, 'run_{}.txt'.format(len(run_file_names)))
+                run_file_names.append(_sort_run_to_file(run, key, reverse, file_name))
+
+        run_file_names = _merge_to_width(run_file_names, key, reverse, tmp_dir)
+        yield from _merge_files(run_file_names, key, reverse)
+
+
+def _merge_files(file_names, key, reverse):
+    return heapq.merge(*[_read_lines(file_name) for file_name in file_names], key=key, reverse=reverse)
+
+
+def _merge_to_width(run_file_names, key, reverse, tmp_dir):
+    """Merge groups of consecutive runs into files, until at most :data:`MERGE_WIDTH` runs remain.
+
+    Groups are consecutive, and :func:`heapq.merge` takes equal lines
+    from earlier runs first, so the sort stays stable.
+    """
+    num_files = len(run_file_names)
+    while len(run_file_names) > MERGE_WIDTH:
+        merged_file_names = []
+        for group_start in range(0, len(run_file_names), MERGE_WIDTH):
+            group = run_file_names[group_start:group_start + MERGE_WIDTH]
+            file_name = os.path.join(tmp_dir, 'run_{}.txt'.format(num_files))
+            num_files += 1
+            _write_lines(_merge_files(group, key, reverse), file_name)
+            for merged_file_name in group:
+                os.remove(merged_file_name)
+            merged_file_names.append(file_name)
+        run_file_names = merged_file_names
+    return run_file_names
+
+
+def _chain_runs(first_runs, other_runs):
+    # Let the lists be freed as soon as they are sorted.
+    while first_runs:
+        yield first_runs.pop(0)
+    yield from other_runs
@@ -3,32 +3,533 @@
 Every command accepts some input and results
 in some output. This module contains abstractions
 on this ideas.
+
+Data flows through streams in chunks: a writer appends
+chunks, a reader consumes them one by one. A consumed
+chunk is dropped by the stream, so a command that
+reads its input chunk-wise (or line-wise) never needs
+the whole input in memory at once.
+
+A chunk is either a string or bytes. Streams pass chunks
+from writers to readers as is, and convert them only if a
+reader asks for the other kind: e.g. the output of an external
+command is never decoded on its way to another external command
+or to ``wc``, and binary data survives a pipe.
 """
-from io import StringIO
+import codecs
+import collections
+import errno
+import locale
 import os
+import stat
+import threading
+
+from cli.exceptions import BrokenPipeException
+
+
+CHUNK_SIZE = 64 * 1024
+"""Preferred size (in bytes) of a chunk read from a file."""
+
+PIPE_CAPACITY = 16
+"""How many chunks a pipe between two commands holds before its writer blocks."""
+
+ENCODING = locale.getpreferredencoding(False)
+"""Encoding used to convert between string and bytes chunks."""
+
+ENCODING_ERRORS = 'surrogateescape'
+"""Error handler for conversions: undecodable bytes survive a round trip."""
+
+
+def _get_num_bytes(chunk):
+    """The size of a chunk in bytes; a string is counted by its encoded size."""
+    if isinstance(chunk, str):
+        return len(chunk.encode(ENCODING, ENCODING_ERRORS))
+    return len(chunk)
+
+
+class _ChunkBuffer:
+    """A FIFO of chunks shared by an OutputStream and InputStream-s made from it.
+
+    Besides ready chunks, the buffer may hold lazy chunk sources
+    (iterators). Such a source is only advanced when a reader
+    gets to it, so e.g. a file can be copied from one command
+    to another without being read into memory as a whole.
+    """
+
+    def __init__(self):
+        self._items = collections.deque()
+        self._num_bytes_written = 0
+
+    def put(self, chunk):
+        """Append a ready chunk. Empty chunks are ignored."""
+        if chunk:
+            self._items.append(chunk)
+            self._num_bytes_written += _get_num_bytes(chunk)
+
+    def put_source(self, chunks):
+        """Append a lazy source of chunks (any iterable)."""
+        self._items.append(iter(chunks))
+
+    def put_file(self, file_name):
+        """Append a file, it is read lazily."""
+        try:
+            self._num_bytes_written += os.path.getsize(file_name)
+        except OSError:
+            # The error is raised to the reader.
+            pass
+        self.put_source(read_file_chunks(file_name))
+
+    def push_front(self, chunk):
+        """Return a chunk to the head of the buffer, so that it is read next."""
+        if chunk:
+            self._items.appendleft(chunk)
+
+    def get(self):
+        """Remove and return the next chunk, or None if the buffer is exhausted."""
+        items = self._items
+
+        while items:
+            head = items[0]
+            if isinstance(head, (str, bytes)):
+                return items.popleft()
+
+            chunk = next(head, None)
+            if chunk is None:
+                items.popleft()
+            elif chunk:
+                return chunk
+
+        return None
+
+    def close(self):
+        """Signal that nothing more will be written. A no-op for in-memory buffers."""
+        pass
+
+    def get_fileno(self):
+        """In-memory buffers have no file descriptor."""
+        return None
+
+    def get_num_bytes_written(self):
+        """How many bytes were written: ready chunks and files (by their size), not other lazy sources."""
+        return self._num_bytes_written
+
+    def close_reader(self):
+        """Discard everything that has not been read yet."""
+        self._items.clear()
+
+
+class _PipeBuffer:
+    """A bounded, thread-safe FIFO of chunks between two concurrently running commands.
+
+    A writer blocks while the pipe is full, so a fast producer
+    cannot run arbitrarily far ahead of a slow consumer. A reader
+    blocks while the pipe is empty, until the writer closes it.
+
+    If the reader closes the pipe, a writer gets
+    :class:`exceptions.BrokenPipeException` (even one that is waiting
+    for free space), so a producer is never stuck waiting for
+    a consumer that has finished, and knows that it can stop.
+    """
+
+    def __init__(self, capacity):
+        self._chunks = collections.deque()
+        self._capacity = capacity
+        self._writer_closed = False
+        self._reader_closed = False
+        self._num_bytes_written = 0
+
+        lock = threading.Lock()
+        self._not_empty = threading.Condition(lock)
+        self._not_full = threading.Condition(lock)
+
+    def put(self, chunk):
+        """Append a chunk, waiting for free space if the pipe is full.
+
+        Raises:
+            :class:`exceptions.BrokenPipeException`: if the reader has closed the pipe.
+        """
+        with self._not_full:
+            while len(self._chunks) >= self._capacity and not self._reader_closed:
+                self._not_full.wait()
+
+            if self._reader_closed:
+                raise BrokenPipeException('The reader has closed the pipe')
+
+            if chunk:
+                self._chunks.append(chunk)
+                self._num_bytes_written += _get_num_bytes(chunk)
+                self._not_empty.notify()
+
+    def put_source(self, chunks):
+        """Append all chunks of an iterable, one by one.
+
+        Raises:
+            :class:`exceptions.BrokenPipeException`: if the reader has closed the pipe.
+        """
+        for chunk in chunks:
+            self.put(chunk)
+
+    def put_file(self, file_name):
+        """Append all chunks of a file, one by one."""
+        self.put_source(read_file_chunks(file_name))
+
+    def push_front(self, chunk):
+        """Return a chunk to the head of the pipe, so that it is read next."""
+        if chunk:
+            with self._not_empty:
+                self._chunks.appendleft(chunk)
+                self._not_empty.notify()
+
+    def get(self):
+        """Remove and return the next chunk, or None if the pipe is closed and empty."""
+        with self._not_empty:
+            while not self._chunks and not self._writer_closed and not self._reader_closed:
+                self._not_empty.wait()
+
+            if not self._chunks:
+                return None
+
+            self._not_full.notify()
+            return self._chunks.popleft()
+
+    def close(self):
+        """Signal that nothing more will be written."""
+        with self._not_empty:
+            self._writer_closed = True
+            self._not_empty.notify_all()
+
+    def close_reader(self):
+        """Discard everything that has not been read yet, and all further writes."""
+        with self._not_full:
+            self._reader_closed = True
+            self._chunks.clear()
+            self._not_full.notify_all()
+            self._not_empty.notify_all()
+
+    def get_fileno(self):
+        """In-memory pipes have no file descriptor."""
+        return None
+
+    def get_num_bytes_written(self):
+        """How many bytes were written into the pipe."""
+        return self._num_bytes_written
+
+
+class _FileBuffer:
+    """One end of a stream that is backed by an OS-level file, e.g. an OS pipe.
+
+    Such a stream can be handed to an external process as is:
+    the process reads or writes the file descriptor directly.
+    Strings written into the file are encoded, chunks read from it are bytes.
+    """
+
+    def __init__(self, file_obj):
+        """Wrap an unbuffered binary file object (opened for either reading or writing)."""
+        self._file_obj = file_obj
+        self._pushed_back = collections.deque()
+        self._num_bytes_written = 0
+
+    def put(self, chunk):
+        """Write a chunk into the file.
+
+        Raises:
+            :class:`exceptions.BrokenPipeException`: if the file is a pipe
+                and its reader has closed it.
+        """
+        if isinstance(chunk, str):
+            chunk = chunk.encode(ENCODING, ENCODING_ERRORS)
+
+        self._num_bytes_written += len(chunk)
+        # An unbuffered file may write only a part of the data.
+        data = memoryview(chunk)
+        try:
+            while data:
+                data = data[self._file_obj.write(data):]
+        except BrokenPipeError as ex:
+            raise BrokenPipeException(str(ex))
+
+    def put_source(self, chunks):
+        """Write all chunks of an iterable into the file."""
+        for chunk in chunks:
+            self.put(chunk)
+
+    def put_file(self, file_name):
+        """Copy a file into the file, see :func:`.copy_file_to_fd`."""
+        num_bytes, _ = copy_file_to_fd(file_name, self._file_obj.fileno())
+        self._num_bytes_written += num_bytes
+
+    def push_front(self, chunk):
+        """Return a chunk to the head of the stream, so that it is read next."""
+        if chunk:
+            self._pushed_back.appendleft(chunk)
+
+    def get(self):
+        """Read the next chunk, or return None at the end of file."""
+        if self._pushed_back:
+            return self._pushed_back.popleft()
+
+        if self._file_obj.closed:
+            return None
+
+        return self._file_obj.read(CHUNK_SIZE) or None
+
+    def close(self):
+        """Close the file."""
+        self._file_obj.close()
+
+    def close_reader(self):
+        """Close the file: nothing more is read from it."""
+        self._pushed_back.clear()
+        self._file_obj.close()
+
+    def get_fileno(self):
+        """Return file descriptor of the underlying file."""
+        return self._file_obj.fileno()
+
+    def get_num_bytes_written(self):
+        """How many bytes the shell has written into the file (not a process given the descriptor)."""
+        return self._num_bytes_written
+
+
+class _FdOutputBuffer:
+    """A write-only buffer that sends data to a file descriptor (e.g. stdout) as it comes.
+
+    The data is collected and written either line by line
+    (a write that contains a newline is written out at once)
+    or in blocks of `buffer_size` bytes. Nothing is kept once
+    it is written, so memory use does not depend on the size of the output.
+    The descriptor is closed with the buffer only if the buffer owns it.
+    """
+
+    def __init__(self, fd, line_buffered, buffer_size, terminate_lines, owns_fd=False):
+        self._fd = fd
+        self._line_buffered = line_buffered
+        self._buffer_size = buffer_size
+        self._terminate_lines = terminate_lines
+        self._owns_fd = owns_fd
+        self._pending = bytearray()
+        self._last_byte = None
+        self._num_bytes_written = 0
+
+    def put(self, chunk):
+        """Write a chunk (it may stay in the buffer for a while).
+
+        Raises:
+            :class:`exceptions.BrokenPipeException`: if the descriptor is a pipe
+                and its reader has closed it.
+        """
+        if not chunk:
+            return
+        if isinstance(chunk, str):
+            chunk = chunk.encode(ENCODING, ENCODING_ERRORS)
+
+        self._pending += chunk
+        self._last_byte = chunk[-1:]
+        self._num_bytes_written += len(chunk)
+        if len(self._pending) >= self._buffer_size or (self._line_buffered and b'\n' in chunk):
+            self.flush()
+
+    def put_source(self, chunks):
+        """Write all chunks of an iterable, one by one."""
+        for chunk in chunks:
+            self.put(chunk)
+
+    def put_file(self, file_name):
+        """Copy a file into the descriptor, see :func:`.copy_file_to_fd`."""
+        self.flush()
+        num_bytes, last_byte = copy_file_to_fd(file_name, self._fd)
+        self._num_bytes_written += num_bytes
+        self._last_byte = last_byte or self._last_byte
+
+    def flush(self):
+        """Write out everything that is buffered."""
+        pending, self._pending = self._pending, bytearray()
+        data = memoryview(pending)
+        try:
+            while data:
+                data = data[os.write(self._fd, data):]
+        except BrokenPipeError as ex:
+            raise BrokenPipeException(str(ex))
+
+    def close(self):
+        """Flush the buffer, ending the output with a newline if asked to.
+
+        The descriptor is closed if the buffer owns it.
+        """
+        if self._terminate_lines and self._last_byte not in (None, b'\n'):
+            self._pending += b'\n'
+            self._last_byte = b'\n'
+
+        try:
+            self.flush()
+        finally:
+            if self._owns_fd and self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def get_fileno(self):
+        """Return the descriptor, for a process to write into it directly.
+
+        The buffered data is written out first, so that the outputs come in order.
+        """
+        self.flush()
+        # The shell does not know what the process writes.
+        self._last_byte = None
+        return self._fd
+
+    def get_num_bytes_written(self):
+        """How many bytes the shell has written, including the buffered ones.
+
+        What a process writes into the descriptor itself is not counted.
+        """
+        return self._num_bytes_written
+
+    def get(self):
+        """Nothing can be read back: all the data is sent to the descriptor."""
+        return None
+
+    def push_front(self, chunk):
+        """Nothing can be read back, see :meth:`get`."""
+        pass
+
+    def close_reader(self):
+        """Nothing can be read back, see :meth:`get`."""
+        pass
 
 
 class _BaseStream:
     """A common implementation detail for Input- and Output-Stream.
 
-    Both streams are implemented as a wrapper above io.StringIO.
-    So, technically, they are reading and writing from a in-memory string.
+    Both streams are views of a :class:`._ChunkBuffer` (or
+    of a :class:`._PipeBuffer`, if made by :func:`make_pipe`).
+    So, technically, they are reading and writing from a in-memory queue of strings.
+    Ends of an OS pipe (see :func:`make_os_pipe`) are backed by a :class:`._FileBuffer`,
+    and a stream to a terminal (see :func:`make_fd_output_stream`) by a :class:`._FdOutputBuffer`.
     """
 
-    def __init__(self):
-        """Construct a Stream (both Input and Output)"""
-        self._io_obj = StringIO()
+    def __init__(self, chunk_buffer=None):
+        """Construct a Stream (both Input and Output).
+
+        Args:
+            chunk_buffer (:class:`._ChunkBuffer`): a buffer to share
+                with another stream. A fresh one is created by default.
+        """
+        self._buffer = _ChunkBuffer() if chunk_buffer is None else chunk_buffer
+
+    def get_fileno(self):
+        """Return the file descriptor behind this stream, or None if it is in-memory."""
+        return self._buffer.get_fileno()
 
 
 class InputStream(_BaseStream):
     """An abstraction of command's input.
 
-    A command can read from InputStream.
+    A command can read from InputStream: either chunk by chunk
+    (:meth:`read_chunks` for strings, :meth:`read_byte_chunks` for bytes,
+    :meth:`read_raw_chunks` for whatever was written), line by line
+    (:meth:`read_lines`, or just iterate over the stream), or all at once
+    (:meth:`get_input`). Chunk- and line-wise reading consumes the input.
     """
 
+    @staticmethod
+    def from_chunks(chunks):
+        """Make an InputStream that lazily reads the given iterable of chunks."""
+        inp_stream = InputStream()
+        inp_stream._buffer.put_source(chunks)
+        return inp_stream
+
+    def read_raw_chunks(self):
+        """Iterate over the input chunk by chunk, as the chunks were written.
+
+        Every chunk is either a non-empty string or non-empty bytes.
+        """
+        chunk = self._buffer.get()
+        while chunk is not None:
+            yield chunk
+            chunk = self._buffer.get()
+
+    def read_chunks(self, errors=ENCODING_ERRORS):
+        """Iterate over the input chunk by chunk (as strings of arbitrary length).
+
+        Args:
+            errors (str): how to handle bytes that are not valid :data:`ENCODING`,
+                see :func:`codecs.decode`.
+        """
+        decoder = codecs.getincrementaldecoder(ENCODING)(errors)
+
+        for chunk in self.read_raw_chunks():
+            if isinstance(chunk, str):
+                # An incomplete character can't be continued by a string.
+                decoded_tail = decoder.decode(b'', final=True)
+                decoder.reset()
+                if decoded_tail:
+                    yield decoded_tail
+                yield chunk
+            else:
+                decoded_chunk = decoder.decode(chunk)
+                if decoded_chunk:
+                    yield decoded_chunk
+
+        decoded_tail = decoder.decode(b'', final=True)
+        if decoded_tail:
+            yield decoded_tail
+
+    def read_byte_chunks(self):
+        """Iterate over the input chunk by chunk (as bytes of arbitrary length)."""
+        for chunk in self.read_raw_chunks():
+            if isinstance(chunk, str):
+                yield chunk.encode(ENCODING, ENCODING_ERRORS)
+            else:
+                yield chunk
+
+    def read_lines(self):
+        """Iterate over the input line by line.
+
+        Every line but, possibly, the last one ends with ``\\n``.
+        """
+        line_parts = []
+
+        for chunk in self.read_chunks():
+            line_start = 0
+            line_end = chunk.find('\n')
+
+            while line_end != -1:
+                line_parts.append(chunk[line_start:line_end + 1])
+                yield ''.join(line_parts)
+                line_parts = []
+
+                line_start = line_end + 1
+                line_end = chunk.find('\n', line_start)
+
+            if line_start < len(chunk):
+                line_parts.append(chunk[line_start:])
+
+        if line_parts:
+            yield ''.join(line_parts)
+
+    def __iter__(self):
+        return self.read_lines()
+
     def get_input(self):
-        """Read the whole input (as a string)"""
-        return self._io_obj.getvalue()
+        """Read the whole input (as a string).
+
+        This is a convenience method: unlike other reading
+        methods, it can be called repeatedly, since the whole
+        input is kept in the stream afterwards.
+        It is meant for showing the input to a user, so
+        bytes that are not valid text are replaced with U+FFFD.
+        """
+        whole_input = ''.join(self.read_chunks(errors='replace'))
+        self._buffer.push_front(whole_input)
+        return whole_input
+
+    def close(self):
+        """Stop reading this stream.
+
+        The unread part of the input is discarded. If the stream
+        is a pipe end, its writer does not block anymore.
+        """
+        self._buffer.close_reader()
 
 
 class OutputStream(_BaseStream):
@@ -37,21 +538,250 @@ class OutputStream(_BaseStream):
     A command can write into OutputStream.
     """
 
-    def write(self, string):
-        """Write a string to output stream"""
-        self._io_obj.write(string)
+    def write(self, data):
+        """Write a string or bytes to output stream.
+
+        Raises:
+            :class:`exceptions.BrokenPipeException`: if the stream is a pipe
+                and its reader has closed it: the writer should stop.
+        """
+        self._buffer.put(data)
 
     def write_line(self, string):
         """Write a newline-trailed string to output stream"""
         self.write(string)
         self.write(os.linesep)
 
+    def write_chunks(self, chunks):
+        """Write an iterable of strings or bytes to output stream.
+
+        The iterable is consumed lazily: only when a reader
+        of this stream gets to it.
+        """
+        self._buffer.put_source(chunks)
+
+    def write_file(self, file_name):
+        """Write the contents of a file to output stream.
+
+        If the stream is backed by a file descriptor, the data is
+        copied by the kernel (see :func:`.copy_file_to_fd`) right away.
+        Otherwise, the file is read lazily, like in :meth:`write_chunks`.
+
+        Raises:
+            :class:`exceptions.BrokenPipeException`: if the stream is a pipe
+                and its reader has closed it.
+        """
+        self._buffer.put_file(file_name)
+
+    def get_num_bytes_written(self):
+        """Return how many bytes were written into this stream.
+
+        The data is counted as it is written, strings by their encoded size.
+        Data that an external process writes directly into the
+        descriptor is not counted, nor are lazy sources of chunks in memory
+        (see :meth:`write_chunks`), which are read later.
+        """
+        return self._buffer.get_num_bytes_written()
+
+    def close(self):
+        """Signal that nothing more will be written to this stream.
+
+        Readers of a pipe wait for more data until its writer closes it.
+        """
+        self._buffer.close()
+
     def to_input_stream(self):
         """Convert this OutputStream to an InputStream.
 
         As a result of pipe, e.g. "echo 123 | wc", a command's
         output becomes another command's input.
+        The data is not copied: both streams share the same buffer.
         """
-        inp_stream = InputStream()
-        inp_stream._io_obj.write(self._io_obj.getvalue())
-        return inp_stream
+        return InputStream(self._buffer)
+
+
+def make_pipe(capacity=PIPE_CAPACITY):
+    """Make a pipe: a pair of connected streams for concurrently running commands.
+
+    Args:
+        capacity (int): how many chunks the pipe holds before
+            its writer blocks.
+
+    Returns:
+        tuple(:class:`.InputStream`, :class:`.OutputStream`): the read
+        and the write end of the pipe.
+    """
+    pipe_buffer = _PipeBuffer(capacity)
+    return InputStream(pipe_buffer), OutputStream(pipe_buffer)
+
+
+def make_os_pipe():
+    """Make an OS pipe, with both ends wrapped into streams.
+
+    Unlike :func:`make_pipe`, the data does not go through
+    the shell if both ends are used by external processes.
+
+    Returns:
+        tuple(:class:`.InputStream`, :class:`.OutputStream`): the read
+        and the write end of the pipe.
+    """
+    read_fd, write_fd = os.pipe()
+    return (InputStream(_FileBuffer(open(read_fd, 'rb', buffering=0))),
+            OutputStream(_FileBuffer(open(write_fd, 'wb', buffering=0))))
+
+
+def make_fd_output_stream(fd, line_buffered=False, buffer_size=CHUNK_SIZE, terminate_lines=False):
+    """Make an OutputStream that writes into a file descriptor incrementally, e.g. to a terminal.
+
+    External commands that write to the stream are given the
+    descriptor itself. Close the stream to flush it; the descriptor
+    stays open. The output can't be read back from a result of a command.
+
+    Args:
+        fd (int): a file descriptor opened for writing;
+        line_buffered (bool): write out every line as soon as it is complete,
+            otherwise only full blocks of `buffer_size` bytes are written before the stream is closed;
+        buffer_size (int): how many bytes are kept before they are written out;
+        terminate_lines (bool): on closing, add a newline if the output
+            written by the shell does not end with one.
+    """
+    return OutputStream(_FdOutputBuffer(fd, line_buffered, buffer_size, terminate_lines))
+
+
+FILE_BUFFER_SIZE = 1024 * 1024
+"""How many bytes are buffered before they are written into a file, see :func:`open_file_output_stream`."""
+
+
+def open_file_output_stream(file_name, append=False, buffer_size=FILE_BUFFER_SIZE):
+    """Open a file for writing (e.g. for redirection of output), and wrap it into an OutputStream.
+
+    Writes are collected into blocks of `buffer_size` bytes. External
+    commands that write to the stream are given the file descriptor.
+    Close the stream to flush it and close the file.
+
+    Args:
+        file_name (str): a name of the file, it is created if it does not exist;
+        append (bool): write to the end of the file, otherwise it is truncated;
+        buffer_size (int): how many bytes are kept before they are written out.
+
+    Raises:
+        OSError: if the file can't be opened.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+    flags |= os.O_APPEND if append else os.O_TRUNC
+    fd = os.open(file_name, flags, 0o666)
+    return OutputStream(_FdOutputBuffer(fd, False, buffer_size, False, owns_fd=True))
+
+
+def open_file_input_stream(file_name):
+    """Open a file for reading (e.g. for redirection of input), and wrap it into an InputStream.
+
+    The file is read in chunks of :data:`CHUNK_SIZE` bytes; external
+    commands that read the stream are given the file descriptor.
+    Close the stream to close the file.
+
+    Raises:
+        OSError: if the file can't be opened.
+    """
+    return InputStream(_FileBuffer(open(file_name, 'rb', buffering=0)))
+
+
+_KERNEL_COPY_ERRNOS = frozenset(getattr(errno, name) for name in
+                                ['EINVAL', 'ENOSYS', 'EXDEV', 'EOPNOTSUPP', 'ENOTSOCK']
+                                if hasattr(errno, name))
+"""Errors which mean that a kind of kernel-side copying is not supported for these files."""
+
+
+def _copy_in_kernel(copy_func, in_fd, out_fd, offset, file_size):
+    """Copy the file from `offset` with `copy_func` (it takes the offset, returns the number of bytes).
+
+    Returns:
+        int: the offset the file is copied up to, less than `file_size` if copying is not supported.
+    """
+    try:
+        while offset < file_size:
+            num_copied = copy_func(in_fd, out_fd, offset, file_size - offset)
+            if num_copied == 0:
+                break
+            offset += num_copied
+    except OSError as ex:
+        if ex.errno not in _KERNEL_COPY_ERRNOS:
+            raise
+    return offset
+
+
+def _copy_file_range(in_fd, out_fd, offset, count):
+    return os.copy_file_range(in_fd, out_fd, count, offset)
+
+
+def _sendfile(in_fd, out_fd, offset, count):
+    return os.sendfile(out_fd, in_fd, offset, count)
+
+
+def _can_copy_file_range(out_fd):
+    """Whether :func:`os.copy_file_range` may work: the target is a regular file, not opened for appending."""
+    if not hasattr(os, 'copy_file_range') or not stat.S_ISREG(os.fstat(out_fd).st_mode):
+        return False
+
+    # The function exists on Linux only, so fcntl is there (it fails with EBADF on O_APPEND files).
+    import fcntl
+    return not fcntl.fcntl(out_fd, fcntl.F_GETFL) & os.O_APPEND
+
+
+def copy_file_to_fd(file_name, out_fd):
+    """Copy a whole file into a file descriptor.
+
+    Where possible, the data does not pass through the user space:
+    :func:`os.copy_file_range` is tried if `out_fd` is a regular file
+    (not opened for appending),
+    then :func:`os.sendfile`. If the kernel can't copy the files
+    (e.g. the platform has neither), the rest is copied chunk by chunk.
+
+    Returns:
+        tuple(int, bytes): how many bytes are copied, and the last
+        of them (empty if the file is empty).
+
+    Raises:
+        :class:`exceptions.BrokenPipeException`: if `out_fd` is a pipe
+            and its reader has closed it.
+    """
+    with open(file_name, 'rb') as in_file:
+        in_fd = in_file.fileno()
+        file_size = os.fstat(in_fd).st_size
+        offset = 0
+
+        try:
+            if _can_copy_file_range(out_fd):
+                offset = _copy_in_kernel(_copy_file_range, in_fd, out_fd, offset, file_size)
+            if hasattr(os, 'sendfile'):
+                offset = _copy_in_kernel(_sendfile, in_fd, out_fd, offset, file_size)
+
+            # The rest, and whatever was appended to the file meanwhile.
+            in_file.seek(offset)
+            chunk = in_file.read(CHUNK_SIZE)
+            while chunk:
+                offset += len(chunk)
+                data = memoryview(chunk)
+                while data:
+                    data = data[os.write(out_fd, data):]
+                chunk = in_file.read(CHUNK_SIZE)
+        except BrokenPipeError as ex:
+            raise BrokenPipeException(str(ex))
+
+        if offset == 0:
+            return 0, b''
+        in_file.seek(offset - 1)
+        return offset, in_file.read(1)
+
+
+def read_file_chunks(file_name, chunk_size=CHUNK_SIZE):
+    """Lazily read a file chunk by chunk (as bytes).
+
+    The file is opened on the first iteration and closed
+    once the last chunk is read.
+    """
+    with open(file_name, 'rb') as opened_file:
+        chunk = opened_file.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = opened_file.read(chunk_size)
@@ -0,0 +1,117 @@
+"""An opt-in structured trace of command processing.
+
+Every processed line goes through stages: preprocess, lex,
+parse (or instantiate a cached template, see :mod:`command_cache`)
+and run. When tracing is enabled, each stage produces a record::
+
+    {'stage': 'lex', 'duration': 1.5e-05, 'input_size': 11, 'num_lexemes': 3}
+
+Sizes of command lines (``input_size``, ``output_size``) are in
+characters. A run records its ``return_code`` and ``num_bytes_written``:
+how many bytes the shell has written into the output (see
+:meth:`streams.OutputStream.get_num_bytes_written`; what external
+commands write directly to the terminal or a file is not counted).
+Records go to a *sink*: a callable, e.g. ``list.append`` or :class:`.JsonLinesSink`.
+
+Tracing is disabled by default, and then :func:`.span` costs
+a function call.
+
+Example::
+
+    trace.enable(trace.JsonLinesSink(open('trace.jsonl', 'w')))
+"""
+import json
+import threading
+import time
+
+
+_sink = None
+
+
+def enable(sink):
+    """Start sending trace records to `sink` (a callable that takes a dict)."""
+    global _sink
+    _sink = sink
+
+
+def disable():
+    """Stop tracing."""
+    global _sink
+    _sink = None
+
+
+def is_enabled():
+    """Whether records are produced."""
+    return _sink is not None
+
+
+class _Span:
+    """A stage being traced: a context manager which measures its duration."""
+
+    __slots__ = ('_sink', '_record', '_start_time')
+
+    def __init__(self, sink, stage, fields):
+        self._sink = sink
+        self._record = dict(stage=stage, **fields)
+        self._start_time = None
+
+    def set(self, **fields):
+        """Add fields to the record, e.g. sizes of results."""
+        self._record.update(fields)
+
+    def __enter__(self):
+        self._start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._record['duration'] = time.perf_counter() - self._start_time
+        if exc_type is not None:
+            self._record['error'] = exc_type.__name__
+        self._sink(self._record)
+        return False
+
+
+class _NullSpan:
+    """A span which records nothing, used while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage, **fields):
+    """Trace a stage: use as ``with trace.span('lex', input_size=n) as lex_span: ...``.
+
+    Args:
+        stage (str): a name of the stage;
+        fields: initial fields of the record.
+    """
+    sink = _sink
+    if sink is None:
+        return _NULL_SPAN
+    return _Span(sink, stage, fields)
+
+
+class JsonLinesSink:
+    """A sink that writes each record as a line of JSON to a text file."""
+
+    def __init__(self, out_file):
+        self._out_file = out_file
+        # Sessions of a server are traced from different threads.
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._out_file.write(line)
+            self._out_file.flush()
@@ -0,0 +1,25 @@
+"""Pools of worker processes, for commands that split their work (``wc``, ``sort``).
+
+Stages of a pipe run in threads, and forking a process that has
+threads may copy locks that are held by other threads, so the
+workers are started by a fork server, or from scratch where
+it is not available, never by forking the shell.
+"""
+import concurrent.futures
+import multiprocessing
+import sys
+
+
+def _get_context():
+    start_methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in start_methods else 'spawn')
+
+
+def make_process_pool(num_workers):
+    """Create a :class:`concurrent.futures.ProcessPoolExecutor` that does not fork the shell.
+
+    Before Python 3.7 the executor doesn't take a context, and uses the default one.
+    """
+    if sys.version_info < (3, 7):
+        return concurrent.futures.ProcessPoolExecutor(num_workers)
+    return concurrent.futures.ProcessPoolExecutor(num_workers, mp_context=_get_context())
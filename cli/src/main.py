@@ -1,8 +1,13 @@
 #! /usr/bin/env python3
 
+import argparse
 import logging.config
+import sys
 
+from cli import launcher
+from cli import trace
 from cli.shell import Shell
+from cli.server import run_server
 
 
 log_config = {
@@ -23,6 +28,7 @@ log_config = {
                 'class': 'logging.FileHandler',
                 'filename': 'shell_debug.log',
                 'mode': 'w',
+                'delay': True,
                 'formatter': 'detailed',
             },
             'file_info': {
@@ -30,17 +36,75 @@ log_config = {
                 'filename': 'shell_info.log',
                 'level': 'INFO',
                 'mode': 'w',
+                'delay': True,
                 'formatter': 'simple',
             },
         },
         'root': {
-            'level': 'DEBUG',
+            # Overridden by --log-level.
+            'level': 'WARNING',
             'handlers': ['file_debug', 'file_info']
         },
     }
 
 
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description='A command line interpreter.')
+    arg_parser.add_argument('script', nargs='?',
+                            help='run commands from this file (or from stdin, if it is not a terminal) '
+                                 'and exit with the last return code')
+    arg_parser.add_argument('--server', metavar='SOCKET',
+                            help='serve shell sessions on this Unix socket')
+    arg_parser.add_argument('--fork-server', action='store_true',
+                            help='start external commands from a small helper process (POSIX only)')
+    arg_parser.add_argument('--output-buffering', choices=['line', 'block'],
+                            help='write outputs of commands line by line or in blocks '
+                                 '(by default, line by line to a terminal; not used with --server)')
+    arg_parser.add_argument('--log-level', default='WARNING',
+                            choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+                            help='write log messages of this level and above to shell_*.log files')
+    arg_parser.add_argument('--trace', metavar='FILE',
+                            help='write a trace of every stage of command processing '
+                                 'to this file (JSON lines)')
+    return arg_parser.parse_args()
+
+
 if __name__ == '__main__':
+    args = parse_args()
+    log_config['root']['level'] = args.log_level
     logging.config.dictConfig(log_config)
-    shell = Shell()
-    shell.main_loop()
+
+    trace_file = None
+    if args.trace is not None:
+        trace_file = open(args.trace, 'w')
+        trace.enable(trace.JsonLinesSink(trace_file))
+
+    fork_server_launcher = None
+    if args.fork_server:
+        fork_server_launcher = launcher.ForkServerLauncher()
+        launcher.set_launcher(fork_server_launcher)
+
+    try:
+        if args.server is not None:
+            # Every session has its own shell.
+            run_server(args.server)
+        else:
+            line_buffered_output = None
+            if args.output_buffering is not None:
+                line_buffered_output = args.output_buffering == 'line'
+            shell = Shell(line_buffered_output)
+
+            if args.script is not None:
+                with open(args.script) as script:
+                    ret_code = shell.run_script(script, sys.stdout, sys.stderr)
+                sys.exit(ret_code)
+            elif not sys.stdin.isatty():
+                sys.exit(shell.run_script(sys.stdin, sys.stdout, sys.stderr))
+            else:
+                shell.main_loop()
+    finally:
+        if fork_server_launcher is not None:
+            fork_server_launcher.close()
+        if trace_file is not None:
+            trace.disable()
+            trace_file.close()
@@ -0,0 +1,32 @@
+import unittest
+
+from benchmarks import runner
+from benchmarks.workloads import WORKLOADS
+
+
+class BenchmarksTest(unittest.TestCase):
+    """A smoke test of the benchmarks: tiny sizes, one repetition.
+    """
+
+    def test_all_workloads_run(self):
+        results = runner.run_suite(WORKLOADS, scale=0.001, repeat=1)
+        self.assertEqual(set(results), {workload.name for workload in WORKLOADS})
+        for result in results.values():
+            self.assertGreater(result['throughput'], 0)
+        self.assertIn('wc_buffer', runner.format_results(results))
+
+    def test_slope(self):
+        linear = {size: size * 1e-6 for size in [10, 100, 1000]}
+        quadratic = {size: size ** 2 * 1e-6 for size in [10, 100, 1000]}
+        self.assertAlmostEqual(runner.get_slope(linear), 1.0)
+        self.assertAlmostEqual(runner.get_slope(quadratic), 2.0)
+
+    def test_compare(self):
+        baseline = {'lex': {'unit': 'chars', 'throughput': 1000.0, 'slope': 1.0}}
+        self.assertEqual(runner.compare({'lex': dict(baseline['lex'], throughput=900.0)}, baseline), [])
+
+        regressions = runner.compare({'lex': {'unit': 'chars', 'throughput': 100.0, 'slope': 2.0},
+                                      'new': {'unit': 'chars', 'throughput': 1.0, 'slope': 3.0}},
+                                     baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(regression.startswith('lex') for regression in regressions))
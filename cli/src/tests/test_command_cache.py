@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+import os
+import tempfile
+
+from cli.command_cache import ParsedCommandCache
+from cli.environment import Environment
+from cli.lexer import Lexer
+from cli.streams import InputStream
+from cli import exceptions
+
+
+class ParsedCommandCacheTest(unittest.TestCase):
+    """Tests on caching of parsed commands.
+    """
+
+    def setUp(self):
+        self.env = Environment()
+        self.cache = ParsedCommandCache()
+
+    def _run(self, raw_str):
+        command = self.cache.build_command(raw_str, self.env)
+        return command.run(InputStream(), self.env).get_output()
+
+    def test_repeated_line_is_not_lexed(self):
+        self.env.set_var('x', 'abc')
+        self.assertEqual(self._run('echo $x | wc'), '1 1 4')
+
+        with mock.patch.object(Lexer, 'get_lexemes', side_effect=AssertionError):
+            self.assertEqual(self._run('echo $x | wc'), '1 1 4')
+
+        self.assertEqual(self.cache.cache_info().hits, 1)
+        self.assertEqual(self.cache.cache_info().misses, 1)
+
+    def test_values_are_bound_late(self):
+        for value in ['1', 'qwe', '1234567']:
+            self.env.set_var('x', value)
+            self.assertEqual(self._run('echo "$x" pre$x'),
+                             '{0} pre{0}{1}'.format(value, os.linesep))
+
+        self.assertEqual(self.cache.cache_info().hits, 2)
+
+    def test_value_with_space(self):
+        self.env.set_var('x', 'a b')
+        self.assertEqual(self._run('echo $x | wc'), '1 2 4')
+        self.assertEqual(self.cache.cache_info().currsize, 0)
+
+        self.env.set_var('x', 'ab')
+        self.assertEqual(self._run('echo $x | wc'), '1 1 3')
+
+    def test_redirection(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.env.set_cwd(tmp_dir.name)
+
+        for file_name in ['a.txt', 'b.txt']:
+            self.env.set_var('f', file_name)
+            self.assertEqual(self._run('echo $f > $f'), '')
+            self.assertEqual(self._run('wc < $f'), '1 1 6')
+        self.assertEqual(self.cache.cache_info().hits, 2)
+
+        # A value can't turn into a redirection.
+        self.env.set_var('x', '>c.txt')
+        self.assertEqual(self._run('echo $x'), '')
+        self.assertEqual(self._run('cat c.txt'), os.linesep)
+
+    def test_variable_as_command_name(self):
+        self.env.set_var('cmd', 'echo')
+        self.assertEqual(self._run('$cmd'), os.linesep)
+        self.env.set_var('cmd', 'pwd')
+        self.assertEqual(self._run('$cmd'), os.getcwd())
+
+        self.assertEqual(self.cache.cache_info().hits, 0)
+
+    def test_invalid_line(self):
+        for _ in range(2):
+            with self.assertRaises(exceptions.ParseException):
+                self.cache.build_command('echo 1 | | wc', self.env)
+
+    def test_lru_eviction(self):
+        cache = ParsedCommandCache(maxsize=2)
+        for raw_str in ['echo 1', 'echo 2', 'echo 1', 'echo 3', 'echo 2']:
+            cache.build_command(raw_str, self.env)
+
+        self.assertEqual(cache.cache_info(), (1, 4, 2, 2))
+
+        cache.cache_clear()
+        self.assertEqual(cache.cache_info(), (0, 0, 2, 0))
@@ -0,0 +1,130 @@
+import unittest
+import os
+import stat
+import sys
+import tempfile
+import unittest.mock
+
+from cli import launcher
+from cli.command_hash import CommandHashTable, get_command_hash_table, resolve_command
+from cli.environment import Environment
+from cli.streams import InputStream
+from cli.single_command import CommandExternal, CommandHash
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CommandHashTableTest(unittest.TestCase):
+    """Tests on looking commands up in PATH.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir_1 = os.path.join(self.tmp_dir.name, 'dir_1')
+        self.dir_2 = os.path.join(self.tmp_dir.name, 'dir_2')
+        os.mkdir(self.dir_1)
+        os.mkdir(self.dir_2)
+        self.path_var = os.pathsep.join([self.dir_1, self.dir_2])
+
+        self.clock = _FakeClock()
+        self.table = CommandHashTable(revalidate_interval=1.0, clock=self.clock)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_executable(self, dir_name, name):
+        full_path = os.path.join(dir_name, name)
+        with open(full_path, 'w') as f:
+            f.write('#!/bin/sh\n')
+        os.chmod(full_path, os.stat(full_path).st_mode | stat.S_IXUSR)
+        # Make sure the directory looks modified even on filesystems with coarse timestamps.
+        dir_stat = os.stat(dir_name)
+        os.utime(dir_name, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns + 10 ** 9))
+        return full_path
+
+    def test_found_and_remembered(self):
+        full_path = self.make_executable(self.dir_2, 'tool')
+        self.assertEqual(self.table.lookup('tool', self.path_var), full_path)
+        self.assertEqual(self.table.lookup('tool', self.path_var), full_path)
+        self.assertEqual(self.table.get_entries(), [(2, 'tool', full_path)])
+
+    def test_not_found_is_remembered_until_revalidation(self):
+        self.assertIsNone(self.table.lookup('tool', self.path_var))
+        full_path = self.make_executable(self.dir_2, 'tool')
+
+        self.assertIsNone(self.table.lookup('tool', self.path_var))
+        self.clock.now += 2
+        self.assertEqual(self.table.lookup('tool', self.path_var), full_path)
+
+    def test_shadowing_command_is_found_after_revalidation(self):
+        path_2 = self.make_executable(self.dir_2, 'tool')
+        self.assertEqual(self.table.lookup('tool', self.path_var), path_2)
+
+        path_1 = self.make_executable(self.dir_1, 'tool')
+        self.clock.now += 2
+        self.assertEqual(self.table.lookup('tool', self.path_var), path_1)
+
+    def test_clear_and_path_change(self):
+        full_path = self.make_executable(self.dir_1, 'tool')
+        self.assertEqual(self.table.lookup('tool', self.path_var), full_path)
+        self.assertIsNone(self.table.lookup('tool', self.dir_2))
+
+        self.table.clear()
+        self.assertEqual(self.table.get_entries(), [])
+
+
+class ResolveCommandTest(unittest.TestCase):
+    """Tests on running external commands found in PATH.
+    """
+
+    def test_command_from_path(self):
+        env = Environment()
+        env.set_var('PATH', os.path.dirname(sys.executable))
+        python_name = os.path.basename(sys.executable)
+        self.assertTrue(os.path.samefile(resolve_command(python_name, env)[0], sys.executable))
+
+        cmd = CommandExternal([python_name, '-c', 'print(42)'])
+        cmd_result = cmd.run(InputStream(), env)
+        self.assertEqual(cmd_result.get_output().strip(), '42')
+
+        cmd_result = CommandHash(['hash']).run(InputStream(), env)
+        self.assertIn(python_name, cmd_result.get_output())
+
+        cmd_result = CommandHash(['hash', 'no_such_command_anywhere']).run(InputStream(), env)
+        self.assertEqual(cmd_result.get_return_code(), CommandHash.NOT_FOUND)
+
+        CommandHash(['hash', '-r']).run(InputStream(), env)
+        self.assertEqual(CommandHash(['hash']).run(InputStream(), env).get_output(), '')
+
+    def test_name_with_directory(self):
+        env = Environment()
+        self.assertEqual(resolve_command(os.path.join('.', 'run'), env),
+                         (os.path.join(env.get_cwd(), '.', 'run'), False))
+
+    def test_unknown_command_is_not_spawned(self):
+        env = Environment()
+        env.set_var('PATH', os.path.dirname(sys.executable))
+        launcher_calls = []
+
+        def fake_launcher(args, stdin=None, stdout=None):
+            launcher_calls.append(args)
+            raise FileNotFoundError(args[0])
+
+        previous_launcher = launcher.set_launcher(fake_launcher)
+        self.addCleanup(launcher.set_launcher, previous_launcher)
+        get_command_hash_table().clear()
+
+        with unittest.mock.patch.object(CommandHashTable, '_search', autospec=True,
+                                        side_effect=CommandHashTable._search) as search:
+            for _ in range(5):
+                cmd_result = CommandExternal(['no_such_command_anywhere']).run(InputStream(), env)
+                self.assertEqual(cmd_result.get_return_code(), CommandExternal.COMMAND_NOT_FOUND)
+
+        self.assertEqual(launcher_calls, [])
+        self.assertEqual(search.call_count, 1)
@@ -2,10 +2,13 @@ import unittest
 import os
 import os.path
 import sys
+import tempfile
+import threading
+import zlib
 
 from cli.exceptions import ExitException
-from cli.commands import CommandChainPipe, CommandAssignment
-from cli.single_command import CommandExternal, CommandExit, CommandCd, CommandCat, CommandPwd, CommandEcho, CommandWc, SingleCommandFactory
+from cli.commands import CommandChainPipe, CommandAssignment, CommandRedirect, Redirection, RunnableCommand, RunnableCommandResult
+from cli.single_command import CommandExternal, CommandExit, CommandCd, CommandCat, CommandPwd, CommandEcho, CommandWc, CommandGrep, CommandSort, CommandHead, CommandTail, SingleCommandFactory
 from cli.lexer import Lexem, LexemType
 from cli.environment import Environment
 from cli.streams import InputStream
@@ -15,6 +18,51 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 wc_file_path = '"{}"'.format(os.path.join(BASE_DIR, 'wc_file.txt'))
 
 
+class _CommandWaitingForConsumer(RunnableCommand):
+    """Writes a chunk and waits until someone reads it, then writes another one."""
+
+    def __init__(self, consumer_started):
+        self._consumer_started = consumer_started
+
+    def run(self, input_stream, env, output_stream=None):
+        output_stream.write('first ')
+        if not self._consumer_started.wait(timeout=5):
+            raise AssertionError('Pipe commands do not run concurrently.')
+        output_stream.write('second')
+        return RunnableCommandResult(output_stream, env, 0)
+
+
+class _CommandSignallingRead(RunnableCommand):
+    """Reads the first chunk, signals that, then reads everything else."""
+
+    def __init__(self, consumer_started):
+        self._consumer_started = consumer_started
+
+    def run(self, input_stream, env, output_stream=None):
+        chunks = input_stream.read_chunks()
+        first_chunk = next(chunks)
+        self._consumer_started.set()
+
+        output_stream.write(first_chunk + ''.join(chunks))
+        return RunnableCommandResult(output_stream, env, 0)
+
+
+class _CommandCountingChunks(RunnableCommand):
+    """Writes many chunks lazily, counting how many were produced."""
+
+    def __init__(self):
+        self.num_produced = 0
+
+    def _produce(self):
+        for _ in range(10 ** 6):
+            self.num_produced += 1
+            yield 'line\n'
+
+    def run(self, input_stream, env, output_stream=None):
+        output_stream.write_chunks(self._produce())
+        return RunnableCommandResult(output_stream, env, 0)
+
+
 class CommandsTest(unittest.TestCase):
     """Functionality test for all descdendants of RunnableCommand.
     """
@@ -133,6 +181,73 @@ class CommandsTest(unittest.TestCase):
         self.assertEqual(cmd_result.get_output(), '2 6 24')
         self.assertEqual(cmd_result.get_return_code(), 0)
 
+    def test_cat_file_into_external(self):
+        cmd_1 = CommandCat(['cat', os.path.join(BASE_DIR, 'wc_file.txt')])
+        cmd_2 = CommandExternal([sys.executable, '-c', 'import sys; print(len(sys.stdin.read()))'])
+        self.assertTrue(cmd_1.accepts_os_streams())
+        self.assertFalse(CommandCat(['cat']).accepts_os_streams())
+
+        cmd_result = CommandChainPipe(cmd_1, cmd_2).run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_output().strip(), '24')
+        self.assertEqual(cmd_result.get_return_code(), 0)
+
+    def test_redirect(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.init_env.set_cwd(tmp_dir.name)
+
+        cmd = CommandRedirect(CommandEcho(['echo', 'abc']),
+                              [Redirection(CommandRedirect.OUTPUT, 'a.txt'),
+                               Redirection(CommandRedirect.OUTPUT, 'b.txt')])
+        cmd_result = cmd.run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_output(), '')
+        self.assertEqual(cmd_result.get_return_code(), 0)
+
+        cmd = CommandRedirect(CommandExternal([sys.executable, '-c', 'print(123)']),
+                              [Redirection(CommandRedirect.APPEND, 'b.txt')])
+        self.assertEqual(cmd.run(self.init_input, self.init_env).get_return_code(), 0)
+
+        with open(os.path.join(tmp_dir.name, 'a.txt')) as a_file:
+            self.assertEqual(a_file.read(), '')
+        with open(os.path.join(tmp_dir.name, 'b.txt')) as b_file:
+            self.assertEqual(b_file.read().split(), ['abc', '123'])
+
+        cmd = CommandRedirect(CommandWc(['wc']), [Redirection(CommandRedirect.INPUT, 'b.txt')])
+        self.assertEqual(cmd.run(InputStream.from_chunks(['ignored']), self.init_env).get_output(),
+                         '2 2 {}'.format(2 * (3 + len(os.linesep))))
+
+    def test_redirect_open_failed(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.init_env.set_cwd(tmp_dir.name)
+
+        for redirection in [Redirection(CommandRedirect.INPUT, 'no_such_file'),
+                            Redirection(CommandRedirect.OUTPUT, os.path.join('no_such_dir', 'a.txt'))]:
+            cmd = CommandRedirect(CommandEcho(['echo', 'abc']), [redirection])
+            cmd_result = cmd.run(self.init_input, self.init_env)
+            self.assertEqual(cmd_result.get_return_code(), CommandRedirect.OPEN_FAILED)
+            self.assertIn('no_such', cmd_result.get_output())
+
+    def test_wc_several_files(self):
+        self.init_env.set_cwd(BASE_DIR)
+        cmd_result = CommandWc(['wc', 'wc_file.txt', 'example.txt']).run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_output().split(os.linesep),
+                         ['2 6 24 wc_file.txt', '1 3 18 example.txt', '3 9 42 total'])
+        self.assertEqual(cmd_result.get_return_code(), 0)
+
+        cmd_result = CommandWc(['wc', '-l', '-c', 'wc_file.txt']).run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_output(), '2 24')
+
+        cmd_result = CommandWc(['wc', '-w']).run(InputStream.from_chunks(['a b\nc']), self.init_env)
+        self.assertEqual(cmd_result.get_output(), '3')
+
+    def test_wc_wrong_args(self):
+        cmd_result = CommandWc(['wc', '-x']).run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_return_code(), CommandWc.BAD_ARGS)
+
+        cmd_result = CommandWc(['wc', 'wc_file.txt', 'no_such_file']).run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_return_code(), CommandWc.FILE_NOT_FOUND)
+
     def test_pipe_two_cmd(self):
         cmd_1 = self.build_cmd([Lexem(LexemType.STRING, 'echo', 0, 4),
                              Lexem(LexemType.ASSIGNMENT, 'yyy=123', 5, 10)])
@@ -182,3 +297,224 @@ class CommandsTest(unittest.TestCase):
         self.assertEqual(cmd_result.get_result_environment().get_var('x'), 'a')
         self.assertEqual(cmd_result.get_output(), '')
         self.assertEqual(cmd_result.get_return_code(), 0)
+
+    def test_pipe_runs_commands_concurrently(self):
+        consumer_started = threading.Event()
+        cmd = CommandChainPipe(_CommandWaitingForConsumer(consumer_started),
+                               _CommandSignallingRead(consumer_started))
+        cmd_result = cmd.run(self.init_input, self.init_env)
+
+        self.assertEqual(cmd_result.get_output(), 'first second')
+        self.assertEqual(cmd_result.get_return_code(), 0)
+
+    def test_pipe_first_cmd_fails(self):
+        cmd_1 = self.build_cmd([Lexem(LexemType.STRING, 'cat', 0, 3),
+                                Lexem(LexemType.STRING, 'some_dummy_file_qqqq', 4, 15)])
+        cmd_2 = self.build_cmd([Lexem(LexemType.STRING, 'pwd', 17, 19)])
+        cmd_result = CommandChainPipe(cmd_1, cmd_2).run(self.init_input, self.init_env)
+
+        self.assertEqual(cmd_result.get_return_code(), CommandCat.FILE_NOT_FOUND)
+        self.assertEqual(cmd_result.get_output(), os.getcwd())
+
+    def test_pipe_exit_in_first_cmd(self):
+        cmd_1 = self.build_cmd([Lexem(LexemType.STRING, 'exit', 0, 3)])
+        cmd_2 = self.build_cmd([Lexem(LexemType.STRING, 'wc', 7, 8)])
+        cmd = CommandChainPipe(cmd_1, cmd_2)
+
+        self.assertRaises(ExitException, cmd.run, self.init_input, self.init_env)
+
+    def test_pipe_to_external_command(self):
+        cmd_1 = self.build_cmd([Lexem(LexemType.STRING, 'cat', 0, 2),
+                                Lexem(LexemType.QUOTED_STRING, wc_file_path, 4, 10)])
+        cmd_2 = self.build_cmd([Lexem(LexemType.STRING, sys.executable, 12, 19),
+                                Lexem(LexemType.STRING, '-c', 20, 22),
+                                Lexem(LexemType.QUOTED_STRING,
+                                      "'import sys; print(len(sys.stdin.read()), end=\"\")'", 23, 40)])
+        cmd_result = CommandChainPipe(cmd_1, cmd_2).run(self.init_input, self.init_env)
+
+        self.assertEqual(cmd_result.get_output(), '24')
+        self.assertEqual(cmd_result.get_return_code(), 0)
+
+    def test_pipe_two_external_commands(self):
+        cmd_1 = self.build_cmd([Lexem(LexemType.STRING, sys.executable, 0, 7),
+                                Lexem(LexemType.STRING, '-c', 8, 10),
+                                Lexem(LexemType.QUOTED_STRING,
+                                      "'print(\"x\" * 1000000)'", 11, 20)])
+        cmd_2 = self.build_cmd([Lexem(LexemType.STRING, sys.executable, 22, 29),
+                                Lexem(LexemType.STRING, '-c', 30, 32),
+                                Lexem(LexemType.QUOTED_STRING,
+                                      "'import sys; print(len(sys.stdin.read()), end=\"\")'", 33, 40)])
+        cmd_result = CommandChainPipe(cmd_1, cmd_2).run(self.init_input, self.init_env)
+
+        self.assertEqual(cmd_result.get_output(), '1000001')
+        self.assertEqual(cmd_result.get_return_code(), 0)
+
+    def test_binary_data_through_pipe(self):
+        binary_data = bytes(range(256)) * 10
+        with tempfile.NamedTemporaryFile(delete=False) as binary_file:
+            binary_file.write(binary_data)
+        self.addCleanup(os.remove, binary_file.name)
+
+        cmd_1 = self.build_cmd([Lexem(LexemType.STRING, 'cat', 0, 2),
+                                Lexem(LexemType.STRING, binary_file.name, 4, 10)])
+        cmd_2 = self.build_cmd([Lexem(LexemType.STRING, sys.executable, 12, 19),
+                                Lexem(LexemType.STRING, '-c', 20, 22),
+                                Lexem(LexemType.QUOTED_STRING,
+                                      "'import sys, zlib; print(zlib.crc32(sys.stdin.buffer.read()), end=\"\")'",
+                                      23, 40)])
+        cmd_result = CommandChainPipe(cmd_1, cmd_2).run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_output(), str(zlib.crc32(binary_data)))
+
+        cmd_2 = self.build_cmd([Lexem(LexemType.STRING, 'wc', 12, 13)])
+        cmd_result = CommandChainPipe(cmd_1, cmd_2).run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_output().split()[-1], str(len(binary_data)))
+
+    def test_nested_pipes_are_flattened(self):
+        cmd_1 = self.build_cmd([Lexem(LexemType.STRING, 'pwd', 0, 4)])
+        cmd_2 = self.build_cmd([Lexem(LexemType.STRING, 'wc', 5, 7)])
+        cmd_3 = self.build_cmd([Lexem(LexemType.STRING, 'cat', 8, 11)])
+        cmd = CommandChainPipe(CommandChainPipe(cmd_1, cmd_2), cmd_3)
+
+        self.assertEqual(cmd.get_commands(), [cmd_1, cmd_2, cmd_3])
+
+    def test_pipe_stops_after_failed_assignment(self):
+        cmd_1 = self.build_cmd([Lexem(LexemType.STRING, 'echo', 0, 4),
+                                Lexem(LexemType.STRING, 'abc', 5, 7)])
+        cmd_2 = self.build_cmd([Lexem(LexemType.STRING, 'cd', 9, 10),
+                                Lexem(LexemType.STRING, 'some_dummy_dir_qqqq', 12, 20)])
+        cmd_3 = CommandAssignment(['x=1'])
+        cmd_result = CommandChainPipe(cmd_1, cmd_2, cmd_3).run(self.init_input, self.init_env)
+
+        self.assertEqual(cmd_result.get_return_code(), CommandCd.NEW_DIR_INVALID)
+        self.assertIn('is not a directory', cmd_result.get_output())
+        self.assertEqual(cmd_result.get_result_environment().get_var('x'), '')
+
+    def test_grep_input(self):
+        grep_input = lambda: InputStream.from_chunks(['first line\nSecond li', 'ne\nthird'])
+
+        cmd_result = CommandGrep(['grep', 'i.e']).run(grep_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), 'first line\nSecond line\n')
+        self.assertEqual(cmd_result.get_return_code(), CommandGrep.FOUND)
+
+        cmd_result = CommandGrep(['grep', '-v', '-i', 'second']).run(grep_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), 'first line\nthird\n')
+
+        cmd_result = CommandGrep(['grep', '-c', '-F', 'i.e']).run(grep_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), '0{}'.format(os.linesep))
+        self.assertEqual(cmd_result.get_return_code(), CommandGrep.NOT_FOUND)
+
+        cmd_result = CommandGrep(['grep', '-iF', 'THIRD']).run(grep_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), 'third\n')
+
+    def test_grep_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for fl_name, content in [('a.txt', 'x1\ny1\nx2\n'), ('b.txt', 'y2\nx3')]:
+                with open(os.path.join(tmp_dir, fl_name), 'w') as f:
+                    f.write(content)
+            self.init_env.set_cwd(tmp_dir)
+
+            cmd_result = CommandGrep(['grep', 'x', 'a.txt', 'b.txt']).run(self.init_input, self.init_env)
+            self.assertEqual(cmd_result.get_output(), 'a.txt:x1\na.txt:x2\nb.txt:x3\n')
+
+            cmd_result = CommandGrep(['grep', '-c', 'x', 'a.txt']).run(self.init_input, self.init_env)
+            self.assertEqual(cmd_result.get_output(), '2{}'.format(os.linesep))
+
+            cmd_result = CommandGrep(['grep', 'x', 'a.txt', 'no.txt']).run(self.init_input, self.init_env)
+            self.assertIn('not found', cmd_result.get_output())
+            self.assertEqual(cmd_result.get_return_code(), CommandGrep.ERROR)
+
+    def test_grep_bad_arguments(self):
+        for args in [['grep'], ['grep', '-z', 'x'], ['grep', '(']]:
+            cmd_result = CommandGrep(args).run(self.init_input, self.init_env)
+            self.assertEqual(cmd_result.get_return_code(), CommandGrep.ERROR)
+
+    def test_sort(self):
+        sort_input = lambda: InputStream.from_chunks(['10 b\n9 a\n', '10 b\n-1 c'])
+
+        cmd_result = CommandSort(['sort']).run(sort_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), '-1 c\n10 b\n10 b\n9 a\n')
+
+        cmd_result = CommandSort(['sort', '-n', '-r', '-u']).run(sort_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), '10 b\n9 a\n-1 c\n')
+
+        cmd_result = CommandSort(['sort', '-k', '2', '-S', '4']).run(sort_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), '9 a\n10 b\n10 b\n-1 c\n')
+
+        cmd_result = CommandSort(['sort', 'wc_file.txt', 'no_such_file']).run(self.init_input, self.init_env)
+        self.assertEqual(cmd_result.get_return_code(), CommandSort.FILE_NOT_FOUND)
+
+        cmd_result = CommandSort(['sort', '-k', '2,3', '-S', '64M', '--parallel=2']).run(sort_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), '9 a\n10 b\n10 b\n-1 c\n')
+
+        for args in [['-k', 'x'], ['-S', '64X'], ['-S', '64MB'], ['-S', '0'], ['-S', 'M'],
+                     ['--parallel=2x'], ['--parallel=0']]:
+            cmd_result = CommandSort(['sort'] + args).run(self.init_input, self.init_env)
+            self.assertEqual(cmd_result.get_return_code(), CommandSort.BAD_ARGS, args)
+
+    def test_head(self):
+        head_input = lambda: InputStream.from_chunks(['1\n2\n3', '\n4\n5'])
+
+        cmd_result = CommandHead(['head', '-n', '2']).run(head_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), '1\n2\n')
+
+        cmd_result = CommandHead(['head']).run(head_input(), self.init_env)
+        self.assertEqual(cmd_result.get_output(), '1\n2\n3\n4\n5')
+
+        cmd_result = CommandHead(['head', '-n', 'x']).run(head_input(), self.init_env)
+        self.assertEqual(cmd_result.get_return_code(), CommandHead.BAD_ARGS)
+
+    def test_head_stops_producer(self):
+        producer = _CommandCountingChunks()
+        cmd_result = CommandChainPipe(producer, CommandHead(['head', '-n', '3'])).run(self.init_input,
+                                                                                       self.init_env)
+        self.assertEqual(cmd_result.get_output(), 'line\nline\nline\n')
+        self.assertLess(producer.num_produced, 1000)
+
+    def test_tail(self):
+        tail_input = InputStream.from_chunks(['1\n2\n3', '\n4\n5'])
+        cmd_result = CommandTail(['tail', '-n', '2']).run(tail_input, self.init_env)
+        self.assertEqual(cmd_result.get_output(), '4\n5')
+
+    def test_head_tail_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.init_env.set_cwd(tmp_dir)
+            lines = ['line {}\n'.format(idx) for idx in range(100000)]
+            with open(os.path.join(tmp_dir, 'big.txt'), 'w') as f:
+                f.write(''.join(lines))
+            with open(os.path.join(tmp_dir, 'short.txt'), 'w') as f:
+                f.write('a\nb')
+
+            cmd_result = CommandHead(['head', '-n', '3', 'big.txt']).run(self.init_input, self.init_env)
+            self.assertEqual(cmd_result.get_output(), ''.join(lines[:3]))
+
+            for num_lines in [0, 1, 2, 5000]:
+                cmd_result = CommandTail(['tail', '-n', str(num_lines), 'big.txt']).run(self.init_input,
+                                                                                         self.init_env)
+                self.assertEqual(cmd_result.get_output(), ''.join(lines[len(lines) - num_lines:]))
+
+            for num_lines, expected in [(1, 'b'), (2, 'a\nb'), (3, 'a\nb')]:
+                cmd_result = CommandTail(['tail', '-n', str(num_lines), 'short.txt']).run(self.init_input,
+                                                                                          self.init_env)
+                self.assertEqual(cmd_result.get_output(), expected)
+
+            cmd_result = CommandTail(['tail', 'no_such_file']).run(self.init_input, self.init_env)
+            self.assertEqual(cmd_result.get_return_code(), CommandTail.FILE_NOT_FOUND)
+
+    def test_head_stops_builtins_up_the_pipe(self):
+        producer = _CommandCountingChunks()
+        cmd = CommandChainPipe(producer, CommandCat(['cat']), CommandCat(['cat']), CommandHead(['head', '-n', '1']))
+        cmd_result = cmd.run(self.init_input, self.init_env)
+
+        self.assertEqual(cmd_result.get_output(), 'line\n')
+        self.assertEqual(cmd_result.get_return_code(), 0)
+        self.assertLess(producer.num_produced, 10000)
+
+    def test_head_stops_external_producer(self):
+        endless_producer = CommandExternal([
+            sys.executable, '-c',
+            'import os\ntry:\n    while True: os.write(1, b"y\\n" * 1000)\nexcept OSError:\n    os._exit(0)'])
+        cmd = CommandChainPipe(endless_producer, CommandHead(['head', '-n', '2']))
+        cmd_result = cmd.run(self.init_input, self.init_env)
+
+        self.assertEqual(cmd_result.get_output(), 'y\ny\n')
+        self.assertEqual(cmd_result.get_return_code(), 0)
@@ -0,0 +1,103 @@
+import unittest
+import os
+import random
+import tempfile
+import unittest.mock
+import codecs
+
+from cli import counting
+from cli.counting import Counts, count_chunks, count_files, count_words
+from cli.streams import ENCODING
+
+
+class CountingTest(unittest.TestCase):
+    """Tests on counting lines, words and bytes in chunks and in segments of files.
+    """
+
+    def setUp(self):
+        rnd = random.Random(5)
+        self.data = bytes(rnd.choice(b'ab \n\t') for _ in range(5000))
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.file_names = []
+        for file_idx, data in enumerate([self.data, b'', b'one word', b'  x\n']):
+            file_name = os.path.join(tmp_dir.name, 'file_{}.txt'.format(file_idx))
+            with open(file_name, 'wb') as f:
+                f.write(data)
+            self.file_names.append(file_name)
+
+    def test_word_split_between_chunks(self):
+        self.assertEqual(count_chunks([b'hel', b'lo wor', b'ld\n', b' x']), (2, 3, 14))
+        self.assertEqual(count_chunks([]), (0, 0, 0))
+
+    def test_chunks_are_same_as_str_methods(self):
+        text = self.data.decode('ascii')
+        expected = Counts(len(text.splitlines()), len(text.split()), len(self.data))
+        self.assertEqual(count_chunks([self.data]), expected)
+        self.assertEqual(count_chunks([self.data[i:i + 7] for i in range(0, len(self.data), 7)]), expected)
+
+    def test_words_are_same_as_str_split(self):
+        """Any ASCII byte: words are split exactly by what :meth:`str.isspace` considers space."""
+        rnd = random.Random(7)
+        for _ in range(100):
+            data = bytes(rnd.choice([rnd.randrange(128), 32, 10]) for _ in range(rnd.randrange(50)))
+            for last_was_char in [False, True]:
+                text = data.decode('ascii')
+                num_words = len(text.split())
+                if last_was_char and text[:1] and not text[0].isspace():
+                    num_words -= 1
+                ends_with_char = not text[-1:].isspace() if text else last_was_char
+                self.assertEqual(count_words(data, last_was_char), (num_words, ends_with_char), data)
+
+    def test_segments_are_same_as_whole_files(self):
+        expected = [count_chunks([data]) for data in [self.data, b'', b'one word', b'  x\n']]
+        self.assertEqual(count_files(self.file_names), expected)
+        for segment_size in [1, 2, 3, 100, 4999]:
+            self.assertEqual(count_files(self.file_names, segment_size=segment_size), expected)
+
+    def test_parallel(self):
+        expected = count_files(self.file_names)
+        self.assertEqual(count_files(self.file_names, num_workers=2, segment_size=1000), expected)
+
+    def test_no_pool_for_small_files(self):
+        expected = count_files(self.file_names)
+        with unittest.mock.patch.object(counting, 'make_process_pool') as make_process_pool:
+            # Two segments, but less than two segments of data.
+            self.assertEqual(count_files(self.file_names, num_workers=2, segment_size=4999), expected)
+        make_process_pool.assert_not_called()
+
+
+@unittest.skipUnless(codecs.lookup(ENCODING).name == 'utf-8', 'Unicode whitespace is only recognized in UTF-8')
+class UnicodeWhitespaceTest(unittest.TestCase):
+    """Tests on words separated by whitespace beyond ASCII, like in :meth:`str.split`.
+    """
+
+    def setUp(self):
+        rnd = random.Random(22)
+        self.spaces = [chr(code) for code in range(0x80, 0x10000) if chr(code).isspace()]
+        alphabet = ['a', 'é', 'ж', '\u201c', '\u3001', ' ', '\n'] + self.spaces
+        self.text = ''.join(rnd.choice(alphabet) for _ in range(3000))
+        self.data = self.text.encode('utf-8')
+
+    def test_every_space(self):
+        for space in self.spaces:
+            self.assertEqual(count_words('a{}b'.format(space).encode('utf-8')), (2, True), hex(ord(space)))
+        self.assertEqual(count_chunks([b'a\xc2\xa0b\n']), (1, 2, 5))
+        self.assertEqual(count_chunks(['a\u2003b\u3001c'.encode('utf-8')]), (1, 2, 9))
+
+    def test_same_as_str_split(self):
+        # Lines end with newlines only, while str.splitlines() splits at some spaces, too.
+        num_lines = self.text.count('\n') + (not self.text.endswith('\n'))
+        expected = Counts(num_lines, len(self.text.split()), len(self.data))
+        self.assertEqual(count_chunks([self.data]), expected)
+        for chunk_size in [1, 2, 3, 5]:
+            chunks = [self.data[i:i + chunk_size] for i in range(0, len(self.data), chunk_size)]
+            self.assertEqual(count_chunks(chunks), expected, chunk_size)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'file.txt')
+            with open(file_name, 'wb') as f:
+                f.write(self.data)
+            for segment_size in [1, 2, 3, 100]:
+                self.assertEqual(count_files([file_name], segment_size=segment_size), [expected], segment_size)
@@ -34,3 +34,22 @@ class EnvironmentTest(unittest.TestCase):
         new_path = os.path.join(cur_path, os.pardir)
         self.env.set_cwd(os.pardir)
         self.assertEqual(self.env.get_cwd(), new_path)
+
+    def test_snapshot_is_independent(self):
+        self.env.set_var('x', '1')
+        snapshot = self.env.snapshot()
+        self.env.set_var('x', '2')
+        snapshot.set_var('y', '3')
+
+        self.assertEqual(snapshot.get_var('x'), '1')
+        self.assertEqual(self.env.get_var('x'), '2')
+        self.assertEqual(self.env.get_var('y'), '')
+
+    def test_many_vars(self):
+        for idx in range(10000):
+            self.env.set_var('x{}'.format(idx), str(idx))
+        snapshot = self.env.snapshot()
+        self.env.set_var('x0', 'changed')
+
+        self.assertEqual(snapshot.get_var('x0'), '0')
+        self.assertEqual(snapshot.get_var('x9999'), '9999')
@@ -0,0 +1,61 @@
+import unittest
+import os
+import signal
+import subprocess
+import sys
+
+from cli import launcher
+from cli.environment import Environment
+from cli.lexer import Lexer
+from cli.parser import Parser
+from cli.streams import InputStream
+
+
+@unittest.skipUnless(os.name == 'posix', 'The fork server is POSIX only')
+class ForkServerLauncherTest(unittest.TestCase):
+    """Tests on starting processes through the fork server.
+    """
+
+    def setUp(self):
+        self.launcher = launcher.ForkServerLauncher()
+
+    def tearDown(self):
+        self.launcher.close()
+
+    def test_pipes_and_return_code(self):
+        process = self.launcher([sys.executable, '-c',
+                                 'import sys; sys.stdout.write(sys.stdin.read().upper()); sys.exit(3)'],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        process.stdin.write(b'hello')
+        process.stdin.close()
+
+        self.assertEqual(process.stdout.read(), b'HELLO')
+        process.stdout.close()
+        self.assertEqual(process.wait(), 3)
+
+    def test_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            self.launcher([os.path.join(os.getcwd(), 'no_such_command')],
+                          stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def test_closed_pipe_kills_by_signal(self):
+        # An endless producer, which stops on a write error if SIGPIPE is ignored.
+        process = self.launcher(['/bin/sh', '-c', 'while echo y; do :; done'],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        process.stdin.close()
+        self.assertEqual(process.stdout.read1(1), b'y')
+        process.stdout.close()
+        self.assertEqual(process.wait(), -signal.SIGPIPE)
+
+    def test_external_commands_in_pipe(self):
+        previous_launcher = launcher.set_launcher(self.launcher)
+        try:
+            python = sys.executable
+            line = '{0} -c "print(1234)" | {0} -c "import sys; print(len(sys.stdin.read()))" | wc'.format(python)
+            for _ in range(20):
+                runnable = Parser.build_command(Lexer.get_lexemes(line))
+                cmd_result = runnable.run(InputStream(), Environment())
+                self.assertEqual(cmd_result.get_output(), '1 1 {}'.format(1 + len(os.linesep)))
+                self.assertEqual(cmd_result.get_return_code(), 0)
+        finally:
+            launcher.set_launcher(previous_launcher)
@@ -48,3 +48,46 @@ class LexerTest(unittest.TestCase):
         self.assertEqual(lex_result[0].get_type(), LexemType.STRING)
         self.assertEqual(lex_result[1].get_type(), LexemType.PIPE)
         self.assertEqual(lex_result[2].get_type(), LexemType.STRING)
+
+    def test_pipe_inside_string(self):
+        lex_result = Lexer.get_lexemes('echo a|b |c')
+        self.assertEqual([lex.get_type() for lex in lex_result],
+                         [LexemType.STRING, LexemType.STRING, LexemType.PIPE, LexemType.STRING])
+        self.assertEqual(lex_result[1].get_value(), 'a|b')
+
+    def test_redirections(self):
+        lex_result = Lexer.get_lexemes('wc <a.txt >> "b c" > d a>b')
+        self.assertEqual([lex.get_type() for lex in lex_result],
+                         [LexemType.STRING, LexemType.REDIRECT_INPUT, LexemType.STRING,
+                          LexemType.REDIRECT_APPEND, LexemType.QUOTED_STRING,
+                          LexemType.REDIRECT_OUTPUT, LexemType.STRING, LexemType.STRING])
+        self.assertEqual(lex_result[2].get_value(), 'a.txt')
+        self.assertEqual(lex_result[3].get_position(), '(10:11)')
+        # Like with pipes, a string may contain redirection symbols.
+        self.assertEqual(lex_result[7].get_value(), 'a>b')
+
+    def test_lexem_from_source(self):
+        source = 'echo "a b" x=1'
+        lexem = Lexem.from_source(LexemType.QUOTED_STRING, source, 5, 9)
+        self.assertFalse(hasattr(lexem, '__dict__'))
+        self.assertEqual(lexem.get_value(), 'a b')
+        self.assertEqual(lexem.get_position(), '(5:9)')
+
+        built_lexem = Lexem(LexemType.QUOTED_STRING, '"a b"', 5, 9)
+        self.assertEqual(built_lexem.get_value(), lexem.get_value())
+        self.assertEqual(built_lexem.get_position(), lexem.get_position())
+
+        lexem = Lexem.from_source(LexemType.ASSIGNMENT, source, 11, 13)
+        self.assertEqual(lexem.get_value(), 'x=1')
+
+    def test_long_line(self):
+        num_args = 100000
+        long_quoted = 'q' * 1000000
+        raw_str = 'echo ' + ' '.join(['x=1'] * num_args) + ' "{}"'.format(long_quoted)
+
+        lex_result = Lexer.get_lexemes(raw_str)
+        self.assertEqual(len(lex_result), num_args + 2)
+        self.assertEqual(lex_result[-2].get_type(), LexemType.ASSIGNMENT)
+        self.assertEqual(lex_result[-1].get_value(), long_quoted)
+        self.assertEqual(lex_result[-1].get_position(),
+                         '({}:{})'.format(len(raw_str) - len(long_quoted) - 2, len(raw_str) - 1))
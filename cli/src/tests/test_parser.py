@@ -3,7 +3,7 @@ import unittest
 from cli.exceptions import ParseException
 from cli.parser import Parser
 from cli.lexer import Lexem, LexemType
-from cli.commands import SingleCommand, CommandChainPipe, CommandAssignment
+from cli.commands import SingleCommand, CommandChainPipe, CommandAssignment, CommandRedirect, Redirection
 from cli.single_command import CommandExternal, CommandExit, CommandCd, CommandCat, CommandPwd, CommandEcho, CommandWc
 
 
@@ -120,3 +120,48 @@ class ParserTest(unittest.TestCase):
                   Lexem(LexemType.PIPE, '|', 5, 5),
                   Lexem(LexemType.STRING, 'wc', 6, 7)]
         self.assertRaises(ParseException, Parser.build_command, lexems)
+
+    def test_redirections(self):
+        lexems = [Lexem(LexemType.STRING, 'wc', 0, 1),
+                  Lexem(LexemType.REDIRECT_INPUT, '<', 3, 3),
+                  Lexem(LexemType.STRING, 'a.txt', 5, 9),
+                  Lexem(LexemType.STRING, '-l', 11, 12),
+                  Lexem(LexemType.REDIRECT_APPEND, '>>', 14, 15),
+                  Lexem(LexemType.QUOTED_STRING, '"b c"', 17, 21),
+                  Lexem(LexemType.PIPE, '|', 23, 23),
+                  Lexem(LexemType.STRING, 'pwd', 25, 27),
+                  Lexem(LexemType.REDIRECT_OUTPUT, '>', 29, 29),
+                  Lexem(LexemType.STRING, 'd', 31, 31)]
+        runnable = Parser.build_command(lexems)
+
+        self.assertEqual(type(runnable), CommandChainPipe)
+        first_cmd, second_cmd = runnable.get_commands()
+        self.assertEqual(type(first_cmd), CommandRedirect)
+        self.assertEqual(type(first_cmd.get_command()), CommandWc)
+        self.assertEqual(first_cmd.get_redirections(),
+                         [Redirection(CommandRedirect.INPUT, 'a.txt'),
+                          Redirection(CommandRedirect.APPEND, 'b c')])
+        self.assertEqual(second_cmd.get_redirections(), [Redirection(CommandRedirect.OUTPUT, 'd')])
+
+    def test_redirection_without_file(self):
+        for lexems in [[Lexem(LexemType.STRING, 'pwd', 0, 2),
+                        Lexem(LexemType.REDIRECT_OUTPUT, '>', 4, 4)],
+                       [Lexem(LexemType.STRING, 'pwd', 0, 2),
+                        Lexem(LexemType.REDIRECT_OUTPUT, '>', 4, 4),
+                        Lexem(LexemType.PIPE, '|', 6, 6),
+                        Lexem(LexemType.STRING, 'wc', 8, 9)],
+                       [Lexem(LexemType.REDIRECT_INPUT, '<', 0, 0),
+                        Lexem(LexemType.STRING, 'a', 2, 2)]]:
+            self.assertRaises(ParseException, Parser.build_command, lexems)
+
+    def test_long_pipe_is_flat(self):
+        num_commands = 10000
+        lexems = [Lexem(LexemType.STRING, 'pwd', 0, 2)]
+        for i in range(1, num_commands):
+            lexems.append(Lexem(LexemType.PIPE, '|', 4 * i - 1, 4 * i - 1))
+            lexems.append(Lexem(LexemType.STRING, 'wc', 4 * i, 4 * i + 1))
+
+        runnable = Parser.build_command(lexems)
+        self.assertEqual(type(runnable), CommandChainPipe)
+        self.assertEqual(len(runnable.get_commands()), num_commands)
+        self.assertEqual(type(runnable.get_commands()[-1]), CommandWc)
@@ -0,0 +1,69 @@
+import unittest
+import random
+
+from cli.persistent_map import PersistentMap
+
+
+class _CollidingKey:
+    """A key with a chosen hash, to test hash collisions."""
+
+    def __init__(self, name, key_hash):
+        self.name = name
+        self.key_hash = key_hash
+
+    def __hash__(self):
+        return self.key_hash
+
+    def __eq__(self, other):
+        return isinstance(other, _CollidingKey) and self.name == other.name
+
+
+class PersistentMapTest(unittest.TestCase):
+    """Tests on the persistent map: updates must not change old versions.
+    """
+
+    def test_set_get(self):
+        map_1 = PersistentMap()
+        map_2 = map_1.set('x', '1')
+        map_3 = map_2.set('x', '2').set('y', '3')
+
+        self.assertEqual(map_1.get('x'), None)
+        self.assertEqual(map_2.get('x'), '1')
+        self.assertEqual(map_3.get('x'), '2')
+        self.assertEqual(map_3.get('y'), '3')
+        self.assertEqual((len(map_1), len(map_2), len(map_3)), (0, 1, 2))
+        self.assertIn('y', map_3)
+        self.assertNotIn('y', map_2)
+
+    def test_against_dict(self):
+        rnd = random.Random(42)
+        versions = []
+        current_map = PersistentMap()
+        current_dict = dict()
+        for _ in range(5000):
+            key = 'var{}'.format(rnd.randrange(2000))
+            value = str(rnd.random())
+            current_map = current_map.set(key, value)
+            current_dict[key] = value
+            versions.append((current_map, dict(current_dict)))
+
+        for old_map, old_dict in versions[::500]:
+            self.assertEqual(len(old_map), len(old_dict))
+            self.assertEqual(dict(old_map.items()), old_dict)
+            for key, value in old_dict.items():
+                self.assertEqual(old_map.get(key), value)
+
+    def test_hash_collisions(self):
+        keys = [_CollidingKey('k{}'.format(idx), 12345) for idx in range(5)]
+        other_key = _CollidingKey('other', 12345 + (1 << 40))
+
+        current_map = PersistentMap()
+        for idx, key in enumerate(keys):
+            current_map = current_map.set(key, idx)
+        current_map = current_map.set(other_key, 'other').set(keys[0], 'new')
+
+        self.assertEqual(len(current_map), 6)
+        self.assertEqual(current_map.get(keys[0]), 'new')
+        self.assertEqual([current_map.get(key) for key in keys[1:]], [1, 2, 3, 4])
+        self.assertEqual(current_map.get(other_key), 'other')
+        self.assertEqual(current_map.get(_CollidingKey('absent', 12345)), None)
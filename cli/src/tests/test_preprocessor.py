@@ -77,3 +77,18 @@ class PreprocessortTest(unittest.TestCase):
     def test_quote_after_dollar(self):
         processed_string = self.preproc("echo $'' $\"\"")
         self.assertEqual(processed_string, "echo $'' $\"\"")
+
+    def test_plan(self):
+        plan = Preprocessor.compile_plan('echo "$x"1 $long_name')
+        self.assertEqual(plan.get_var_names(), ['x', 'long_name'])
+        self.assertEqual(plan.fill(['a', 'b']), 'echo "a"1 b')
+        self.assertEqual(plan.substitute(self.env), 'echo "1"1 qwe')
+
+    def test_plan_is_cached(self):
+        self.assertIs(Preprocessor.compile_plan('echo $x $y'),
+                      Preprocessor.compile_plan('echo $x $y'))
+
+    def test_many_vars(self):
+        num_vars = 100000
+        processed_string = self.preproc(' '.join(['$x'] * num_vars))
+        self.assertEqual(processed_string, ' '.join(['1'] * num_vars))
@@ -0,0 +1,77 @@
+import unittest
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+
+from cli.server import ShellServer
+from cli.shell import Shell
+from cli import launcher
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets are not supported')
+class ShellServerTest(unittest.TestCase):
+    """Tests on serving several shell sessions over a Unix socket.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp_dir.name, 'shell.sock')
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.tmp_dir.cleanup()
+
+    def run_with_server(self, client_coro_fn, max_running_commands=4):
+        server = ShellServer(self.socket_path, max_running_commands)
+
+        async def scenario():
+            await server.start()
+            try:
+                return await client_coro_fn()
+            finally:
+                await server.stop()
+
+        return self.loop.run_until_complete(scenario())
+
+    async def send_commands(self, commands):
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        replies = []
+        for command in commands:
+            writer.write(command.encode('utf-8') + b'\n')
+            header = await reader.readline()
+            if not header:
+                break
+            ret_code, length = map(int, header.split())
+            output = await reader.readexactly(length)
+            replies.append((ret_code, output.decode('utf-8')))
+        writer.close()
+        return replies
+
+    def test_sessions_have_own_environments(self):
+        async def clients():
+            return await asyncio.gather(
+                *[self.send_commands(['x={}'.format(idx), 'echo $x']) for idx in range(10)])
+
+        all_replies = self.run_with_server(clients)
+        for idx, replies in enumerate(all_replies):
+            self.assertEqual(replies, [(0, ''), (0, '{}{}'.format(idx, os.linesep))])
+
+    def test_external_command_and_errors(self):
+        async def client():
+            return await self.send_commands([
+                'echo 123 | {} -c "import sys; sys.stdout.write(sys.stdin.read()[::-1])"'.format(sys.executable),
+                'echo "abc',
+                'exit',
+                'echo 1',
+            ])
+
+        previous_launcher = launcher.get_launcher()
+        replies = self.run_with_server(client, max_running_commands=1)
+        self.assertIs(launcher.get_launcher(), previous_launcher)
+
+        self.assertEqual(replies[0], (0, '{}321'.format(os.linesep[::-1])))
+        self.assertEqual(replies[1][0], Shell.SYNTAX_ERROR_CODE)
+        self.assertEqual(len(replies), 2)
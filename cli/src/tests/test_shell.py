@@ -1,5 +1,8 @@
 import unittest
+import io
 import os.path
+import sys
+import tempfile
 
 from cli import shell
 from cli import exceptions
@@ -86,3 +89,75 @@ class ShellTest(unittest.TestCase):
         for i in range(1000):
             command_result = self.shell.process_input('echo 1=1')
             self.assertEqual(command_result.get_output(), '1=1{}'.format(os.linesep))
+
+    def test_long_pipe(self):
+        """A pipe longer than the recursion limit.
+        """
+        num_commands = 2000
+        command_result = self.shell.process_input('echo 123' + ' | cat' * (num_commands - 1))
+        self.assertEqual(command_result.get_output(), '123{}'.format(os.linesep))
+        self.assertEqual(command_result.get_return_code(), 0)
+
+    def test_run_script(self):
+        """Commands of a script share the environment; the last return code is returned.
+        """
+        script = [
+            '# a comment\n',
+            'cd {}\n'.format(BASE_DIR),
+            '\n',
+            'FILE=example.txt\n',
+            'cat $FILE | wc\n',
+            'pwd\n',
+            'cat no_such_file.txt\n',
+        ]
+        output = io.StringIO()
+        ret_code = self.shell.run_script(script, output)
+
+        lines = output.getvalue().split('\n')
+        self.assertEqual(lines[:2], ['1 3 18', BASE_DIR])
+        self.assertNotEqual(ret_code, 0)
+
+    def test_run_script_errors_and_exit(self):
+        output = io.StringIO()
+        errors = io.StringIO()
+        ret_code = self.shell.run_script(['echo 1 | | 2', 'echo "abc'], output, errors)
+        self.assertEqual(ret_code, shell.Shell.SYNTAX_ERROR_CODE)
+        self.assertEqual(output.getvalue(), '')
+        self.assertIn('Parsing exception', errors.getvalue())
+        self.assertIn('Lexing exception', errors.getvalue())
+
+        output = io.StringIO()
+        ret_code = self.shell.run_script(['echo 1', 'exit', 'echo 2'], output)
+        self.assertEqual(ret_code, 0)
+        self.assertEqual(output.getvalue(), '1{}'.format(os.linesep))
+
+    def test_run_script_streams_into_file(self):
+        """The output goes to the file descriptor, external and builtin ones in order.
+        """
+        script = [
+            'echo 1',
+            '{} -c "print(2)"'.format(sys.executable),
+            'pwd',
+            'echo 3',
+        ]
+        with tempfile.TemporaryFile('w+') as output:
+            output.write('0\n')
+            ret_code = self.shell.run_script(script, output)
+            output.seek(0)
+            lines = output.read().split('\n')
+
+        self.assertEqual(ret_code, 0)
+        self.assertEqual(lines, ['0', '1', '2', os.getcwd(), '3', ''])
+
+    def test_run_script_closed_output(self):
+        read_fd, write_fd = os.pipe()
+        os.close(read_fd)
+        with open(write_fd, 'w') as output:
+            ret_code = self.shell.run_script(['echo 1', 'echo 2'], output)
+            self.assertEqual(ret_code, shell.Shell.BROKEN_PIPE_CODE)
+
+            # A process that writes into the closed pipe directly is stopped as well
+            # (by SIGPIPE, so that it does not print a traceback of BrokenPipeError).
+            script = '{} -c "import signal; signal.signal(signal.SIGPIPE, signal.SIG_DFL); print(1)"'
+            ret_code = self.shell.run_script([script.format(sys.executable)], output)
+            self.assertNotEqual(ret_code, 0)
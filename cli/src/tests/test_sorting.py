@@ -0,0 +1,69 @@
+import unittest
+import heapq
+import random
+import tracemalloc
+import unittest.mock
+
+from cli import sorting
+from cli.sorting import SortKey, sort_lines
+
+
+class SortingTest(unittest.TestCase):
+    """Tests on sorting lines in memory and with temporary files.
+    """
+
+    def setUp(self):
+        rnd = random.Random(17)
+        self.lines = ['{} {}\n'.format(rnd.randint(-1000, 1000), rnd.choice('abcdef'))
+                      for _ in range(3000)]
+
+    def test_in_memory(self):
+        self.assertEqual(list(sort_lines(['b\n', 'a', 'c\n'])), ['a\n', 'b\n', 'c\n'])
+        self.assertEqual(list(sort_lines([])), [])
+
+    def test_external_is_same_as_in_memory(self):
+        for key, reverse, unique in [(SortKey(), False, False),
+                                     (SortKey(numeric=True), True, False),
+                                     (SortKey(field_idx=2), False, True),
+                                     (SortKey(numeric=True), False, True)]:
+            expected = list(sort_lines(self.lines, key, reverse, unique))
+            actual = list(sort_lines(self.lines, key, reverse, unique, memory_budget=1000))
+            self.assertEqual(actual, expected)
+
+        self.assertEqual(list(sort_lines(self.lines, SortKey(numeric=True))),
+                         sorted(self.lines, key=lambda line: int(line.split()[0])))
+
+    def test_many_runs_are_merged_in_passes(self):
+        lines = self.lines * 3
+        with unittest.mock.patch.object(sorting.heapq, 'merge', side_effect=heapq.merge) as merge:
+            # Hundreds of runs of a few lines.
+            actual = list(sort_lines(lines, memory_budget=1000))
+        self.assertEqual(actual, sorted(lines))
+        self.assertGreater(merge.call_count, 1)
+        self.assertLessEqual(max(len(call[0]) for call in merge.call_args_list), sorting.MERGE_WIDTH)
+
+    def test_memory_budget(self):
+        memory_budget = 1024 * 1024
+        # Short lines: objects take several times more memory than their characters.
+        lines = ('{}\n'.format(i * 7919 % 100003) for i in range(100000))
+        tracemalloc.start()
+        try:
+            num_lines = sum(1 for _ in sort_lines(lines, memory_budget=memory_budget))
+            _, peak_size = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(num_lines, 100000)
+        # The rest is buffers of the merged files.
+        self.assertLess(peak_size, 1.25 * memory_budget)
+
+    def test_parallel(self):
+        key = SortKey(numeric=True)
+        expected = list(sort_lines(self.lines, key))
+        actual = list(sort_lines(self.lines, key, memory_budget=5000, num_workers=2))
+        self.assertEqual(actual, expected)
+
+    def test_keys(self):
+        self.assertEqual(SortKey(numeric=True)('  -1.5e3 x\n'), -1.5)
+        self.assertEqual(SortKey(numeric=True)('abc\n'), 0.0)
+        self.assertEqual(SortKey(field_idx=2)('a  b c\n'), 'b c')
+        self.assertEqual(SortKey(field_idx=3)('a b\n'), '')
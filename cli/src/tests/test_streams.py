@@ -1,7 +1,12 @@
 import unittest
+import errno
 import os
+import tempfile
+import threading
+import unittest.mock
 
-from cli.streams import OutputStream, InputStream
+from cli.exceptions import BrokenPipeException
+from cli.streams import OutputStream, InputStream, make_pipe, make_os_pipe, make_fd_output_stream, open_file_output_stream
 
 
 class StreamsTest(unittest.TestCase):
@@ -16,3 +21,263 @@ class StreamsTest(unittest.TestCase):
 
         inp_stream = out_stream.to_input_stream()
         self.assertEqual(inp_stream.get_input(), 'xyz{}1'.format(os.linesep))
+
+    def test_read_chunks_consumes(self):
+        out_stream = OutputStream()
+        out_stream.write('ab')
+        out_stream.write('cd')
+
+        inp_stream = out_stream.to_input_stream()
+        self.assertEqual(list(inp_stream.read_chunks()), ['ab', 'cd'])
+        self.assertEqual(list(inp_stream.read_chunks()), [])
+
+    def test_read_lines_across_chunks(self):
+        inp_stream = InputStream.from_chunks(['ab', 'c\nd', 'e\n\nf', 'g'])
+        self.assertEqual(list(inp_stream), ['abc\n', 'de\n', '\n', 'fg'])
+
+    def test_get_input_is_repeatable(self):
+        inp_stream = InputStream.from_chunks(['x', 'y', 'z'])
+        self.assertEqual(inp_stream.get_input(), 'xyz')
+        self.assertEqual(inp_stream.get_input(), 'xyz')
+
+    def test_chunk_sources_are_lazy(self):
+        produced = []
+
+        def source():
+            for chunk in ('1', '2', '3'):
+                produced.append(chunk)
+                yield chunk
+
+        out_stream = OutputStream()
+        out_stream.write_chunks(source())
+        self.assertEqual(produced, [])
+
+        chunks = out_stream.to_input_stream().read_chunks()
+        self.assertEqual(next(chunks), '1')
+        self.assertEqual(produced, ['1'])
+
+    def test_pipe_between_threads(self):
+        pipe_input, pipe_output = make_pipe(capacity=2)
+
+        def write_all():
+            for i in range(100):
+                pipe_output.write(str(i))
+            pipe_output.close()
+
+        writer = threading.Thread(target=write_all)
+        writer.start()
+        self.assertEqual(list(pipe_input.read_chunks()), [str(i) for i in range(100)])
+        writer.join()
+
+    def test_pipe_backpressure(self):
+        pipe_input, pipe_output = make_pipe(capacity=2)
+        written = []
+
+        def write_all():
+            for chunk in ('a', 'b', 'c'):
+                pipe_output.write(chunk)
+                written.append(chunk)
+            pipe_output.close()
+
+        writer = threading.Thread(target=write_all)
+        writer.start()
+        writer.join(timeout=0.2)
+        # The pipe is full: the writer waits for the reader.
+        self.assertEqual(written, ['a', 'b'])
+
+        self.assertEqual(pipe_input.get_input(), 'abc')
+        writer.join()
+
+    def test_closed_pipe_reader_does_not_block_writer(self):
+        pipe_input, pipe_output = make_pipe(capacity=1)
+        pipe_output.write('x')
+
+        writer_result = []
+
+        def write_more():
+            try:
+                pipe_output.write('y')
+            except BrokenPipeException:
+                writer_result.append('broken pipe')
+
+        writer = threading.Thread(target=write_more)
+        writer.start()
+        pipe_input.close()
+        writer.join()
+
+        self.assertEqual(writer_result, ['broken pipe'])
+        self.assertRaises(BrokenPipeException, pipe_output.write_chunks, ['z'])
+        self.assertEqual(list(pipe_input.read_chunks()), [])
+
+    def test_os_pipe(self):
+        pipe_input, pipe_output = make_os_pipe()
+        self.assertIsNotNone(pipe_input.get_fileno())
+        self.assertIsNotNone(pipe_output.get_fileno())
+        self.assertIsNone(OutputStream().get_fileno())
+
+        pipe_output.write_line('xyz')
+        pipe_output.write('\u0444')
+        pipe_output.close()
+        self.assertEqual(pipe_input.get_input(), 'xyz{}\u0444'.format(os.linesep))
+        pipe_input.close()
+
+    def _read_available(self, read_fd):
+        os.set_blocking(read_fd, False)
+        try:
+            return os.read(read_fd, 1024)
+        except BlockingIOError:
+            return b''
+        finally:
+            os.set_blocking(read_fd, True)
+
+    def test_fd_output_stream_line_buffered(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+
+        out_stream = make_fd_output_stream(write_fd, line_buffered=True, terminate_lines=True)
+        out_stream.write('abc')
+        self.assertEqual(self._read_available(read_fd), b'')
+        out_stream.write(b'd\nef')
+        self.assertEqual(self._read_available(read_fd), b'abcd\nef')
+
+        out_stream.write('g')
+        self.assertEqual(out_stream.get_fileno(), write_fd)
+        self.assertEqual(self._read_available(read_fd), b'g')
+
+        # Whatever a process wrote into the descriptor, it is not terminated by the stream.
+        out_stream.close()
+        self.assertEqual(self._read_available(read_fd), b'')
+        self.assertEqual(out_stream.to_input_stream().get_input(), '')
+
+    def test_fd_output_stream_block_buffered(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+
+        out_stream = make_fd_output_stream(write_fd, buffer_size=4, terminate_lines=True)
+        out_stream.write_chunks(['a\n', 'b'])
+        self.assertEqual(self._read_available(read_fd), b'')
+        out_stream.write('cd')
+        self.assertEqual(self._read_available(read_fd), b'a\nbcd')
+        out_stream.write('e')
+        out_stream.close()
+        self.assertEqual(self._read_available(read_fd), b'e\n')
+
+    def test_fd_output_stream_closed_reader(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, write_fd)
+        os.close(read_fd)
+
+        out_stream = make_fd_output_stream(write_fd, line_buffered=True)
+        self.assertRaises(BrokenPipeException, out_stream.write, 'a\n')
+
+    def _make_file(self, data):
+        tmp_file = tempfile.NamedTemporaryFile(delete=False)
+        self.addCleanup(os.remove, tmp_file.name)
+        with tmp_file:
+            tmp_file.write(data)
+        return tmp_file.name
+
+    def _read_os_pipe(self, pipe_input, result):
+        result.append(b''.join(pipe_input.read_byte_chunks()))
+        pipe_input.close()
+
+    def test_write_file(self):
+        data = bytes(range(256)) * 1000
+        file_name = self._make_file(data)
+
+        out_stream = OutputStream()
+        out_stream.write_file(file_name)
+        self.assertEqual(b''.join(out_stream.to_input_stream().read_byte_chunks()), data)
+
+        # More than an OS pipe holds: the reader runs concurrently.
+        pipe_input, pipe_output = make_os_pipe()
+        result = []
+        reader = threading.Thread(target=self._read_os_pipe, args=(pipe_input, result))
+        reader.start()
+        pipe_output.write('x')
+        pipe_output.write_file(file_name)
+        pipe_output.close()
+        reader.join()
+        self.assertEqual(result, [b'x' + data])
+
+        with tempfile.TemporaryFile() as out_file:
+            out_stream = make_fd_output_stream(out_file.fileno())
+            out_stream.write('x')
+            out_stream.write_file(file_name)
+            out_stream.close()
+            out_file.seek(0)
+            self.assertEqual(out_file.read(), b'x' + data)
+
+    @unittest.skipUnless(hasattr(os, 'sendfile'), 'no sendfile on this platform')
+    def test_write_file_with_sendfile(self):
+        data = b'abc' * 1000
+        file_name = self._make_file(data)
+
+        pipe_input, pipe_output = make_os_pipe()
+        pipe_fd = pipe_output.get_fileno()
+        sendfile = unittest.mock.Mock(wraps=os.sendfile)
+        with unittest.mock.patch('os.sendfile', sendfile):
+            pipe_output.write_file(file_name)
+        pipe_output.close()
+
+        self.assertEqual(b''.join(pipe_input.read_byte_chunks()), data)
+        pipe_input.close()
+        # The whole file went through the kernel, in a single call.
+        out_fd, _, offset, count = sendfile.call_args[0]
+        self.assertEqual((out_fd, offset, count), (pipe_fd, 0, len(data)))
+        self.assertEqual(sendfile.call_count, 1)
+
+    def test_write_file_appends(self):
+        file_name = self._make_file(b'abc' * 1000)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_name = os.path.join(tmp_dir, 'out.txt')
+            for _ in range(2):
+                out_stream = open_file_output_stream(out_name, append=True)
+                out_stream.write_file(file_name)
+                out_stream.close()
+            with open(out_name, 'rb') as out_file:
+                self.assertEqual(out_file.read(), b'abc' * 2000)
+
+    def test_write_file_without_kernel_copy(self):
+        data = b'abc' * 100000
+        file_name = self._make_file(data)
+
+        unsupported = unittest.mock.Mock(side_effect=OSError(errno.EINVAL, 'Invalid argument'))
+        with unittest.mock.patch('os.sendfile', unsupported, create=True), \
+                unittest.mock.patch('os.copy_file_range', unsupported, create=True), \
+                tempfile.TemporaryFile() as out_file:
+            make_fd_output_stream(out_file.fileno()).write_file(file_name)
+            out_file.seek(0)
+            self.assertEqual(out_file.read(), data)
+
+    def test_write_file_closed_reader(self):
+        pipe_input, pipe_output = make_os_pipe()
+        pipe_input.close()
+        self.assertRaises(BrokenPipeException, pipe_output.write_file, self._make_file(b'abc'))
+        pipe_output.close()
+
+    def test_bytes_chunks_are_passed_as_is(self):
+        out_stream = OutputStream()
+        out_stream.write(b'\xff\x00')
+        out_stream.write('a')
+
+        inp_stream = out_stream.to_input_stream()
+        self.assertEqual(list(inp_stream.read_byte_chunks()), [b'\xff\x00', b'a'])
+
+    def test_bytes_decoded_on_demand(self):
+        encoded_char = '\u0444'.encode('utf-8')
+        inp_stream = InputStream.from_chunks([encoded_char[:1], encoded_char[1:], 'x'])
+
+        with unittest.mock.patch('cli.streams.ENCODING', 'utf-8'):
+            self.assertEqual(''.join(inp_stream.read_chunks()), '\u0444x')
+
+    def test_invalid_bytes_survive_round_trip(self):
+        inp_stream = InputStream.from_chunks([b'\xff\xfe'])
+        text = ''.join(inp_stream.read_chunks())
+
+        out_stream = OutputStream()
+        out_stream.write(text)
+        self.assertEqual(b''.join(out_stream.to_input_stream().read_byte_chunks()),
+                         b'\xff\xfe')
@@ -0,0 +1,91 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+
+from cli import trace
+from cli.shell import Shell
+from cli.streams import make_fd_output_stream
+
+
+class TraceTest(unittest.TestCase):
+    """Tests on the structured trace of command processing.
+    """
+
+    def setUp(self):
+        self.records = []
+        trace.enable(self.records.append)
+        self.shell = Shell()
+
+    def tearDown(self):
+        trace.disable()
+
+    def test_stages_of_new_line(self):
+        self.shell.process_input('echo 123 | wc')
+        stages = [record['stage'] for record in self.records]
+        self.assertEqual(stages, ['lex', 'parse', 'run'])
+
+        lex_record = self.records[0]
+        self.assertEqual(lex_record['input_size'], len('echo 123 | wc'))
+        self.assertEqual(lex_record['num_lexemes'], 4)
+        self.assertGreaterEqual(lex_record['duration'], 0)
+        self.assertEqual(self.records[-1]['return_code'], 0)
+
+    def test_stages_with_variables(self):
+        self.shell.apply_command_result(self.shell.process_input('x=1'))
+        del self.records[:]
+
+        self.shell.process_input('echo $x')
+        self.shell.process_input('echo $x')
+        stages = [record['stage'] for record in self.records]
+        self.assertEqual(stages, ['lex', 'parse', 'instantiate', 'run', 'instantiate', 'run'])
+
+        self.shell.apply_command_result(self.shell.process_input('x=a=b'))
+        del self.records[:]
+        self.shell.process_input('echo $x')
+        self.assertEqual(self.records[0],
+                         dict(self.records[0], stage='preprocess', input_size=7, output_size=8))
+
+    def test_bytes_written_by_run(self):
+        self.shell.process_input('echo 123')
+        self.assertEqual(self.records[-1]['num_bytes_written'], len('123\n'))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'file.txt')
+            with open(file_name, 'wb') as f:
+                f.write(b'abc\n' * 1000)
+
+            self.shell.process_input('cat {}'.format(file_name))
+            self.assertEqual(self.records[-1]['num_bytes_written'], 4000)
+
+            with open(os.path.join(tmp_dir, 'out.txt'), 'wb') as out_file:
+                output_stream = make_fd_output_stream(out_file.fileno())
+                self.shell.process_input('cat {} | wc -l'.format(file_name), output_stream)
+                self.shell.process_input('cat {}'.format(file_name), output_stream)
+                output_stream.close()
+            with open(os.path.join(tmp_dir, 'out.txt'), 'rb') as out_file:
+                output_size = len(out_file.read())
+
+        run_records = [record for record in self.records if record['stage'] == 'run']
+        self.assertEqual([record['num_bytes_written'] for record in run_records[-2:]],
+                         [output_size - 4000, 4000])
+
+    def test_error_is_recorded(self):
+        with self.assertRaises(Exception):
+            self.shell.process_input('echo "abc')
+        self.assertEqual(self.records[-1]['error'], 'LexException')
+
+    def test_disabled(self):
+        trace.disable()
+        self.assertFalse(trace.is_enabled())
+        self.shell.process_input('echo 1')
+        self.assertEqual(self.records, [])
+
+    def test_json_lines_sink(self):
+        out_file = io.StringIO()
+        trace.enable(trace.JsonLinesSink(out_file))
+        self.shell.process_input('pwd')
+
+        records = [json.loads(line) for line in out_file.getvalue().splitlines()]
+        self.assertEqual([record['stage'] for record in records], ['lex', 'parse', 'run'])